@@ -1,3 +1,9 @@
 from django.contrib import admin
 
-# Register your models here.
+from .models import BookletJobTiming
+
+
+@admin.register(BookletJobTiming)
+class BookletJobTimingAdmin(admin.ModelAdmin):
+    list_display = ("mode", "source_pages", "output_pages", "actual_seconds", "model_seconds", "actual_bytes", "created_at")
+    list_filter = ("mode",)
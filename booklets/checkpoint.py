@@ -0,0 +1,150 @@
+from __future__ import annotations
+
+import fcntl
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import time
+import uuid
+from collections.abc import Iterator
+from contextlib import contextmanager
+from dataclasses import asdict
+from typing import TYPE_CHECKING
+
+from pdf_manager_project.file_hash import file_content_hash
+
+if TYPE_CHECKING:
+    from .services import SourcePdfSpec
+
+
+CHECKPOINT_VERSION = 1
+# Work left behind by jobs that were never retried.
+CHECKPOINT_MAX_AGE_SECONDS = 2 * 24 * 3600
+
+
+class JobCheckpoint:
+    """
+    Working directory of a booklet job. With a checkpoint root it survives
+    the process: manifest.json records which split outputs are complete, so
+    a retried job with the same inputs and options only renders the rest.
+    Without one it is a plain temporary directory.
+    """
+
+    def __init__(self, work_dir: str, job_id: str, manifest_path: str | None = None, completed: set[int] | None = None):
+        self.work_dir = work_dir
+        self.job_id = job_id
+        self.manifest_path = manifest_path
+        self.completed = completed if completed is not None else set()
+
+    def is_complete(self, split_idx: int, output_path: str) -> bool:
+        return split_idx in self.completed and os.path.isfile(output_path)
+
+    def mark_complete(self, split_idx: int) -> None:
+        self.completed.add(split_idx)
+        if self.manifest_path is None:
+            return
+        with open(self.manifest_path, encoding="utf-8") as fh:
+            manifest = json.load(fh)
+        manifest["completed_splits"] = sorted(self.completed)
+        tmp_path = f"{self.manifest_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as fh:
+            json.dump(manifest, fh)
+        os.replace(tmp_path, self.manifest_path)
+
+
+def checkpoint_key(job_kind: str, specs: list[SourcePdfSpec], options: dict) -> str:
+    payload = {
+        "version": CHECKPOINT_VERSION,
+        "job_kind": job_kind,
+        "inputs": [{**asdict(spec), "input_pdf_path": file_content_hash(spec.input_pdf_path)} for spec in specs],
+        "options": options,
+    }
+    return hashlib.sha256(json.dumps(payload, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def _try_lock(lock_path: str):
+    """Opens and locks lock_path without waiting; None if another run holds it."""
+    lock = open(lock_path, "a")
+    try:
+        fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        lock.close()
+        return None
+    return lock
+
+
+def _remove_stale_checkpoints(checkpoint_root: str) -> None:
+    # A job that is still running holds its lock (and can be slower than the
+    # cutoff), so only directories whose lock is free are removed.
+    cutoff = time.time() - CHECKPOINT_MAX_AGE_SECONDS
+    for name in os.listdir(checkpoint_root):
+        path = os.path.join(checkpoint_root, name)
+        try:
+            if os.path.isdir(path):
+                if os.stat(os.path.join(path, "manifest.json")).st_mtime >= cutoff:
+                    continue
+                lock = _try_lock(f"{path}.lock")
+                if lock is None:
+                    continue
+                with lock:
+                    shutil.rmtree(path, ignore_errors=True)
+            elif name.endswith(".lock") and not os.path.isdir(path[: -len(".lock")]):
+                if os.stat(path).st_mtime >= cutoff:
+                    continue
+                lock = _try_lock(path)
+                if lock is None:
+                    continue
+                with lock:
+                    os.remove(path)
+        except OSError:
+            continue
+
+
+@contextmanager
+def job_checkpoint(
+    checkpoint_root: str | None,
+    job_kind: str,
+    specs: list[SourcePdfSpec],
+    options: dict,
+) -> Iterator[JobCheckpoint]:
+    """
+    Yields the job's working directory. The directory of a checkpointed job
+    is keyed by its inputs and options and kept when the job fails, so the
+    retry resumes it (and reuses its job id); it is removed once the job
+    has finished. A lock next to it keeps two runs of the same job apart:
+    the second one fails at once with ValueError instead of waiting.
+    """
+    if checkpoint_root is None:
+        job_id = uuid.uuid4().hex
+        with tempfile.TemporaryDirectory(prefix=f"pdf_manager_{job_id}_") as tmp:
+            yield JobCheckpoint(tmp, job_id)
+        return
+
+    os.makedirs(checkpoint_root, exist_ok=True)
+    key = checkpoint_key(job_kind, specs, options)
+    work_dir = os.path.join(checkpoint_root, key)
+    lock = _try_lock(f"{work_dir}.lock")
+    if lock is None:
+        raise ValueError("this job is already running")
+    with lock:
+        _remove_stale_checkpoints(checkpoint_root)
+        os.makedirs(work_dir, exist_ok=True)
+        manifest_path = os.path.join(work_dir, "manifest.json")
+        try:
+            with open(manifest_path, encoding="utf-8") as fh:
+                manifest = json.load(fh)
+        except (OSError, ValueError):
+            manifest = {
+                "version": CHECKPOINT_VERSION,
+                "job_id": uuid.uuid4().hex,
+                "job_kind": job_kind,
+                "options": options,
+                "completed_splits": [],
+            }
+            with open(manifest_path, "w", encoding="utf-8") as fh:
+                json.dump(manifest, fh)
+
+        yield JobCheckpoint(work_dir, manifest["job_id"], manifest_path, set(manifest["completed_splits"]))
+        shutil.rmtree(work_dir, ignore_errors=True)
@@ -0,0 +1,180 @@
+from __future__ import annotations
+
+import os
+import statistics
+import tempfile
+from dataclasses import dataclass
+
+import fitz
+
+from pdf_manager_project.pdf_analysis import UploadAnalysisCache
+from pdf_manager_project.pdf_sandbox import job_limits, run_sandboxed
+
+from .flipped_a4 import FLIPPED_A4_QUALITY_PROFILES
+from .job_features import JobFeatures, job_features
+from .models import BookletJobTiming
+from .preview import PreviewOptions, _output_page_count, _split_page_counts
+from .services import SourcePdfSpec
+
+
+# Uncalibrated cost model. Seconds per source page for a text page; other
+# page kinds are scaled by ESTIMATE_KIND_WEIGHTS. Recorded timings of past
+# jobs correct these per mode (see calibration_factors).
+ESTIMATE_JOB_OVERHEAD_SECONDS = 0.5
+ESTIMATE_SECONDS_PER_PAGE = {
+    "side_by_side": 0.004,
+    "side_by_side_flatten": 0.004,
+    "flipped_vector": 0.02,
+    "flipped_raster": 0.08,
+    "flipped_auto": 0.08,
+}
+ESTIMATE_KIND_WEIGHTS = {"text": 1.0, "graphics": 2.0, "scan": 1.5, "blank": 0.2}
+ESTIMATE_FLATTEN_SECONDS_PER_SHEET = 0.15  # at 300 dpi
+ESTIMATE_BYTES_PER_OUTPUT_PAGE = 1500
+# JPEG bytes per rendered pixel, by page kind.
+ESTIMATE_JPEG_BYTES_PER_PIXEL = {"text": 0.08, "graphics": 0.15, "scan": 0.25, "blank": 0.01}
+ESTIMATE_CALIBRATION_SAMPLES = 50
+
+
+@dataclass(frozen=True)
+class JobEstimate:
+    mode: str
+    output_pages: int
+    paper_sheets: int
+    split_count: int
+    source_pages: int
+    predicted_seconds: float
+    predicted_bytes: int
+    # Cost model output before calibration; recorded next to the actual
+    # timing so later estimates can be corrected.
+    model_seconds: float
+    model_bytes: int
+    calibrated: bool
+
+
+def estimate_mode(options: PreviewOptions, flatten_dpi: int | None = None) -> str:
+    if options.booklet_layout == "flipped_a4":
+        return f"flipped_{options.split_mode}"
+    return "side_by_side_flatten" if flatten_dpi else "side_by_side"
+
+
+def _model_cost(
+    mode: str,
+    features: JobFeatures,
+    output_pages: int,
+    render_quality: str,
+    flatten_dpi: int | None,
+) -> tuple[float, int]:
+    per_page = ESTIMATE_SECONDS_PER_PAGE[mode]
+    render_scale, _ = FLIPPED_A4_QUALITY_PROFILES.get(render_quality, FLIPPED_A4_QUALITY_PROFILES["medium"])
+    mean_page_area = features.page_area_pts / max(features.source_pages + features.padding_pages, 1)
+
+    seconds = ESTIMATE_JOB_OVERHEAD_SECONDS
+    size = features.source_bytes + output_pages * ESTIMATE_BYTES_PER_OUTPUT_PAGE
+    for kind, count in features.page_kinds.items():
+        weight = ESTIMATE_KIND_WEIGHTS.get(kind, 1.0)
+        # Raster mode places scans directly; auto mode also keeps text vector.
+        rendered = (mode == "flipped_raster" and kind != "scan") or (mode == "flipped_auto" and kind == "graphics")
+        if rendered:
+            seconds += count * per_page * weight * (render_scale / 4.5) ** 2
+            size += int(count * mean_page_area * render_scale**2 * ESTIMATE_JPEG_BYTES_PER_PIXEL[kind])
+        elif mode in {"flipped_raster", "flipped_auto"}:
+            seconds += count * ESTIMATE_SECONDS_PER_PAGE["flipped_vector"] * weight
+        else:
+            seconds += count * per_page * weight
+
+    if mode == "side_by_side_flatten" and flatten_dpi:
+        seconds += output_pages * ESTIMATE_FLATTEN_SECONDS_PER_SHEET * (flatten_dpi / 300) ** 2
+        sheet_pixels = 2 * mean_page_area * (flatten_dpi / 72) ** 2
+        size = output_pages * int(sheet_pixels * ESTIMATE_JPEG_BYTES_PER_PIXEL["graphics"])
+
+    return seconds, int(size)
+
+
+def calibration_factors(mode: str) -> tuple[float, float] | None:
+    """
+    Median actual/predicted ratios for seconds and bytes over the latest
+    recorded jobs of this mode, or None before any job has been recorded.
+    """
+    timings = list(
+        BookletJobTiming.objects.filter(mode=mode).order_by("-created_at")[:ESTIMATE_CALIBRATION_SAMPLES]
+    )
+    if not timings:
+        return None
+    seconds_ratio = statistics.median(t.actual_seconds / max(t.model_seconds, 1e-6) for t in timings)
+    bytes_ratio = statistics.median(t.actual_bytes / max(t.model_bytes, 1) for t in timings)
+    return seconds_ratio, bytes_ratio
+
+
+def _measure_job(
+    specs: list[SourcePdfSpec],
+    options: PreviewOptions,
+    analysis_cache: UploadAnalysisCache | None,
+) -> tuple[JobFeatures, list[int]]:
+    # Everything that parses the uploads; runs in the PDF sandbox.
+    with tempfile.TemporaryDirectory(prefix="pdf_manager_estimate_") as tmp:
+        prepared_pages, split_ranges = _split_page_counts(specs, options, tmp)
+        split_pages = [prepared_pages[start : end + 1] for start, end in split_ranges]
+        features = job_features([page for pages in split_pages for page in pages], analysis_cache)
+    return features, [_output_page_count(options, len(pages)) for pages in split_pages]
+
+
+def estimate_booklet_job(
+    specs: list[SourcePdfSpec],
+    options: PreviewOptions,
+    render_quality: str = "medium",
+    flatten_dpi: int | None = None,
+    analysis_cache: UploadAnalysisCache | None = None,
+) -> JobEstimate:
+    """
+    Predicts a booklet job before it runs. Page, sheet and split counts are
+    exact (same split, parity and padding rules as the pipelines); runtime
+    and output size come from the cost model, calibrated against recorded
+    jobs of the same mode.
+    """
+    mode = estimate_mode(options, flatten_dpi)
+    features, split_outputs = run_sandboxed(_measure_job, specs, options, analysis_cache, limits=job_limits())
+    output_pages = sum(split_outputs)
+    model_seconds, model_bytes = _model_cost(mode, features, output_pages, render_quality, flatten_dpi)
+
+    factors = calibration_factors(mode)
+    seconds_ratio, bytes_ratio = factors or (1.0, 1.0)
+    return JobEstimate(
+        mode=mode,
+        output_pages=output_pages,
+        # Every split is printed on its own double-sided sheets.
+        paper_sheets=sum(-(-count // 2) for count in split_outputs),
+        split_count=len(split_outputs),
+        source_pages=features.source_pages,
+        predicted_seconds=round(model_seconds * seconds_ratio, 2),
+        predicted_bytes=int(model_bytes * bytes_ratio),
+        model_seconds=model_seconds,
+        model_bytes=model_bytes,
+        calibrated=factors is not None,
+    )
+
+
+def record_job_timing(
+    mode: str,
+    features: JobFeatures,
+    render_quality: str,
+    flatten_dpi: int | None,
+    actual_seconds: float,
+    output_path: str,
+) -> BookletJobTiming:
+    """
+    Records a finished job next to the cost model's output for the features
+    its pipeline gathered and the quality profile it actually rendered at.
+    """
+    with fitz.open(output_path) as doc:
+        output_pages = doc.page_count
+    model_seconds, model_bytes = _model_cost(mode, features, output_pages, render_quality, flatten_dpi)
+    return BookletJobTiming.objects.create(
+        mode=mode,
+        source_pages=features.source_pages,
+        output_pages=output_pages,
+        model_seconds=model_seconds,
+        model_bytes=model_bytes,
+        actual_seconds=actual_seconds,
+        actual_bytes=os.path.getsize(output_path),
+    )
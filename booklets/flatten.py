@@ -0,0 +1,152 @@
+from __future__ import annotations
+
+import importlib.util
+import os
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from typing import Literal
+
+import fitz
+from pdf_manager_project.mapped_pdf import open_mapped_pdf
+from pdf_manager_project.pdf_colorspace import page_colorspace, pixmap_image_bytes, render_pixmap
+
+from .tiling import render_image_tiles
+
+
+SheetImageFormat = Literal["png", "tiff"]
+
+FLATTEN_JPEG_QUALITY = 92
+FLATTEN_MIN_PARALLEL_SHEETS = 4
+# Sheets per worker task. The parent writes each task's sheets to the output
+# as they arrive, so this bounds how many rendered sheets it holds.
+FLATTEN_SHEETS_PER_TASK = 8
+
+
+def sheet_image_formats() -> list[SheetImageFormat]:
+    # MuPDF writes PNG itself; TIFF goes through Pillow when it is installed.
+    if importlib.util.find_spec("PIL") is not None:
+        return ["png", "tiff"]
+    return ["png"]
+
+
+def _render_sheet_range(
+    pdf_path: str,
+    first: int,
+    last: int,
+    dpi: int,
+    image_dir: str | None,
+    image_format: SheetImageFormat,
+) -> list[tuple[float, float, list[tuple[fitz.Rect, bytes]]]]:
+    """
+    Renders sheets first..last (inclusive) and returns (width, height,
+    JPEG tiles) for each. Runs in a worker process; the document is memory
+    mapped so all workers share one copy of it. Sheets are rendered in
+    bands within the tile pixel budget, except when their image files are
+    requested, which need the whole sheet at once. Black-and-white sheets
+    are rendered in gray or bilevel rather than RGB.
+    """
+    rendered: list[tuple[float, float, list[tuple[fitz.Rect, bytes]]]] = []
+    with open_mapped_pdf(pdf_path) as doc:
+        for page_number in range(first, last + 1):
+            page = doc[page_number]
+            colorspace = page_colorspace(page)
+            if image_dir is None:
+                tiles = render_image_tiles(page, page.rect, dpi / 72, FLATTEN_JPEG_QUALITY, colorspace)
+                rendered.append((page.rect.width, page.rect.height, tiles))
+                continue
+
+            pixmap = render_pixmap(page, fitz.Matrix(dpi / 72, dpi / 72), colorspace)
+            image_path = os.path.join(image_dir, f"sheet{page_number + 1:04}.{image_format}")
+            if image_format == "tiff":
+                pixmap.pil_save(image_path, format="TIFF", compression="tiff_lzw", dpi=(dpi, dpi))
+            else:
+                pixmap.set_dpi(dpi, dpi)
+                pixmap.save(image_path)
+            tiles = [
+                (
+                    fitz.Rect(0, 0, page.rect.width, page.rect.height),
+                    pixmap_image_bytes(pixmap, colorspace, FLATTEN_JPEG_QUALITY),
+                )
+            ]
+            rendered.append((page.rect.width, page.rect.height, tiles))
+    return rendered
+
+
+def _sheet_chunks(page_count: int, workers: int) -> list[tuple[int, int]]:
+    chunk_size = min(-(-page_count // workers), FLATTEN_SHEETS_PER_TASK)
+    return [(first, min(first + chunk_size, page_count) - 1) for first in range(0, page_count, chunk_size)]
+
+
+def flatten_pdf_to_raster(
+    input_path: str,
+    output_path: str,
+    dpi: int,
+    image_dir: str | None = None,
+    image_format: SheetImageFormat = "png",
+    workers: int | None = None,
+) -> int:
+    """
+    Replaces every sheet of input_path with a single image rendered at dpi,
+    so printers that choke on transparency, huge vector maps or CAD exports
+    only have to place pictures. With image_dir, each sheet is also written
+    there as sheetNNNN.png/.tiff for direct RIP submission. Sheets are
+    rendered in a process pool and appended to output_path in order as each
+    task finishes, so only a few tasks' images are in memory at once.
+    Returns the number of sheets.
+    """
+    if image_format not in sheet_image_formats():
+        raise ValueError(f"Unsupported sheet image format: {image_format}")
+
+    with fitz.open(input_path) as doc:
+        page_count = doc.page_count
+    if page_count == 0:
+        raise ValueError("There are no sheets to flatten.")
+
+    try:
+        if page_count < FLATTEN_MIN_PARALLEL_SHEETS:
+            rendered = _render_sheet_range(input_path, 0, page_count - 1, dpi, image_dir, image_format)
+            _append_sheets(output_path, rendered, incremental=False)
+        else:
+            chunks = _sheet_chunks(page_count, min(page_count, workers or os.cpu_count() or 1))
+            with ProcessPoolExecutor(max_workers=min(len(chunks), workers or os.cpu_count() or 1)) as pool:
+                parts = pool.map(
+                    _render_sheet_range,
+                    *zip(*[(input_path, first, last, dpi, image_dir, image_format) for first, last in chunks]),
+                )
+                for index, rendered in enumerate(parts):
+                    _append_sheets(output_path, rendered, incremental=index > 0)
+                    del rendered
+    except BaseException:
+        if os.path.exists(output_path):
+            os.remove(output_path)
+        raise
+    return page_count
+
+
+def _append_sheets(
+    output_path: str,
+    rendered: list[tuple[float, float, list[tuple[fitz.Rect, bytes]]]],
+    incremental: bool,
+) -> None:
+    # Later batches go in as incremental updates, so the sheets written
+    # before are not loaded again.
+    flattened = fitz.open(output_path) if incremental else fitz.open()
+    try:
+        for width, height, tiles in rendered:
+            page = flattened.new_page(width=width, height=height)
+            for tile_rect, image_bytes in tiles:
+                page.insert_image(tile_rect, stream=image_bytes)
+        # Bilevel tiles are inserted as raw 1-bit samples; deflate them.
+        if incremental:
+            flattened.save(output_path, incremental=True, encryption=fitz.PDF_ENCRYPT_KEEP, deflate=True)
+        else:
+            flattened.save(output_path, garbage=1, deflate=True)
+    finally:
+        flattened.close()
+
+
+def zip_sheet_images(image_dir: str, zip_path: str) -> None:
+    # PNG and LZW TIFF are already compressed; storing avoids a second pass.
+    with zipfile.ZipFile(zip_path, "w", compression=zipfile.ZIP_STORED) as archive:
+        for name in sorted(os.listdir(image_dir)):
+            archive.write(os.path.join(image_dir, name), arcname=name)
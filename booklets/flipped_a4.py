@@ -1,31 +1,46 @@
 from __future__ import annotations
 
 import os
-import tempfile
-import uuid
+import re
+from collections.abc import Sequence
 from dataclasses import dataclass
 from typing import Literal
 
 import fitz
-from django.utils import timezone
-
-from pdf_manager_project.pdf_cover import collect_cover_entries, create_cover_pdf
-
+from pdf_manager_project.file_hash import file_content_hash
+from pdf_manager_project.pdf_analysis import UploadAnalysisCache, classify_page
+from pdf_manager_project.pdf_colorspace import PageColorspace
+
+from .checkpoint import job_checkpoint
+from .imposition import FLIPPED_A4_LAYOUT, CellPlacement, cell_grid
+from .memory import JobMemoryMonitor, release_schedule
+from .render_cache import RasterHalfCache, SheetFragmentCache
 from .services import (
+    SHEET_CACHE_VERSION,
     BookletJobResult,
     PreparedPage,
     SourcePdfSpec,
+    _release_source_doc,
+    _save_output,
+    _spill_output_part,
     add_watermark_to_page,
-    compute_split_ranges,
+    iter_prepared_pages,
+    iter_split_pages,
     merge_pdfs,
+    page_content_fingerprint,
     prepare_pages_for_specs,
+    specs_with_cover,
 )
+from .job_features import finished_job_features, recorded_pages
+from .page_table import PageTable
+from .tiling import render_image_tiles
 
 
 FLIPPED_A4_CENTER_GAP_CM = 1.0
 FLIPPED_A4_MIN_OUTER_MARGIN_CM = 0.15
 FlippedA4Quality = Literal["very_low", "low", "medium", "high", "super_high"]
-FlippedA4SplitMode = Literal["raster", "vector"]
+FlippedA4SplitMode = Literal["raster", "vector", "auto"]
+HalfRoute = Literal["clip", "pruned", "raster"]
 
 FLIPPED_A4_QUALITY_PROFILES: dict[FlippedA4Quality, tuple[float, int]] = {
     "very_low": (2.5, 84),
@@ -34,9 +49,15 @@ FLIPPED_A4_QUALITY_PROFILES: dict[FlippedA4Quality, tuple[float, int]] = {
     "high": (5.0, 86),
     "super_high": (6.0, 88),
 }
+# Pages rendered per candidate quality when searching for a size budget.
+QUALITY_SEARCH_SAMPLE_PAGES = 6
+# In auto mode, pages whose decoded content exceeds this are rendered.
+AUTO_RASTER_CONTENT_BYTES = 2 * 1024 * 1024
+_TRANSPARENCY_RE = re.compile(r"/(?:ca|CA)\s+(?:0?\.\d+|0\b)|/SMask\s*(?:\d+\s+\d+\s+R|<<)|/BM\s*/(?!Normal\b)")
+_XREF_RE = re.compile(r"(\d+) 0 R")
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class PreparedHalfPage:
     prepared_page: PreparedPage
     half: str
@@ -50,7 +71,7 @@ class PreparedHalfPage:
         return self.prepared_page.add_watermark and self.half == "top"
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class ImposedHalfPage:
     half_page: PreparedHalfPage
     rotate_180: bool = False
@@ -64,7 +85,7 @@ class ImposedHalfPage:
         return self.half_page.add_watermark
 
 
-def _logical_half_pages_for_prepared_pages(prepared_pages: list[PreparedPage]) -> list[PreparedHalfPage]:
+def _logical_half_pages_for_prepared_pages(prepared_pages: Sequence[PreparedPage]) -> list[PreparedHalfPage]:
     first_page = prepared_pages[0] if prepared_pages else PreparedPage(None, None, 595, 842, 1.0, False)
     half_pages: list[PreparedHalfPage] = [_blank_half_like(PreparedHalfPage(first_page, "top"))]
 
@@ -125,9 +146,9 @@ def _padded_half_pages(page_plan: list[PreparedHalfPage]) -> list[PreparedHalfPa
     return padded
 
 
-def _ensure_odd_prepared_pages(prepared_pages: list[PreparedPage]) -> list[PreparedPage]:
+def _ensure_odd_prepared_pages(prepared_pages: Sequence[PreparedPage]) -> Sequence[PreparedPage]:
     if len(prepared_pages) % 2 == 1:
-        return list(prepared_pages)
+        return prepared_pages
 
     template_page = prepared_pages[-1] if prepared_pages else PreparedPage(None, None, 595, 842, 1.0, False)
     return [
@@ -143,7 +164,7 @@ def _ensure_odd_prepared_pages(prepared_pages: list[PreparedPage]) -> list[Prepa
     ]
 
 
-def _imposed_cell_pairs(prepared_pages: list[PreparedPage]) -> list[tuple[ImposedHalfPage, ImposedHalfPage]]:
+def _imposed_cell_pairs(prepared_pages: Sequence[PreparedPage]) -> list[tuple[ImposedHalfPage, ImposedHalfPage]]:
     original = _ensure_odd_prepared_pages(prepared_pages)
     if not original:
         blank = ImposedHalfPage(_blank_half_like(None))
@@ -206,35 +227,129 @@ def _cell_draw_rect(
     )
 
 
+def flipped_a4_output_page_count(page_count: int) -> int:
+    odd_page_count = page_count if page_count % 2 == 1 else page_count + 1
+    return odd_page_count + 1
+
+
+def _page_has_transparency(page: fitz.Page) -> bool:
+    """
+    Soft-masked images, or graphics states with constant alpha, a soft mask
+    or a blend mode, found from the page's resources alone.
+    """
+    if any(image[1] for image in page.get_images()):
+        return True
+    doc = page.parent
+    kind, value = doc.xref_get_key(page.xref, "Resources/ExtGState")
+    if kind == "null":
+        return False
+    if kind == "xref":
+        value = doc.xref_object(int(value.split()[0]))
+    states = [value] + [doc.xref_object(int(xref)) for xref in _XREF_RE.findall(value)]
+    return any(_TRANSPARENCY_RE.search(state) for state in states)
+
+
+def _half_route(page_in: fitz.Page, split_mode: FlippedA4SplitMode, prune_vector_halves: bool) -> HalfRoute:
+    """
+    How the halves of a page are produced: "clip" shows a clipped view of
+    the source page, "pruned" a copy without the content of the other half,
+    "raster" an image. Auto mode keeps vector placement for text and simple
+    vector pages and only renders pages that are transparent or too heavy
+    for printers to handle as vectors.
+    """
+    if split_mode == "vector":
+        return "pruned" if prune_vector_halves else "clip"
+    if classify_page(page_in) == "scan":
+        return "clip"
+    if split_mode == "raster":
+        return "raster"
+    content_length = sum(len(page_in.parent.xref_stream(xref) or b"") for xref in page_in.get_contents())
+    if content_length > AUTO_RASTER_CONTENT_BYTES or _page_has_transparency(page_in):
+        return "raster"
+    return "pruned" if prune_vector_halves else "clip"
+
+
 def create_flipped_a4_booklet(
-    prepared_pages: list[PreparedPage],
+    prepared_pages: Sequence[PreparedPage],
     output_pdf_path: str,
     render_quality: FlippedA4Quality = "medium",
     center_gap_cm: float = FLIPPED_A4_CENTER_GAP_CM,
     split_mode: FlippedA4SplitMode = "vector",
+    memory_monitor: JobMemoryMonitor | None = None,
+    sheet_numbers: set[int] | None = None,
+    raster_cache: RasterHalfCache | None = None,
+    sheet_cache: SheetFragmentCache | None = None,
+    prune_vector_halves: bool = False,
+    analysis_cache: UploadAnalysisCache | None = None,
 ) -> None:
     source_docs: dict[str, fitz.Document] = {}
-    half_docs: dict[tuple[str, int, str], fitz.Document] = {}
+    fingerprint_digests: dict[str, dict[int, bytes]] = {}
+    half_docs: dict[tuple[str, str, HalfRoute], fitz.Document] = {}
+    half_cache_keys: dict[tuple[str, int, str], tuple[str, str, HalfRoute]] = {}
+    canonical_pages: dict[str, fitz.Page] = {}
+    half_routes: dict[str, HalfRoute] = {}
+    analysed_colorspaces: dict[str, list[PageColorspace] | None] = {}
+    part_paths: list[str] = []
     doc_out = fitz.open()
     render_scale, jpeg_quality = FLIPPED_A4_QUALITY_PROFILES.get(render_quality, FLIPPED_A4_QUALITY_PROFILES["medium"])
 
     try:
-        out_width = 595
-        out_height = 842
-
+        top_cell, bottom_cell = cell_grid(FLIPPED_A4_LAYOUT)
         imposed_cell_pairs = _imposed_cell_pairs(prepared_pages)
 
-        for top_slot_page, bottom_slot_page in imposed_cell_pairs:
-            page_out = doc_out.new_page(width=out_width, height=out_height)
-
-            def place_half_page(
-                imposed_half_page: ImposedHalfPage,
-                cell_x0: float,
-                cell_y0: float,
-                cell_x1: float,
-                cell_y1: float,
-                fold_edge: str,
-            ) -> None:
+        streaming = memory_monitor is not None and memory_monitor.streaming
+        releases = (
+            release_schedule(
+                _release_keys(pair) if sheet_numbers is None or pair_index + 1 in sheet_numbers else []
+                for pair_index, pair in enumerate(imposed_cell_pairs)
+            )
+            if streaming
+            else {}
+        )
+
+        def source_fingerprint(prepared_page: PreparedPage) -> str:
+            assert prepared_page.source_pdf_path is not None
+            assert prepared_page.source_page_number is not None
+
+            doc_in = source_docs.get(prepared_page.source_pdf_path)
+            if doc_in is None:
+                doc_in = fitz.open(prepared_page.source_pdf_path)
+                source_docs[prepared_page.source_pdf_path] = doc_in
+            return page_content_fingerprint(
+                doc_in,
+                prepared_page.source_page_number,
+                fingerprint_digests.setdefault(prepared_page.source_pdf_path, {}),
+            )
+
+        def sheet_key(pair: tuple[ImposedHalfPage, ImposedHalfPage]) -> str:
+            return SheetFragmentCache.hash_key(
+                [
+                    "flipped_a4",
+                    SHEET_CACHE_VERSION,
+                    split_mode,
+                    [render_scale, jpeg_quality] if split_mode != "vector" else None,
+                    prune_vector_halves if split_mode != "raster" else None,
+                    center_gap_cm,
+                    [
+                        None
+                        if imposed_half_page.is_blank
+                        else [
+                            source_fingerprint(imposed_half_page.half_page.prepared_page),
+                            imposed_half_page.half_page.half,
+                            imposed_half_page.rotate_180,
+                            imposed_half_page.half_page.prepared_page.margin_cm,
+                            imposed_half_page.add_watermark,
+                        ]
+                        for imposed_half_page in pair
+                    ],
+                ]
+            )
+
+        for pair_index, (top_slot_page, bottom_slot_page) in enumerate(imposed_cell_pairs):
+            if sheet_numbers is not None and pair_index + 1 not in sheet_numbers:
+                continue
+
+            def place_half_page(imposed_half_page: ImposedHalfPage, cell: CellPlacement) -> None:
                 if imposed_half_page.is_blank:
                     return
 
@@ -243,14 +358,15 @@ def create_flipped_a4_booklet(
                 assert prepared_page.source_pdf_path is not None
                 assert prepared_page.source_page_number is not None
 
-                half_doc = get_materialized_half_doc(half_page)
-                half_page_in = half_doc[0]
+                source_doc, source_page_number, clip = get_half_source(half_page)
+                source_rect = clip if clip is not None else source_doc[source_page_number].rect
                 margin_pts = prepared_page.margin_cm * 72 / 2.54
+                fold_edge = cell.fold_edge
                 draw_area = _cell_draw_rect(
-                    cell_x0,
-                    cell_y0,
-                    cell_x1,
-                    cell_y1,
+                    cell.x0,
+                    cell.y0,
+                    cell.x1,
+                    cell.y1,
                     margin_pts,
                     fold_edge,
                     center_gap_cm=center_gap_cm,
@@ -259,8 +375,8 @@ def create_flipped_a4_booklet(
 
                 cell_width = max(draw_area.width, 1)
                 cell_height = max(draw_area.height, 1)
-                rotated_width = half_page_in.rect.width if rotation % 180 == 0 else half_page_in.rect.height
-                rotated_height = half_page_in.rect.height if rotation % 180 == 0 else half_page_in.rect.width
+                rotated_width = source_rect.width if rotation % 180 == 0 else source_rect.height
+                rotated_height = source_rect.height if rotation % 180 == 0 else source_rect.width
                 scale = min(cell_width / rotated_width, cell_height / rotated_height)
                 w_scaled = rotated_width * scale
                 h_scaled = rotated_height * scale
@@ -275,51 +391,85 @@ def create_flipped_a4_booklet(
                 try:
                     page_out.show_pdf_page(
                         fitz.Rect(x_draw, y_draw, x_draw + w_scaled, y_draw + h_scaled),
-                        half_doc,
-                        0,
+                        source_doc,
+                        source_page_number,
+                        clip=clip,
                         rotate=rotation,
                     )
                 except ValueError:
+                    if split_mode == "auto" and clip is not None:
+                        # The vector clip failed; this page gets rendered instead.
+                        half_routes[source_fingerprint(prepared_page)] = "raster"
+                        source_doc, source_page_number, clip = get_half_source(half_page)
                     page_out.show_pdf_page(
                         draw_area,
-                        half_doc,
-                        0,
+                        source_doc,
+                        source_page_number,
+                        clip=clip,
                         rotate=rotation,
                     )
 
-            def get_materialized_half_doc(half_page: PreparedHalfPage) -> fitz.Document:
+            def get_analysed_colorspace(prepared_page: PreparedPage) -> PageColorspace | None:
+                if analysis_cache is None:
+                    return None
+                assert prepared_page.source_pdf_path is not None
+                assert prepared_page.source_page_number is not None
+                if prepared_page.source_pdf_path not in analysed_colorspaces:
+                    analysed_colorspaces[prepared_page.source_pdf_path] = analysis_cache.colorspaces(
+                        prepared_page.source_pdf_path
+                    )
+                analysed = analysed_colorspaces[prepared_page.source_pdf_path]
+                return analysed[prepared_page.source_page_number] if analysed is not None else None
+
+            def get_half_source(half_page: PreparedHalfPage) -> tuple[fitz.Document, int, fitz.Rect | None]:
                 prepared_page = half_page.prepared_page
                 assert prepared_page.source_pdf_path is not None
                 assert prepared_page.source_page_number is not None
 
-                cache_key = (prepared_page.source_pdf_path, prepared_page.source_page_number, half_page.half)
+                # Identical halves (blank separators, repeated forms) share one
+                # source, so they are rendered and embedded once.
+                fingerprint = source_fingerprint(prepared_page)
+                doc_in = source_docs[prepared_page.source_pdf_path]
+
+                route = half_routes.get(fingerprint)
+                if route is None:
+                    route = _half_route(doc_in[prepared_page.source_page_number], split_mode, prune_vector_halves)
+                    half_routes[fingerprint] = route
+
+                # Scans skip rendering in raster mode too: clipping the page keeps
+                # the original image bytes, so there is no decode, no re-encode
+                # and no second generation of JPEG loss.
+                if route == "clip":
+                    # Both halves are clipped views of the same source page, so the
+                    # output embeds the page once as a Form XObject and each half
+                    # only adds a small wrapper with its own clip and transform.
+                    page_in = canonical_pages.setdefault(fingerprint, doc_in[prepared_page.source_page_number])
+                    return page_in.parent, page_in.number, _clip_half_page(page_in, half_page.half)
+
+                cache_key = (fingerprint, half_page.half, route)
+                half_cache_keys[
+                    (prepared_page.source_pdf_path, prepared_page.source_page_number, half_page.half)
+                ] = cache_key
                 half_doc = half_docs.get(cache_key)
-                if half_doc is not None:
-                    return half_doc
-
-                doc_in = source_docs.get(prepared_page.source_pdf_path)
-                if doc_in is None:
-                    doc_in = fitz.open(prepared_page.source_pdf_path)
-                    source_docs[prepared_page.source_pdf_path] = doc_in
-
                 page_in = doc_in[prepared_page.source_page_number]
                 clip = _clip_half_page(page_in, half_page.half)
-                if split_mode == "vector":
-                    half_doc = _materialize_vector_half_doc(doc_in, page_in.number, clip)
-                else:
-                    half_doc = fitz.open()
-                    page_half = half_doc.new_page(width=clip.width, height=clip.height)
-                    pixmap = page_in.get_pixmap(
-                        matrix=fitz.Matrix(render_scale, render_scale),
-                        clip=clip,
-                        alpha=False,
-                    )
-                    page_half.insert_image(
-                        fitz.Rect(0, 0, clip.width, clip.height),
-                        stream=pixmap.tobytes("jpeg", jpg_quality=jpeg_quality),
+                if route == "pruned":
+                    if half_doc is None:
+                        half_doc = _materialize_pruned_half_doc(page_in, clip)
+                        half_docs[cache_key] = half_doc
+                    return half_doc, 0, clip
+
+                if half_doc is None:
+                    half_doc = _materialize_raster_half_doc(
+                        page_in,
+                        clip,
+                        render_scale,
+                        jpeg_quality,
+                        raster_cache,
+                        get_analysed_colorspace(prepared_page),
                     )
-                half_docs[cache_key] = half_doc
-                return half_doc
+                    half_docs[cache_key] = half_doc
+                return half_doc, 0, None
 
             def get_rotation(imposed_half_page: ImposedHalfPage) -> int:
                 if imposed_half_page.is_blank:
@@ -338,27 +488,40 @@ def create_flipped_a4_booklet(
                 page_in = doc_in[prepared_page.source_page_number]
                 return (page_in.rotation + (180 if imposed_half_page.rotate_180 else 0)) % 360
 
-            place_half_page(
-                top_slot_page,
-                0,
-                0,
-                out_width,
-                out_height / 2,
-                "bottom",
-            )
-            place_half_page(
-                bottom_slot_page,
-                0,
-                out_height / 2,
-                out_width,
-                out_height,
-                "top",
-            )
-
-            if top_slot_page.add_watermark or bottom_slot_page.add_watermark:
-                add_watermark_to_page(page_out)
-
-        doc_out.save(output_pdf_path, garbage=4, deflate=True)
+            key = sheet_key((top_slot_page, bottom_slot_page)) if sheet_cache is not None else None
+            if key is None or not sheet_cache.append_cached_sheet(doc_out, key):
+                page_out = doc_out.new_page(
+                    width=FLIPPED_A4_LAYOUT.sheet_width,
+                    height=FLIPPED_A4_LAYOUT.sheet_height,
+                )
+                place_half_page(top_slot_page, top_cell)
+                place_half_page(bottom_slot_page, bottom_cell)
+
+                if top_slot_page.add_watermark or bottom_slot_page.add_watermark:
+                    add_watermark_to_page(page_out)
+                if key is not None:
+                    sheet_cache.store_last_sheet(doc_out, key)
+
+            if streaming:
+                assert memory_monitor is not None
+                for release_key in releases.get(pair_index, []):
+                    if release_key[0] == "half":
+                        half_doc = half_docs.pop(half_cache_keys.pop(release_key[1:], ("", "", "clip")), None)
+                        if half_doc is not None:
+                            half_doc.close()
+                    else:
+                        _release_source_doc(release_key[1], source_docs, canonical_pages, fingerprint_digests)
+                if memory_monitor.should_spill():
+                    doc_out = _spill_output_part(doc_out, output_pdf_path, part_paths, garbage=4, deflate=True)
+                    memory_monitor.mark_spilled()
+            elif memory_monitor is not None:
+                memory_monitor.sample()
+
+        _save_output(doc_out, output_pdf_path, part_paths, garbage=4, deflate=True)
+        if raster_cache is not None:
+            raster_cache.trim()
+        if sheet_cache is not None:
+            sheet_cache.trim()
     finally:
         doc_out.close()
         for doc in half_docs.values():
@@ -367,18 +530,162 @@ def create_flipped_a4_booklet(
             doc.close()
 
 
-def _materialize_vector_half_doc(source_doc: fitz.Document, source_page_number: int, clip: fitz.Rect) -> fitz.Document:
+def _release_keys(pair: tuple[ImposedHalfPage, ImposedHalfPage]) -> list[tuple]:
+    keys: list[tuple] = []
+    for imposed_half_page in pair:
+        if imposed_half_page.is_blank:
+            continue
+        prepared_page = imposed_half_page.half_page.prepared_page
+        keys.append(("half", prepared_page.source_pdf_path, prepared_page.source_page_number, imposed_half_page.half_page.half))
+        keys.append(("doc", prepared_page.source_pdf_path))
+    return keys
+
+
+def _materialize_raster_half_doc(
+    page_in: fitz.Page,
+    clip: fitz.Rect,
+    render_scale: float,
+    jpeg_quality: int,
+    raster_cache: RasterHalfCache | None = None,
+    colorspace: PageColorspace | None = None,
+) -> fitz.Document:
+    """
+    Renders the half as one image, or as stacked bands when one image
+    would exceed the pixel budget (large posters at high scales), so only
+    one band's pixmap is ever held in memory. Black-and-white pages are
+    rendered with one channel and stored as gray JPEG or 1-bit images; the
+    page is classified on the first uncached band unless colorspace (from
+    its analysis) is given. The colorspace follows from the page content,
+    so it is not part of the cache key.
+    """
+    file_hash = file_content_hash(page_in.parent.name) if raster_cache is not None else None
+
+    def band_key(band: fitz.Rect) -> str:
+        return raster_cache.key(file_hash, page_in.number, tuple(band), render_scale, jpeg_quality)
+
     half_doc = fitz.open()
     page_half = half_doc.new_page(width=clip.width, height=clip.height)
-    page_half.show_pdf_page(
-        fitz.Rect(0, 0, clip.width, clip.height),
-        source_doc,
-        source_page_number,
-        clip=clip,
+    tiles = render_image_tiles(
+        page_in, clip, render_scale, jpeg_quality, colorspace, cache=raster_cache, cache_key=band_key
     )
+    for placement, image_bytes in tiles:
+        page_half.insert_image(placement, stream=image_bytes)
     return half_doc
 
 
+def _materialize_pruned_half_doc(page_in: fitz.Page, clip: fitz.Rect) -> fitz.Document:
+    """
+    Copies the source page and strips what lies fully outside clip, so the
+    printer no longer interprets the other half under the clip path. Images
+    go first, unless they overlap one that is kept; then text and paths,
+    with the cut moved past any text line that crosses the clip so glyphs
+    straddling the split survive. Paths are only dropped when fully covered.
+    """
+    half_doc = fitz.open()
+    half_doc.insert_pdf(page_in.parent, from_page=page_in.number, to_page=page_in.number)
+    page = half_doc[0]
+    if page.rotation:
+        # Redaction rects are unrotated page coordinates; keep these intact.
+        return half_doc
+
+    image_rects = [fitz.Rect(info["bbox"]) for info in page.get_image_info()]
+    kept_image_rects = [rect for rect in image_rects if rect.intersects(clip)]
+    dropped_image_rects = [
+        rect
+        for rect in image_rects
+        if not rect.intersects(clip) and not any(rect.intersects(kept) for kept in kept_image_rects)
+    ]
+    for rect in dropped_image_rects:
+        page.add_redact_annot(rect)
+    if dropped_image_rects:
+        page.apply_redactions(
+            images=fitz.PDF_REDACT_IMAGE_REMOVE,
+            graphics=fitz.PDF_REDACT_LINE_ART_NONE,
+            text=fitz.PDF_REDACT_TEXT_NONE,
+        )
+
+    keep_y0, keep_y1 = clip.y0, clip.y1
+    for block in page.get_text("dict")["blocks"]:
+        for line in block.get("lines", []):
+            line_rect = fitz.Rect(line["bbox"])
+            if line_rect.intersects(clip):
+                keep_y0 = min(keep_y0, line_rect.y0)
+                keep_y1 = max(keep_y1, line_rect.y1)
+
+    page_rect = page.rect
+    if keep_y0 > page_rect.y0:
+        page.add_redact_annot(fitz.Rect(page_rect.x0, page_rect.y0, page_rect.x1, keep_y0))
+    if keep_y1 < page_rect.y1:
+        page.add_redact_annot(fitz.Rect(page_rect.x0, keep_y1, page_rect.x1, page_rect.y1))
+    page.apply_redactions(
+        images=fitz.PDF_REDACT_IMAGE_NONE,
+        graphics=fitz.PDF_REDACT_LINE_ART_REMOVE_IF_COVERED,
+        text=fitz.PDF_REDACT_TEXT_REMOVE,
+    )
+    return half_doc
+
+
+def _quality_sample(prepared_pages: Sequence[PreparedPage], sample_size: int) -> list[PreparedPage]:
+    content_indexes = [index for index, page in enumerate(prepared_pages) if not page.is_blank]
+    step = max(len(content_indexes) / sample_size, 1)
+    picked = sorted({content_indexes[int(position * step)] for position in range(min(sample_size, len(content_indexes)))})
+    return [prepared_pages[index] for index in picked]
+
+
+def choose_render_quality(
+    prepared_pages: Sequence[PreparedPage],
+    max_output_bytes: int,
+    work_dir: str,
+    center_gap_cm: float = FLIPPED_A4_CENTER_GAP_CM,
+    split_mode: FlippedA4SplitMode = "raster",
+    raster_cache: RasterHalfCache | None = None,
+    prune_vector_halves: bool = False,
+    analysis_cache: UploadAnalysisCache | None = None,
+) -> tuple[FlippedA4Quality, int]:
+    """
+    Picks the highest quality profile whose output should fit in
+    max_output_bytes. A few evenly spread pages are imposed at each
+    candidate, binary searching the profiles (size grows with quality), and
+    their size per page is extrapolated to every content page. Returns the
+    profile and its predicted size; when nothing fits, the lowest profile.
+    With a raster cache the sampled halves are reused by the full run.
+    """
+    sample = _quality_sample(prepared_pages, QUALITY_SEARCH_SAMPLE_PAGES)
+    content_pages = sum(1 for page in prepared_pages if not page.is_blank)
+    candidates = list(FLIPPED_A4_QUALITY_PROFILES)  # lowest to highest
+
+    def predicted_bytes(quality: FlippedA4Quality) -> int:
+        sample_path = os.path.join(work_dir, f"quality_sample_{quality}.pdf")
+        create_flipped_a4_booklet(
+            sample,
+            sample_path,
+            render_quality=quality,
+            center_gap_cm=center_gap_cm,
+            split_mode=split_mode,
+            raster_cache=raster_cache,
+            prune_vector_halves=prune_vector_halves,
+            analysis_cache=analysis_cache,
+        )
+        sample_bytes = os.path.getsize(sample_path)
+        os.remove(sample_path)
+        return sample_bytes * content_pages // max(len(sample), 1)
+
+    chosen, chosen_bytes = candidates[0], None
+    low, high = 0, len(candidates) - 1
+    while low <= high:
+        middle = (low + high) // 2
+        size = predicted_bytes(candidates[middle])
+        if size <= max_output_bytes:
+            chosen, chosen_bytes = candidates[middle], size
+            low = middle + 1
+        else:
+            high = middle - 1
+    if chosen_bytes is None:
+        # Nothing fits; the search ended on the lowest profile.
+        chosen_bytes = size
+    return chosen, chosen_bytes
+
+
 def build_flipped_a4_booklets_pipeline(
     specs: list[SourcePdfSpec],
     max_pages_per_split: int,
@@ -388,49 +695,93 @@ def build_flipped_a4_booklets_pipeline(
     render_quality: FlippedA4Quality = "medium",
     center_gap_cm: float = FLIPPED_A4_CENTER_GAP_CM,
     split_mode: FlippedA4SplitMode = "vector",
+    memory_budget_mb: float | None = None,
+    subset_fonts: bool = False,
+    max_image_dpi: int | None = None,
+    raster_cache: RasterHalfCache | None = None,
+    sheet_cache: SheetFragmentCache | None = None,
+    prune_vector_halves: bool = False,
+    analysis_cache: UploadAnalysisCache | None = None,
+    checkpoint_dir: str | None = None,
+    max_output_mb: float | None = None,
 ) -> BookletJobResult:
+    """
+    With max_output_mb (raster and auto split modes), render_quality is
+    replaced by the highest quality predicted to fit that size, and the
+    result reports it.
+    """
     if not specs:
         raise ValueError("There are no PDFs to process.")
 
-    job_id = uuid.uuid4().hex
+    memory_monitor = JobMemoryMonitor(memory_budget_mb)
     os.makedirs(final_output_dir, exist_ok=True)
-    final_pdf = os.path.join(final_output_dir, f"{job_id}_flipped_a4_booklets_for_printing.pdf")
-
-    with tempfile.TemporaryDirectory(prefix=f"pdf_manager_{job_id}_") as tmp:
-        specs_to_process = list(specs)
-        if generate_cover:
-            cover_path = os.path.join(tmp, "cover.pdf")
-            create_cover_pdf(
-                output_path=cover_path,
-                entries=collect_cover_entries([spec.input_pdf_path for spec in specs]),
-                generated_on=timezone.localdate(),
-                heading="Booklet index",
-            )
-            specs_to_process.insert(
-                0,
-                SourcePdfSpec(
-                    input_pdf_path=cover_path,
-                    same_page_parity=True,
-                    margin_cm=0.0,
-                    add_watermark=False,
-                ),
-            )
-
-        prepared_pages = prepare_pages_for_specs(specs_to_process, preserve_file_parity=preserve_file_parity)
-        split_ranges = compute_split_ranges(len(prepared_pages), max_pages_per_split)
+    options = {
+        "max_pages_per_split": max_pages_per_split,
+        "preserve_file_parity": preserve_file_parity,
+        "generate_cover": generate_cover,
+        "render_quality": render_quality,
+        "center_gap_cm": center_gap_cm,
+        "split_mode": split_mode,
+        "subset_fonts": subset_fonts,
+        "max_image_dpi": max_image_dpi,
+        "prune_vector_halves": prune_vector_halves,
+        "max_output_mb": max_output_mb,
+    }
+    chosen_quality = None
+
+    with job_checkpoint(checkpoint_dir, "flipped_a4", specs, options) as checkpoint:
+        job_id = checkpoint.job_id
+        tmp = checkpoint.work_dir
+        final_pdf = os.path.join(final_output_dir, f"{job_id}_flipped_a4_booklets_for_printing.pdf")
+        specs_to_process = specs_with_cover(specs, tmp, generate_cover, analysis_cache=analysis_cache)
+        prepared_pages = iter_prepared_pages(specs_to_process, preserve_file_parity=preserve_file_parity)
         split_outputs: list[str] = []
 
-        for split_idx, (start_idx, end_idx) in enumerate(split_ranges, start=1):
-            output_path = os.path.join(tmp, f"split{split_idx:02}_flipped_a4_booklet.pdf")
-            create_flipped_a4_booklet(
-                prepared_pages[start_idx : end_idx + 1],
-                output_path,
-                render_quality=render_quality,
+        if max_output_mb and split_mode != "vector":
+            # Sampling needs the whole job up front.
+            prepared_pages = prepare_pages_for_specs(specs_to_process, preserve_file_parity=preserve_file_parity)
+            chosen_quality, _ = choose_render_quality(
+                prepared_pages,
+                int(max_output_mb * 1024 * 1024),
+                tmp,
                 center_gap_cm=center_gap_cm,
                 split_mode=split_mode,
+                raster_cache=raster_cache,
+                prune_vector_halves=prune_vector_halves,
+                analysis_cache=analysis_cache,
             )
-            split_outputs.append(output_path)
+            render_quality = chosen_quality
 
-        merge_pdfs(split_outputs, final_pdf)
+        job_pages = PageTable()
+        split_iter = iter_split_pages(recorded_pages(prepared_pages, job_pages), max_pages_per_split)
+        for split_idx, split_pages in enumerate(split_iter, start=1):
+            output_path = os.path.join(tmp, f"split{split_idx:02}_flipped_a4_booklet.pdf")
+            if not checkpoint.is_complete(split_idx, output_path):
+                create_flipped_a4_booklet(
+                    split_pages,
+                    output_path,
+                    render_quality=render_quality,
+                    center_gap_cm=center_gap_cm,
+                    split_mode=split_mode,
+                    memory_monitor=memory_monitor,
+                    raster_cache=raster_cache,
+                    sheet_cache=sheet_cache,
+                    prune_vector_halves=prune_vector_halves,
+                    analysis_cache=analysis_cache,
+                )
+                checkpoint.mark_complete(split_idx)
+            split_outputs.append(output_path)
 
-    return BookletJobResult(job_id=job_id, output_pdf_path=final_pdf)
+        # The final merge sees the fonts and images of every split, so the
+        # output passes run once per resource instead of once per split.
+        merge_pdfs(split_outputs, final_pdf, subset_fonts=subset_fonts, max_image_dpi=max_image_dpi)
+        memory_monitor.sample()
+        features = finished_job_features(job_pages, analysis_cache)
+
+    return BookletJobResult(
+        job_id=job_id,
+        output_pdf_path=final_pdf,
+        peak_rss_mb=memory_monitor.peak_mb,
+        chosen_quality=chosen_quality,
+        features=features,
+    )
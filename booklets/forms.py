@@ -3,6 +3,8 @@ from __future__ import annotations
 
 from django import forms
 
+from .flatten import sheet_image_formats
+
 
 class MultiFileInput(forms.FileInput):
     """
@@ -60,6 +62,53 @@ class BookletForm(forms.Form):
         widget=forms.RadioSelect,
     )
 
+    pages_per_side = forms.TypedChoiceField(
+        label="Pages per sheet side",
+        required=False,
+        initial=2,
+        coerce=int,
+        empty_value=2,
+        choices=[
+            (2, "2 pages (booklet)"),
+            (4, "4 pages (handout, half the sheets)"),
+            (8, "8 pages (handout, a quarter of the sheets)"),
+        ],
+        widget=forms.Select(attrs={"class": "form-select"}),
+    )
+
+    binding = forms.ChoiceField(
+        label="Binding",
+        required=False,
+        initial="saddle",
+        choices=[
+            ("saddle", "Saddle stitch (nest all sheets, fold and staple)"),
+            ("perfect", "Perfect bound (fold each sheet, stack and glue)"),
+        ],
+        widget=forms.RadioSelect,
+    )
+
+    flatten_dpi = forms.TypedChoiceField(
+        label="Print-ready output",
+        required=False,
+        initial="",
+        coerce=int,
+        empty_value=None,
+        choices=[
+            ("", "Keep vectors"),
+            ("300", "Flatten sheets to images at 300 dpi"),
+            ("600", "Flatten sheets to images at 600 dpi"),
+        ],
+        widget=forms.Select(attrs={"class": "form-select"}),
+    )
+
+    sheet_image_format = forms.ChoiceField(
+        label="Sheet image files",
+        required=False,
+        initial="",
+        choices=[("", "None")],
+        widget=forms.Select(attrs={"class": "form-select"}),
+    )
+
     max_pages_per_split = forms.IntegerField(
         label="Max pages per split",
         required=True,
@@ -82,6 +131,27 @@ class BookletForm(forms.Form):
         widget=forms.CheckboxInput(attrs={"class": "form-check-input"}),
     )
 
+    subset_fonts = forms.BooleanField(
+        label="Subset embedded fonts",
+        required=False,
+        initial=False,
+        widget=forms.CheckboxInput(attrs={"class": "form-check-input"}),
+    )
+
+    max_image_dpi = forms.TypedChoiceField(
+        label="Image resolution",
+        required=False,
+        initial="",
+        coerce=int,
+        empty_value=None,
+        choices=[
+            ("", "Keep original images"),
+            ("300", "Downsample to 300 dpi (print)"),
+            ("150", "Downsample to 150 dpi (draft)"),
+        ],
+        widget=forms.Select(attrs={"class": "form-select"}),
+    )
+
     flipped_a4 = forms.BooleanField(
         label="Flipped A4",
         required=False,
@@ -110,10 +180,25 @@ class BookletForm(forms.Form):
         choices=[
             ("vector", "Vector split (keeps text and shapes)"),
             ("raster", "Image split (most reliable fallback)"),
+            ("auto", "Automatic (vector where safe, images where needed)"),
         ],
         widget=forms.RadioSelect,
     )
 
+    flipped_a4_prune_halves = forms.BooleanField(
+        label="Drop content outside each half",
+        required=False,
+        initial=False,
+        widget=forms.CheckboxInput(attrs={"class": "form-check-input"}),
+    )
+
+    flipped_a4_max_output_mb = forms.FloatField(
+        label="Max output size (MB)",
+        required=False,
+        min_value=1.0,
+        widget=forms.NumberInput(attrs={"class": "form-control", "min": "1", "step": "1", "placeholder": "No limit"}),
+    )
+
     flipped_a4_center_gap_cm = forms.FloatField(
         label="Middle page separation (cm)",
         required=False,
@@ -124,6 +209,9 @@ class BookletForm(forms.Form):
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
+        self.fields["sheet_image_format"].choices = [("", "None")] + [
+            (image_format, f"{image_format.upper()} per sheet (zip)") for image_format in sheet_image_formats()
+        ]
         self.fields["input_pdf"].widget.attrs.update(
             {
                 "class": "form-control",
@@ -131,6 +219,9 @@ class BookletForm(forms.Form):
             }
         )
 
+    def clean_binding(self):
+        return self.cleaned_data.get("binding") or "saddle"
+
     def clean_flipped_a4_quality(self):
         return self.cleaned_data.get("flipped_a4_quality") or "medium"
 
@@ -149,4 +240,12 @@ class BookletForm(forms.Form):
             cleaned_data["booklet_layout"] = "flipped_a4"
         else:
             cleaned_data["booklet_layout"] = cleaned_data.get("booklet_layout") or "side_by_side"
+        # Sheet image files are a by-product of flattening.
+        if cleaned_data.get("sheet_image_format") and (
+            not cleaned_data.get("flatten_dpi") or cleaned_data["booklet_layout"] == "flipped_a4"
+        ):
+            self.add_error(
+                "sheet_image_format",
+                "Sheet image files need side-by-side booklets flattened to images at 300 or 600 dpi.",
+            )
         return cleaned_data
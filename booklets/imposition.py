@@ -0,0 +1,184 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Literal
+
+import fitz
+
+
+Binding = Literal["saddle", "perfect"]
+FoldAxis = Literal["vertical", "horizontal"]
+
+
+@dataclass(frozen=True)
+class ImpositionLayout:
+    """
+    A grid of cells on one side of a sheet.
+
+    With a vertical fold, neighbouring columns pair up into spreads (two
+    facing pages), so 2-up, 4-up and 8-up are 2x1, 2x2 and 4x2 grids. A
+    horizontal fold pairs rows instead, which is how the flipped booklet
+    stacks two half pages on a portrait sheet.
+    """
+
+    columns: int
+    rows: int
+    sheet_width: float
+    sheet_height: float
+    binding: Binding = "saddle"
+    fold_axis: FoldAxis = "vertical"
+
+    @property
+    def spreads_per_side(self) -> int:
+        return (self.columns // 2) * self.rows
+
+    @property
+    def pages_per_sheet(self) -> int:
+        # Front and back of one printed sheet.
+        return 4 * self.spreads_per_side
+
+
+@dataclass(frozen=True)
+class CellPlacement:
+    x0: float
+    y0: float
+    x1: float
+    y1: float
+    rotation: int = 0
+    fold_edge: str = ""
+
+    @property
+    def rect(self) -> fitz.Rect:
+        return fitz.Rect(self.x0, self.y0, self.x1, self.y1)
+
+
+SIDE_BY_SIDE_LAYOUT = ImpositionLayout(columns=2, rows=1, sheet_width=842, sheet_height=595)
+FLIPPED_A4_LAYOUT = ImpositionLayout(columns=1, rows=2, sheet_width=595, sheet_height=842, fold_axis="horizontal")
+
+# Handout layouts keep A4 sheets: 4-up puts two A6 spreads on a portrait
+# sheet, 8-up four A7 spreads on a landscape one.
+_NUP_GRIDS: dict[int, tuple[int, int, float, float]] = {
+    2: (2, 1, 842, 595),
+    4: (2, 2, 595, 842),
+    8: (4, 2, 842, 595),
+}
+
+
+def nup_layout(
+    pages_per_side: int = 2,
+    binding: Binding = "saddle",
+    sheet_size: tuple[float, float] | None = None,
+) -> ImpositionLayout:
+    if pages_per_side not in _NUP_GRIDS:
+        raise ValueError(f"Unsupported pages per side: {pages_per_side}")
+    if binding not in ("saddle", "perfect"):
+        raise ValueError(f"Unsupported binding: {binding}")
+
+    columns, rows, sheet_width, sheet_height = _NUP_GRIDS[pages_per_side]
+    if sheet_size is not None:
+        sheet_width, sheet_height = sheet_size
+    return ImpositionLayout(
+        columns=columns,
+        rows=rows,
+        sheet_width=sheet_width,
+        sheet_height=sheet_height,
+        binding=binding,
+    )
+
+
+@lru_cache(maxsize=64)
+def cell_grid(layout: ImpositionLayout) -> tuple[CellPlacement, ...]:
+    """
+    Cells of one unrotated side in row-major order. fold_edge names the cell
+    edge that lies on the fold.
+    """
+    cell_width = layout.sheet_width / layout.columns
+    cell_height = layout.sheet_height / layout.rows
+    cells: list[CellPlacement] = []
+    for row in range(layout.rows):
+        for column in range(layout.columns):
+            if layout.fold_axis == "horizontal":
+                fold_edge = "bottom" if row % 2 == 0 else "top"
+            else:
+                fold_edge = "right" if column % 2 == 0 else "left"
+            cells.append(
+                CellPlacement(
+                    x0=column * cell_width,
+                    y0=row * cell_height,
+                    x1=(column + 1) * cell_width,
+                    y1=(row + 1) * cell_height,
+                    fold_edge=fold_edge,
+                )
+            )
+    return tuple(cells)
+
+
+def padded_page_count(layout: ImpositionLayout, page_count: int) -> int:
+    per_sheet = layout.pages_per_sheet
+    return max(1, -(-page_count // per_sheet)) * per_sheet
+
+
+def imposed_side_count(layout: ImpositionLayout, page_count: int) -> int:
+    return 2 * padded_page_count(layout, page_count) // layout.pages_per_sheet
+
+
+def _folio_spreads(binding: Binding, page_count: int, folio: int) -> tuple[tuple[int, int], tuple[int, int]]:
+    """
+    Front and back spreads (left page, right page) of one 2-up folio.
+    Saddle stitch nests every folio around the centre of the whole run;
+    perfect binding folds each folio on its own and stacks them.
+    """
+    if binding == "perfect":
+        first = 4 * folio
+        return (first + 3, first), (first + 1, first + 2)
+    return (page_count - 1 - 2 * folio, 2 * folio), (2 * folio + 1, page_count - 2 - 2 * folio)
+
+
+def _rotated(cell: CellPlacement) -> CellPlacement:
+    return CellPlacement(cell.x0, cell.y0, cell.x1, cell.y1, (cell.rotation + 180) % 360, cell.fold_edge)
+
+
+@lru_cache(maxsize=256)
+def placement_table(layout: ImpositionLayout, page_count: int) -> tuple[tuple[tuple[int, CellPlacement], ...], ...]:
+    """
+    (page index, cell) pairs for every output side, fronts and backs
+    alternating, for page_count pages padded to whole sheets.
+
+    With more than one spread per side the folios are cut-and-stacked:
+    spread slot i of every sheet holds the i-th contiguous pile of folios,
+    so cutting the printed stack and piling slot 0 on slot 1 and so on
+    restores folio order. Fronts are printed rotated 180 degrees, matching
+    duplex printing that turns the sheet over along its horizontal edge.
+    """
+    if layout.fold_axis != "vertical":
+        raise ValueError("Placement tables need a layout with a vertical fold.")
+
+    total = padded_page_count(layout, page_count)
+    grid = cell_grid(layout)
+    spread_columns = layout.columns // 2
+    slots = [(column, row) for row in range(layout.rows) for column in range(spread_columns)]
+    stack_height = total // 4 // len(slots)
+
+    sides: list[tuple[tuple[int, CellPlacement], ...]] = []
+    for sheet in range(stack_height):
+        front: list[tuple[int, CellPlacement]] = []
+        back: list[tuple[int, CellPlacement]] = []
+        for pile, (column, row) in enumerate(slots):
+            front_spread, back_spread = _folio_spreads(layout.binding, total, pile * stack_height + sheet)
+
+            front_row = layout.rows - 1 - row
+            front_column = spread_columns - 1 - column
+            front_left = grid[front_row * layout.columns + 2 * front_column]
+            front_right = grid[front_row * layout.columns + 2 * front_column + 1]
+            front.append((front_spread[1], _rotated(front_left)))
+            front.append((front_spread[0], _rotated(front_right)))
+
+            back_column = spread_columns - 1 - column
+            back_left = grid[row * layout.columns + 2 * back_column]
+            back_right = grid[row * layout.columns + 2 * back_column + 1]
+            back.append((back_spread[0], back_left))
+            back.append((back_spread[1], back_right))
+        sides.append(tuple(front))
+        sides.append(tuple(back))
+    return tuple(sides)
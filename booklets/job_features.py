@@ -0,0 +1,96 @@
+from __future__ import annotations
+
+import os
+from collections import Counter
+from collections.abc import Iterable, Iterator, Sequence
+from dataclasses import dataclass
+
+import fitz
+from pdf_manager_project.pdf_analysis import UploadAnalysisCache
+
+from .page_table import PageTable, PreparedPage
+
+
+@dataclass(frozen=True)
+class JobFeatures:
+    """Inputs of the job cost model, gathered from a job's prepared pages."""
+
+    source_pages: int
+    padding_pages: int
+    page_kinds: dict[str, int]
+    source_bytes: int
+    page_area_pts: float
+
+
+def _quick_page_kind(doc: fitz.Document, page: fitz.Page) -> str:
+    """
+    Classifies a page from its resources and content length alone, without
+    interpreting the content stream. OCR output (one image plus Tesseract's
+    invisible GlyphLessFont) counts as a scan.
+    """
+    image_count = len(page.get_images())
+    fonts = {font[3] for font in page.get_fonts()}
+    content_length = sum(len(doc.xref_stream_raw(xref) or b"") for xref in page.get_contents())
+
+    if image_count == 1 and fonts <= {"GlyphLessFont"}:
+        return "scan"
+    if fonts:
+        return "text"
+    if image_count or content_length:
+        return "graphics"
+    return "blank"
+
+
+def job_features(pages: Sequence[PreparedPage], analysis_cache: UploadAnalysisCache | None = None) -> JobFeatures:
+    """
+    Counts page kinds, padding, area and the source bytes behind pages.
+    Uploads with a cached analysis are not opened; the others are
+    classified page by page from their resources.
+    """
+    pages_by_source: dict[str, list[int]] = {}
+    padding_pages = 0
+    page_area = 0.0
+    for page in pages:
+        page_area += page.width * page.height
+        if page.is_blank:
+            padding_pages += 1
+        else:
+            pages_by_source.setdefault(page.source_pdf_path, []).append(page.source_page_number)
+
+    kinds: Counter[str] = Counter()
+    source_bytes = 0
+    for path, page_numbers in pages_by_source.items():
+        analysis = analysis_cache.load(path) if analysis_cache is not None else None
+        if analysis is not None:
+            source_bytes += os.path.getsize(path) * len(page_numbers) // max(analysis["page_count"], 1)
+            kinds.update(analysis["pages"][page_number]["kind"] for page_number in page_numbers)
+            continue
+        with fitz.open(path) as doc:
+            source_bytes += os.path.getsize(path) * len(page_numbers) // max(doc.page_count, 1)
+            kinds.update(_quick_page_kind(doc, doc[page_number]) for page_number in page_numbers)
+
+    return JobFeatures(
+        source_pages=sum(kinds.values()),
+        padding_pages=padding_pages,
+        page_kinds=dict(kinds),
+        source_bytes=source_bytes,
+        page_area_pts=page_area,
+    )
+
+
+def finished_job_features(
+    pages: Sequence[PreparedPage],
+    analysis_cache: UploadAnalysisCache | None = None,
+) -> JobFeatures | None:
+    # Only feeds the estimate calibration, so it never fails a finished job.
+    try:
+        return job_features(pages, analysis_cache)
+    except Exception:
+        return None
+
+
+def recorded_pages(pages: Iterable[PreparedPage], table: PageTable) -> Iterator[PreparedPage]:
+    # Keeps a compact copy of the pages a streaming pipeline consumes.
+    for page in pages:
+        table.append(page)
+        yield page
@@ -0,0 +1,50 @@
+from __future__ import annotations
+
+import os
+import shutil
+import tempfile
+import time
+
+import fitz
+from django.core.management.base import BaseCommand, CommandError
+from pdf_manager_project.pdf_ingest import normalize_pdf_on_ingest
+
+
+def _open_and_measure_seconds(path: str, repeat: int) -> float:
+    # Mirrors what every pipeline stage does: open, read each page box, close.
+    started = time.perf_counter()
+    for _ in range(repeat):
+        with fitz.open(path) as doc:
+            for page in doc:
+                page.rect
+    return (time.perf_counter() - started) / repeat
+
+
+class Command(BaseCommand):
+    help = "Compares open times of PDFs before and after upload normalization."
+
+    def add_arguments(self, parser):
+        parser.add_argument("pdf", nargs="+", help="PDF files to benchmark (they are not modified).")
+        parser.add_argument("--repeat", type=int, default=5, help="Opens per measurement.")
+
+    def handle(self, *args, **options):
+        repeat = max(1, options["repeat"])
+        with tempfile.TemporaryDirectory(prefix="pdf_manager_ingest_bench_") as tmp:
+            for source_path in options["pdf"]:
+                if not os.path.isfile(source_path):
+                    raise CommandError(f"File does not exist: {source_path}")
+
+                copy_path = os.path.join(tmp, os.path.basename(source_path))
+                shutil.copyfile(source_path, copy_path)
+
+                before = _open_and_measure_seconds(copy_path, repeat)
+                result = normalize_pdf_on_ingest(copy_path)
+                after = _open_and_measure_seconds(copy_path, repeat) if result.normalized else before
+
+                self.stdout.write(
+                    f"{os.path.basename(source_path)}: "
+                    f"{result.reason or 'already clean'}, "
+                    f"open {before * 1000:.1f} ms -> {after * 1000:.1f} ms "
+                    f"({before / after if after else 1:.1f}x), "
+                    f"size {os.path.getsize(source_path)} -> {os.path.getsize(copy_path)} bytes"
+                )
@@ -0,0 +1,81 @@
+from __future__ import annotations
+
+import os
+import resource
+import sys
+from collections.abc import Hashable, Iterable
+
+
+# Growth over the level left by the last spill that triggers the next one.
+SPILL_MIN_GROWTH_MB = 32
+
+
+def current_rss_mb() -> float:
+    try:
+        with open("/proc/self/statm", "rb") as fh:
+            resident_pages = int(fh.read().split()[1])
+        return resident_pages * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except (OSError, ValueError, IndexError):
+        return process_peak_rss_mb()
+
+
+def process_peak_rss_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS reports bytes.
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+class JobMemoryMonitor:
+    """
+    Tracks the resident memory of the current process while a job runs.
+
+    budget_mb=None only records the peak. With a budget, the imposition
+    stages switch to streaming: they release sources after their last use
+    and spill finished sheets to disk once RSS goes over the budget. The
+    budget is a target, not a hard cap: freed memory mostly stays with the
+    allocator, so RSS rarely drops after a spill. The level measured right
+    after a spill becomes the baseline, and the next spill waits until RSS
+    has grown SPILL_MIN_GROWTH_MB past it instead of spilling every sheet.
+    """
+
+    def __init__(self, budget_mb: float | None = None):
+        self.budget_mb = budget_mb
+        self.peak_mb = current_rss_mb()
+        self.spill_baseline_mb: float | None = None
+
+    @property
+    def streaming(self) -> bool:
+        return self.budget_mb is not None
+
+    def sample(self) -> float:
+        rss_mb = current_rss_mb()
+        self.peak_mb = max(self.peak_mb, rss_mb)
+        return rss_mb
+
+    def over_budget(self) -> bool:
+        rss_mb = self.sample()
+        return self.budget_mb is not None and rss_mb > self.budget_mb
+
+    def should_spill(self) -> bool:
+        if not self.over_budget():
+            return False
+        baseline = self.spill_baseline_mb
+        return baseline is None or current_rss_mb() - baseline >= SPILL_MIN_GROWTH_MB
+
+    def mark_spilled(self) -> None:
+        self.spill_baseline_mb = self.sample()
+
+
+def release_schedule(steps: Iterable[Iterable[Hashable]]) -> dict[int, list[Hashable]]:
+    """
+    Maps each step index to the keys whose last use happens in that step.
+    """
+    last_use: dict[Hashable, int] = {}
+    for step_index, keys in enumerate(steps):
+        for key in keys:
+            last_use[key] = step_index
+
+    schedule: dict[int, list[Hashable]] = {}
+    for key, step_index in last_use.items():
+        schedule.setdefault(step_index, []).append(key)
+    return schedule
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.9 on 2026-10-19 14:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BookletJobTiming',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('mode', models.CharField(db_index=True, max_length=32)),
+                ('source_pages', models.IntegerField()),
+                ('output_pages', models.IntegerField()),
+                ('model_seconds', models.FloatField()),
+                ('model_bytes', models.BigIntegerField()),
+                ('actual_seconds', models.FloatField()),
+                ('actual_bytes', models.BigIntegerField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+    ]
@@ -1,3 +1,20 @@
 from django.db import models
 
-# Create your models here.
+
+class BookletJobTiming(models.Model):
+    """
+    Measured runtime and output size of a finished booklet job, next to what
+    the uncalibrated cost model predicted for it.
+    """
+
+    mode = models.CharField(max_length=32, db_index=True)
+    source_pages = models.IntegerField()
+    output_pages = models.IntegerField()
+    model_seconds = models.FloatField()
+    model_bytes = models.BigIntegerField()
+    actual_seconds = models.FloatField()
+    actual_bytes = models.BigIntegerField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self) -> str:
+        return f"{self.mode}: {self.output_pages} pages in {self.actual_seconds:.1f}s"
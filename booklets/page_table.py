@@ -0,0 +1,123 @@
+from __future__ import annotations
+
+from array import array
+from collections.abc import Iterator, Sequence
+from dataclasses import dataclass
+
+
+@dataclass(frozen=True, slots=True)
+class PreparedPage:
+    source_pdf_path: str | None
+    source_page_number: int | None
+    width: float
+    height: float
+    margin_cm: float
+    add_watermark: bool = False
+
+    @property
+    def is_blank(self) -> bool:
+        return self.source_pdf_path is None or self.source_page_number is None
+
+
+class PageTable(Sequence):
+    """
+    Prepared pages stored column-wise: one typed array per field and an
+    interned table of source paths, about 33 bytes per page instead of a
+    dataclass instance each. Slicing returns a view over the same arrays
+    (no copy), indexing builds the PreparedPage on demand, and pickling
+    only carries the rows of the view.
+    """
+
+    _COLUMNS = ("_source_index", "_page_number", "_width", "_height", "_margin_cm", "_watermark")
+    __slots__ = ("_sources", "_source_ids", *_COLUMNS, "_start", "_stop")
+
+    def __init__(
+        self,
+        sources: list[str] | None = None,
+        source_index: array | None = None,
+        page_number: array | None = None,
+        width: array | None = None,
+        height: array | None = None,
+        margin_cm: array | None = None,
+        watermark: array | None = None,
+    ):
+        self._sources = sources if sources is not None else []
+        self._source_ids = {path: index for index, path in enumerate(self._sources)}
+        self._source_index = source_index if source_index is not None else array("i")
+        self._page_number = page_number if page_number is not None else array("i")
+        self._width = width if width is not None else array("d")
+        self._height = height if height is not None else array("d")
+        self._margin_cm = margin_cm if margin_cm is not None else array("d")
+        self._watermark = watermark if watermark is not None else array("B")
+        self._start = 0
+        self._stop = len(self._page_number)
+
+    def append(self, page: PreparedPage) -> None:
+        if self._start != 0 or self._stop != len(self._page_number):
+            raise ValueError("Cannot append to a slice of a page table.")
+
+        if page.is_blank:
+            source_index = -1
+            page_number = -1
+        else:
+            source_index = self._source_ids.get(page.source_pdf_path)
+            if source_index is None:
+                source_index = len(self._sources)
+                self._sources.append(page.source_pdf_path)
+                self._source_ids[page.source_pdf_path] = source_index
+            page_number = page.source_page_number
+
+        self._source_index.append(source_index)
+        self._page_number.append(page_number)
+        self._width.append(page.width)
+        self._height.append(page.height)
+        self._margin_cm.append(page.margin_cm)
+        self._watermark.append(1 if page.add_watermark else 0)
+        self._stop += 1
+
+    def _row(self, row: int) -> PreparedPage:
+        source_index = self._source_index[row]
+        blank = source_index < 0
+        return PreparedPage(
+            source_pdf_path=None if blank else self._sources[source_index],
+            source_page_number=None if blank else self._page_number[row],
+            width=self._width[row],
+            height=self._height[row],
+            margin_cm=self._margin_cm[row],
+            add_watermark=bool(self._watermark[row]),
+        )
+
+    def __len__(self) -> int:
+        return self._stop - self._start
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            start, stop, step = index.indices(len(self))
+            if step != 1:
+                return [self[position] for position in range(start, stop, step)]
+            view = object.__new__(PageTable)
+            for name in ("_sources", "_source_ids", *self._COLUMNS):
+                setattr(view, name, getattr(self, name))
+            view._start = self._start + start
+            view._stop = self._start + max(start, stop)
+            return view
+
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("page table index out of range")
+        return self._row(self._start + index)
+
+    def __iter__(self) -> Iterator[PreparedPage]:
+        for row in range(self._start, self._stop):
+            yield self._row(row)
+
+    def __reduce__(self):
+        window = slice(self._start, self._stop)
+        return (
+            PageTable,
+            (
+                self._sources,
+                *(getattr(self, name)[window] for name in self._COLUMNS),
+            ),
+        )
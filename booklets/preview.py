@@ -0,0 +1,248 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import tempfile
+import time
+from dataclasses import asdict, dataclass
+
+import fitz
+
+from pdf_manager_project.file_hash import file_content_hash
+from pdf_manager_project.pdf_colorspace import page_colorspace, render_pixmap
+from pdf_manager_project.pdf_sandbox import run_sandboxed, upload_limits
+
+from .flipped_a4 import FLIPPED_A4_CENTER_GAP_CM, create_flipped_a4_booklet, flipped_a4_output_page_count
+from .imposition import nup_layout
+from .services import (
+    SourcePdfSpec,
+    booklet_output_page_count,
+    compute_split_ranges,
+    create_booklet,
+    prepare_pages_for_specs,
+    specs_with_cover,
+)
+
+
+PREVIEW_ZOOM = 0.35
+# Previews nobody has requested for this long are swept from the cache.
+PREVIEW_MAX_AGE_SECONDS = 24 * 3600
+
+
+@dataclass(frozen=True)
+class PreviewOptions:
+    booklet_layout: str = "side_by_side"
+    max_pages_per_split: int = 40
+    preserve_file_parity: bool = True
+    generate_cover: bool = False
+    split_mode: str = "vector"
+    center_gap_cm: float = FLIPPED_A4_CENTER_GAP_CM
+    pages_per_side: int = 2
+    binding: str = "saddle"
+
+
+def _split_page_counts(specs: list[SourcePdfSpec], options: PreviewOptions, tmp_dir: str):
+    specs_to_process = specs_with_cover(specs, tmp_dir, options.generate_cover)
+    prepared_pages = prepare_pages_for_specs(specs_to_process, preserve_file_parity=options.preserve_file_parity)
+    split_ranges = compute_split_ranges(len(prepared_pages), options.max_pages_per_split)
+    return prepared_pages, split_ranges
+
+
+def _output_page_count(options: PreviewOptions, page_count: int) -> int:
+    if options.booklet_layout == "flipped_a4":
+        return flipped_a4_output_page_count(page_count)
+    return booklet_output_page_count(page_count, nup_layout(options.pages_per_side, options.binding))
+
+
+def preview_sheet_count(specs: list[SourcePdfSpec], options: PreviewOptions) -> int:
+    with tempfile.TemporaryDirectory(prefix="pdf_manager_preview_") as tmp:
+        _, split_ranges = _split_page_counts(specs, options, tmp)
+    return sum(_output_page_count(options, end - start + 1) for start, end in split_ranges)
+
+
+def resolve_preview_sheets(selection: str, sheet_count: int) -> list[int]:
+    """
+    Turns "first,middle,last" or 1-based ranges such as "1-3,7" into
+    0-based sheet indexes, dropping anything outside the output.
+    """
+    if sheet_count <= 0:
+        return []
+
+    named = {"first": 0, "middle": (sheet_count - 1) // 2, "last": sheet_count - 1}
+    indexes: list[int] = []
+    for token in (selection or "first,middle,last").split(","):
+        token = token.strip().lower()
+        if not token:
+            continue
+        if token in named:
+            candidates = [named[token]]
+        elif "-" in token:
+            start_raw, end_raw = token.split("-", 1)
+            try:
+                start, end = int(start_raw), int(end_raw)
+            except ValueError as exc:
+                raise ValueError(f"Invalid sheet range: '{token}'.") from exc
+            candidates = list(range(start - 1, end))
+        else:
+            try:
+                candidates = [int(token) - 1]
+            except ValueError as exc:
+                raise ValueError(f"Invalid sheet: '{token}'.") from exc
+
+        for index in candidates:
+            if 0 <= index < sheet_count and index not in indexes:
+                indexes.append(index)
+    return indexes
+
+
+def preview_cache_key(specs: list[SourcePdfSpec], options: PreviewOptions, sheet_index: int) -> str:
+    """
+    Hashes the inputs (their paths as well as their content: a key belongs
+    to the session that uploaded those files), options and sheet.
+    """
+    payload = {
+        "inputs": [
+            {
+                "path": spec.input_pdf_path,
+                "hash": file_content_hash(spec.input_pdf_path),
+                "same_page_parity": spec.same_page_parity,
+                "margin_cm": spec.margin_cm,
+                "add_watermark": spec.add_watermark,
+                "page_ranges": spec.page_ranges,
+            }
+            for spec in specs
+        ],
+        "options": asdict(options),
+        "sheet_index": sheet_index,
+        "zoom": PREVIEW_ZOOM,
+    }
+    return hashlib.sha256(json.dumps(payload, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def register_preview(cache_dir: str, specs: list[SourcePdfSpec], options: PreviewOptions, sheet_index: int) -> str:
+    """
+    Records what a preview key stands for so the PNG can be rendered lazily
+    the first time its URL is requested.
+    """
+    os.makedirs(cache_dir, exist_ok=True)
+    key = preview_cache_key(specs, options, sheet_index)
+    request_path = os.path.join(cache_dir, f"{key}.json")
+    if os.path.isfile(request_path):
+        os.utime(request_path)
+    else:
+        with open(request_path, "w", encoding="utf-8") as fh:
+            json.dump(
+                {
+                    "specs": [asdict(spec) for spec in specs],
+                    "options": asdict(options),
+                    "sheet_index": sheet_index,
+                },
+                fh,
+            )
+    return key
+
+
+def sweep_previews(cache_dir: str, max_age_seconds: float = PREVIEW_MAX_AGE_SECONDS) -> None:
+    """Removes preview requests and PNGs that were not used for max_age_seconds."""
+    cutoff = time.time() - max_age_seconds
+    try:
+        names = os.listdir(cache_dir)
+    except OSError:
+        return
+    for name in names:
+        path = os.path.join(cache_dir, name)
+        try:
+            if os.stat(path).st_mtime < cutoff:
+                os.remove(path)
+        except OSError:
+            continue
+
+
+def load_preview_png(cache_dir: str, key: str, allowed_paths: set[str]) -> bytes | None:
+    """
+    Returns the PNG of a registered preview whose inputs are all in
+    allowed_paths (the uploads of the requesting session), rendering it
+    first (in the PDF sandbox, under the upload limits) when it is not
+    cached yet.
+    """
+    request_path = os.path.join(cache_dir, f"{key}.json")
+    try:
+        with open(request_path, encoding="utf-8") as fh:
+            request = json.load(fh)
+    except OSError:
+        return None
+    specs = [SourcePdfSpec(**spec) for spec in request["specs"]]
+    if not all(spec.input_pdf_path in allowed_paths for spec in specs):
+        return None
+    os.utime(request_path)
+
+    png_path = os.path.join(cache_dir, f"{key}.png")
+    if os.path.isfile(png_path):
+        with open(png_path, "rb") as fh:
+            png = fh.read()
+        os.utime(png_path)
+        return png
+
+    if not all(os.path.isfile(spec.input_pdf_path) for spec in specs):
+        return None
+
+    png = run_sandboxed(
+        render_preview_sheet,
+        specs,
+        PreviewOptions(**request["options"]),
+        int(request["sheet_index"]),
+        limits=upload_limits(),
+    )
+    tmp_path = f"{png_path}.tmp"
+    with open(tmp_path, "wb") as fh:
+        fh.write(png)
+    os.replace(tmp_path, png_path)
+    return png
+
+
+def render_preview_sheet(
+    specs: list[SourcePdfSpec],
+    options: PreviewOptions,
+    sheet_index: int,
+    zoom: float = PREVIEW_ZOOM,
+) -> bytes:
+    """
+    Imposes only the split that contains sheet_index, renders only that
+    sheet, and returns it as a PNG thumbnail (gray for black-and-white
+    sheets).
+    """
+    with tempfile.TemporaryDirectory(prefix="pdf_manager_preview_") as tmp:
+        prepared_pages, split_ranges = _split_page_counts(specs, options, tmp)
+
+        first_sheet = 0
+        for start_idx, end_idx in split_ranges:
+            split_sheets = _output_page_count(options, end_idx - start_idx + 1)
+            if sheet_index < first_sheet + split_sheets:
+                break
+            first_sheet += split_sheets
+        else:
+            raise ValueError("Sheet is outside the generated output.")
+
+        output_path = os.path.join(tmp, "preview.pdf")
+        sheet_numbers = {sheet_index - first_sheet + 1}
+        if options.booklet_layout == "flipped_a4":
+            create_flipped_a4_booklet(
+                prepared_pages[start_idx : end_idx + 1],
+                output_path,
+                render_quality="very_low",
+                center_gap_cm=options.center_gap_cm,
+                split_mode=options.split_mode,
+                sheet_numbers=sheet_numbers,
+            )
+        else:
+            create_booklet(
+                prepared_pages[start_idx : end_idx + 1],
+                output_path,
+                sheet_numbers=sheet_numbers,
+                layout=nup_layout(options.pages_per_side, options.binding),
+            )
+
+        with fitz.open(output_path) as doc:
+            page = doc[0]
+            return render_pixmap(page, fitz.Matrix(zoom, zoom), page_colorspace(page)).tobytes("png")
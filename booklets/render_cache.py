@@ -0,0 +1,143 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import uuid
+
+import fitz
+
+
+class DiskLRUCache:
+    """
+    Content-addressed files under cache_dir, shared across jobs. Reads
+    refresh an entry's mtime and trim() drops the least recently used
+    entries until the cache fits in max_mb.
+    """
+
+    suffix = ".bin"
+    # Files left by earlier versions of the cache; trim() removes them.
+    legacy_suffixes: tuple[str, ...] = ()
+
+    def __init__(self, cache_dir: str, max_mb: float):
+        self.cache_dir = cache_dir
+        self.max_bytes = int(max_mb * 1024 * 1024)
+
+    @staticmethod
+    def hash_key(payload: object) -> str:
+        return hashlib.sha256(json.dumps(payload, sort_keys=True).encode("utf-8")).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key[:2], f"{key}{self.suffix}")
+
+    def get(self, key: str) -> bytes | None:
+        path = self._path(key)
+        try:
+            with open(path, "rb") as fh:
+                data = fh.read()
+            os.utime(path)
+        except OSError:
+            return None
+        return data
+
+    def put(self, key: str, data: bytes) -> None:
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        with open(tmp_path, "wb") as fh:
+            fh.write(data)
+        os.replace(tmp_path, path)
+
+    def trim(self) -> None:
+        entries: list[tuple[float, int, str]] = []
+        total = 0
+        for root, _, files in os.walk(self.cache_dir):
+            for name in files:
+                path = os.path.join(root, name)
+                if self.legacy_suffixes and name.endswith(self.legacy_suffixes):
+                    try:
+                        os.remove(path)
+                    except OSError:
+                        pass
+                    continue
+                if not name.endswith(self.suffix):
+                    continue
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+                total += stat.st_size
+
+        entries.sort()
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+
+
+class RasterHalfCache(DiskLRUCache):
+    """
+    Encoded half-page images: JPEG for color and gray pages, PNG for
+    bilevel ones, hence the neutral suffix. Entries are keyed by everything
+    that changes the pixels (file content, page, the half's clip rect and
+    therefore its split line, render scale and JPEG quality) plus the
+    encoding version, and nothing that only changes placement, so
+    regenerating an upload with another center gap, margin, split size or
+    parity reuses every rendered half.
+    """
+
+    suffix = ".img"
+    legacy_suffixes = (".jpg",)
+    # Bump when the image encoding changes so old entries are not served.
+    encoding_version = 2
+
+    @classmethod
+    def key(
+        cls,
+        file_hash: str,
+        page_number: int,
+        clip: tuple[float, float, float, float],
+        render_scale: float,
+        jpeg_quality: int,
+    ) -> str:
+        return cls.hash_key(
+            [
+                cls.encoding_version,
+                file_hash,
+                page_number,
+                [round(value, 3) for value in clip],
+                render_scale,
+                jpeg_quality,
+            ]
+        )
+
+
+class SheetFragmentCache(DiskLRUCache):
+    """
+    Finished output sheets stored as single-page PDFs. The key must cover
+    everything the sheet depends on (page fingerprints, margins, rotations,
+    watermark and layout geometry); the imposition code builds it.
+    """
+
+    suffix = ".pdf"
+
+    def append_cached_sheet(self, doc_out: fitz.Document, key: str) -> bool:
+        data = self.get(key)
+        if data is None:
+            return False
+        try:
+            with fitz.open(stream=data, filetype="pdf") as fragment:
+                doc_out.insert_pdf(fragment)
+        except (RuntimeError, ValueError):
+            return False
+        return True
+
+    def store_last_sheet(self, doc_out: fitz.Document, key: str) -> None:
+        with fitz.open() as fragment:
+            fragment.insert_pdf(doc_out, from_page=doc_out.page_count - 1, to_page=doc_out.page_count - 1)
+            self.put(key, fragment.tobytes(garbage=1, deflate=True))
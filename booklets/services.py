@@ -1,13 +1,34 @@
 from __future__ import annotations
 
+import hashlib
 import os
-import tempfile
-import uuid
+import re
+from collections.abc import Iterable, Iterator, Sequence
 from dataclasses import dataclass
 
 import fitz  # PyMuPDF
 from django.utils import timezone
 from pdf_manager_project.pdf_cover import collect_cover_entries, create_cover_pdf
+from pdf_manager_project.page_ranges import selected_page_indexes
+from pdf_manager_project.pdf_analysis import UploadAnalysisCache, page_content_rect
+from pdf_manager_project.pdf_optimize import downsample_images, optimize_output_fonts
+
+from .checkpoint import job_checkpoint
+from .flatten import SheetImageFormat, flatten_pdf_to_raster, zip_sheet_images
+from .imposition import (
+    SIDE_BY_SIDE_LAYOUT,
+    Binding,
+    CellPlacement,
+    ImpositionLayout,
+    imposed_side_count,
+    nup_layout,
+    padded_page_count,
+    placement_table,
+)
+from .job_features import JobFeatures, finished_job_features, recorded_pages
+from .memory import JobMemoryMonitor, release_schedule
+from .page_table import PageTable, PreparedPage
+from .render_cache import SheetFragmentCache
 
 
 @dataclass(frozen=True)
@@ -16,63 +37,107 @@ class SourcePdfSpec:
     same_page_parity: bool
     margin_cm: float
     add_watermark: bool
-
-
-@dataclass(frozen=True)
-class PreparedPage:
-    source_pdf_path: str | None
-    source_page_number: int | None
-    width: float
-    height: float
-    margin_cm: float
-    add_watermark: bool = False
-
-    @property
-    def is_blank(self) -> bool:
-        return self.source_pdf_path is None or self.source_page_number is None
+    # 1-based selection such as "1-20,45"; empty means every page.
+    page_ranges: str = ""
 
 
 @dataclass(frozen=True)
 class BookletJobResult:
     job_id: str
     output_pdf_path: str
+    peak_rss_mb: float | None = None
+    # Zip of per-sheet images, only for flattened jobs that asked for them.
+    sheet_images_path: str | None = None
+    # Quality profile picked to meet a flipped job's max output size.
+    chosen_quality: str | None = None
+    # Cost model inputs of the pages the job imposed, for calibration.
+    features: JobFeatures | None = None
 
 
-def detect_content_bbox(page: fitz.Page, margin_pts: float) -> fitz.Rect:
-    content_rects = []
-
-    for block in page.get_text("blocks"):
-        content_rects.append(fitz.Rect(block[:4]))
+_XREF_REFERENCE_RE = re.compile(r"(\d+) \d+ R")
 
-    raw_dict = page.get_text("rawdict")
-    for block in raw_dict.get("blocks", []):
-        if block.get("type") == 1 and "bbox" in block:
-            content_rects.append(fitz.Rect(block["bbox"]))
+# Bump when placement code changes so cached sheet fragments are not reused.
+SHEET_CACHE_VERSION = 2
 
-    for item in page.get_drawings():
-        rect = item.get("rect")
-        if rect and rect.is_valid:
-            content_rects.append(rect)
 
-    if not content_rects:
+def _hash_object_text(
+    doc: fitz.Document,
+    text: str,
+    hasher,
+    digests: dict[int, bytes],
+    active: set[int],
+) -> None:
+    hasher.update(_XREF_REFERENCE_RE.sub("R", text).encode("utf-8", "surrogateescape"))
+    for reference in _XREF_REFERENCE_RE.findall(text):
+        hasher.update(_xref_digest(doc, int(reference), digests, active))
+
+
+def _xref_digest(doc: fitz.Document, xref: int, digests: dict[int, bytes], active: set[int]) -> bytes:
+    cached = digests.get(xref)
+    if cached is not None:
+        return cached
+    if xref in active or xref <= 0 or xref >= doc.xref_length():
+        return b"R"
+
+    active.add(xref)
+    hasher = hashlib.sha1()
+    _hash_object_text(doc, doc.xref_object(xref, compressed=True), hasher, digests, active)
+    if doc.xref_is_stream(xref):
+        hasher.update(doc.xref_stream_raw(xref) or b"")
+    active.discard(xref)
+
+    digest = hasher.digest()
+    digests[xref] = digest
+    return digest
+
+
+def page_content_fingerprint(
+    doc: fitz.Document,
+    page_number: int,
+    digests: dict[int, bytes] | None = None,
+) -> str:
+    """
+    Hashes what a page draws: its boxes, rotation, content streams and every
+    object reachable from its resources. Identical pages get the same value
+    even when they live at different page numbers or in different files.
+
+    Pages whose look cannot be derived from those objects alone (annotations,
+    inherited resources) fall back to an identity-based fingerprint.
+    """
+    page = doc[page_number]
+    digests = {} if digests is None else digests
+    hasher = hashlib.sha1()
+    hasher.update(f"{tuple(page.mediabox)}|{tuple(page.cropbox)}|{page.rotation}".encode())
+
+    if doc.xref_get_key(page.xref, "Annots")[0] != "null" or doc.xref_get_key(page.xref, "Resources")[0] == "null":
+        hasher.update(f"{doc.name}|{page_number}".encode())
+
+    for key in ("Resources", "Contents"):
+        _, value = doc.xref_get_key(page.xref, key)
+        hasher.update(key.encode())
+        _hash_object_text(doc, value, hasher, digests, set())
+
+    return hasher.hexdigest()
+
+
+def _content_clip_rect(page: fitz.Page, content_rect: fitz.Rect | None, margin_pts: float) -> fitz.Rect:
+    if content_rect is None:
         return page.rect
 
-    x0 = min(r.x0 for r in content_rects)
-    y0 = min(r.y0 for r in content_rects)
-    x1 = max(r.x1 for r in content_rects)
-    y1 = max(r.y1 for r in content_rects)
-    bbox = fitz.Rect(x0, y0, x1, y1)
-
     clip_rect = fitz.Rect(
-        max(bbox.x0 - margin_pts, 0),
-        max(bbox.y0 - margin_pts, 0),
-        min(bbox.x1 + margin_pts, page.rect.width),
-        min(bbox.y1 + margin_pts, page.rect.height),
+        max(content_rect.x0 - margin_pts, 0),
+        max(content_rect.y0 - margin_pts, 0),
+        min(content_rect.x1 + margin_pts, page.rect.width),
+        min(content_rect.y1 + margin_pts, page.rect.height),
     )
 
     return clip_rect if clip_rect.is_valid else page.rect
 
 
+def detect_content_bbox(page: fitz.Page, margin_pts: float) -> fitz.Rect:
+    return _content_clip_rect(page, page_content_rect(page), margin_pts)
+
+
 def add_watermark_to_page(page: fitz.Page) -> None:
     text = "*"
     font_size = 20
@@ -89,15 +154,84 @@ def add_watermark_to_page(page: fitz.Page) -> None:
     )
 
 
-def merge_pdfs(input_paths: list[str], output_path: str) -> None:
+def merge_pdfs(
+    input_paths: list[str],
+    output_path: str,
+    subset_fonts: bool = False,
+    max_image_dpi: int | None = None,
+) -> None:
     merged = fitz.open()
     for path in input_paths:
         with fitz.open(path) as doc:
             merged.insert_pdf(doc)
-    merged.save(output_path)
+    optimize_output_fonts(merged, subset_fonts=subset_fonts)
+    if max_image_dpi:
+        downsample_images(merged, max_dpi=max_image_dpi)
+    merged.save(output_path, garbage=1, deflate=subset_fonts)
     merged.close()
 
 
+def _release_source_doc(
+    source_pdf_path: str,
+    source_docs: dict[str, fitz.Document],
+    canonical_pages: dict[str, fitz.Page],
+    fingerprint_digests: dict[str, dict[int, bytes]],
+) -> None:
+    fingerprint_digests.pop(source_pdf_path, None)
+    doc = source_docs.pop(source_pdf_path, None)
+    if doc is None:
+        return
+
+    for fingerprint, page in list(canonical_pages.items()):
+        if page.parent is doc:
+            del canonical_pages[fingerprint]
+    doc.close()
+
+
+def _spill_output_part(
+    doc_out: fitz.Document,
+    output_pdf_path: str,
+    part_paths: list[str],
+    **save_options,
+) -> fitz.Document:
+    """
+    Saves the sheets imposed so far to a part file and returns a fresh output
+    document, so finished sheets no longer count against the memory budget.
+    """
+    if doc_out.page_count > 0:
+        part_path = f"{output_pdf_path}.part{len(part_paths) + 1:03}"
+        doc_out.save(part_path, **save_options)
+        part_paths.append(part_path)
+    doc_out.close()
+    fitz.TOOLS.store_shrink(100)
+    return fitz.open()
+
+
+def _save_output(
+    doc_out: fitz.Document,
+    output_pdf_path: str,
+    part_paths: list[str],
+    **save_options,
+) -> None:
+    if not part_paths:
+        doc_out.save(output_pdf_path, **save_options)
+        return
+
+    if doc_out.page_count > 0:
+        part_path = f"{output_pdf_path}.part{len(part_paths) + 1:03}"
+        doc_out.save(part_path, **save_options)
+        part_paths.append(part_path)
+
+    # Appends one part at a time as an incremental update and reopens the
+    # output in between, so only one part's objects are loaded at once.
+    os.replace(part_paths[0], output_pdf_path)
+    for part_path in part_paths[1:]:
+        with fitz.open(output_pdf_path) as merged, fitz.open(part_path) as part:
+            merged.insert_pdf(part)
+            merged.saveIncr()
+        os.remove(part_path)
+
+
 def compute_split_ranges(total_pages: int, max_pages_per_split: int) -> list[tuple[int, int]]:
     split_ranges: list[tuple[int, int]] = []
     split_count = 0
@@ -125,25 +259,65 @@ def compute_split_ranges(total_pages: int, max_pages_per_split: int) -> list[tup
     return split_ranges
 
 
-def prepare_pages_for_specs(
+def specs_with_cover(
+    specs: list[SourcePdfSpec],
+    tmp_dir: str,
+    generate_cover: bool,
+    analysis_cache: UploadAnalysisCache | None = None,
+) -> list[SourcePdfSpec]:
+    specs_to_process = list(specs)
+    if not generate_cover:
+        return specs_to_process
+
+    cover_path = os.path.join(tmp_dir, "cover.pdf")
+    create_cover_pdf(
+        output_path=cover_path,
+        entries=collect_cover_entries(
+            [spec.input_pdf_path for spec in specs],
+            page_ranges=[spec.page_ranges for spec in specs],
+            analysis_cache=analysis_cache,
+        ),
+        generated_on=timezone.localdate(),
+        heading="Booklet index",
+    )
+    specs_to_process.insert(
+        0,
+        SourcePdfSpec(
+            input_pdf_path=cover_path,
+            same_page_parity=True,
+            margin_cm=0.0,
+            add_watermark=False,
+        ),
+    )
+    return specs_to_process
+
+
+def iter_prepared_pages(
     specs: list[SourcePdfSpec],
     preserve_file_parity: bool,
-) -> list[PreparedPage]:
-    prepared_pages: list[PreparedPage] = []
+) -> Iterator[PreparedPage]:
+    """
+    Yields the prepared pages of one spec after another. Each file is
+    measured and closed before its pages are handed out, so a consumer
+    can impose early splits before later files have been opened.
+    """
+    page_count = 0
 
     for spec in specs:
+        spec_pages: list[PreparedPage] = []
         with fitz.open(spec.input_pdf_path) as doc:
             if len(doc) == 0:
                 raise ValueError(f"Empty PDF: {os.path.basename(spec.input_pdf_path)}")
 
-            first_page = doc[0]
+            page_numbers = selected_page_indexes(spec.page_ranges, len(doc))
+            first_page = doc[page_numbers[0]]
             desired_is_odd = spec.same_page_parity
 
             if preserve_file_parity:
-                next_page_number = len(prepared_pages) + 1
+                next_page_number = page_count + 1
                 starts_on_odd = (next_page_number % 2) == 1
                 if starts_on_odd != desired_is_odd:
-                    prepared_pages.append(
+                    spec_pages.append(
                         PreparedPage(
                             source_pdf_path=None,
                             source_page_number=None,
@@ -154,150 +328,274 @@ def prepare_pages_for_specs(
                         )
                     )
 
-            for page_number in range(len(doc)):
+            for position, page_number in enumerate(page_numbers):
                 page = doc[page_number]
-                prepared_pages.append(
+                spec_pages.append(
                     PreparedPage(
                         source_pdf_path=spec.input_pdf_path,
                         source_page_number=page_number,
                         width=page.rect.width,
                         height=page.rect.height,
                         margin_cm=spec.margin_cm,
-                        add_watermark=spec.add_watermark and page_number == 0,
+                        add_watermark=spec.add_watermark and position == 0,
                     )
                 )
 
+        page_count += len(spec_pages)
+        yield from spec_pages
+
+
+def prepare_pages_for_specs(
+    specs: list[SourcePdfSpec],
+    preserve_file_parity: bool,
+) -> PageTable:
+    prepared_pages = PageTable()
+    for page in iter_prepared_pages(specs, preserve_file_parity):
+        prepared_pages.append(page)
     return prepared_pages
 
 
+def iter_split_pages(
+    pages: Iterable[PreparedPage],
+    max_pages_per_split: int,
+) -> Iterator[list[PreparedPage]]:
+    """
+    Streaming counterpart of compute_split_ranges: yields the pages of each
+    split as soon as they are known, with the same boundaries and parity
+    rules. Only one split plus one page of lookahead is held at a time.
+    """
+    pending = iter(pages)
+    buffer: list[PreparedPage] = []
+    current_index = 0
+    split_count = 0
+
+    def fill(count: int) -> None:
+        while len(buffer) < count:
+            page = next(pending, None)
+            if page is None:
+                return
+            buffer.append(page)
+
+    while True:
+        fill(1)
+        if not buffer:
+            return
+        if split_count > 0 and current_index % 2 == 1:
+            buffer.pop(0)
+            current_index += 1
+            fill(1)
+            if not buffer:
+                return
+
+        # One page past the split tells whether a next split starts.
+        fill(max_pages_per_split + 1)
+        size = min(max_pages_per_split, len(buffer))
+        if len(buffer) > size and (current_index + size) % 2 == 1:
+            size -= 1
+        size = max(size, 1)
+
+        yield buffer[:size]
+        del buffer[:size]
+        current_index += size
+        split_count += 1
+
+
+def booklet_output_page_count(page_count: int, layout: ImpositionLayout = SIDE_BY_SIDE_LAYOUT) -> int:
+    return imposed_side_count(layout, page_count)
+
+
 def create_booklet(
-    prepared_pages: list[PreparedPage],
+    prepared_pages: Sequence[PreparedPage],
     output_pdf_path: str,
+    memory_monitor: JobMemoryMonitor | None = None,
+    sheet_numbers: set[int] | None = None,
+    layout: ImpositionLayout = SIDE_BY_SIDE_LAYOUT,
+    sheet_cache: SheetFragmentCache | None = None,
+    analysis_cache: UploadAnalysisCache | None = None,
 ) -> None:
+    """
+    Imposes prepared pages with an N-up layout (2-up saddle stitch by default).
+
+    sheet_numbers (1-based output pages) restricts the output to those
+    sheets, which is how previews render a single sheet cheaply.
+
+    With a sheet_cache, every sheet is keyed by the fingerprints, margins
+    and cells of the pages on it; sheets seen in an earlier job are copied
+    from the cache instead of being imposed again.
+
+    With an analysis_cache, content boxes of analysed uploads are read from
+    it instead of being detected again.
+    """
     source_docs: dict[str, fitz.Document] = {}
+    fingerprint_digests: dict[str, dict[int, bytes]] = {}
+    canonical_pages: dict[str, fitz.Page] = {}
+    content_bboxes: dict[tuple[str, float], fitz.Rect] = {}
+    analysed_content_rects: dict[str, list[fitz.Rect | None] | None] = {}
+    part_paths: list[str] = []
+    reused_sheets = 0
     doc_out = fitz.open()
 
     try:
-        out_width = 842
-        out_height = 595
-
-        page_plan = list(prepared_pages)
-        while len(page_plan) % 4 != 0:
-            template_page = page_plan[-1] if page_plan else PreparedPage(None, None, 595, 842, 1.0, False)
-            page_plan.append(
-                PreparedPage(
-                    source_pdf_path=None,
-                    source_page_number=None,
-                    width=template_page.width,
-                    height=template_page.height,
-                    margin_cm=template_page.margin_cm,
-                    add_watermark=False,
-                )
+        # Padding blanks are not stored; indexes past the prepared pages
+        # resolve to one shared blank shaped like the last page.
+        page_count = len(prepared_pages)
+        template_page = prepared_pages[-1] if page_count else PreparedPage(None, None, 595, 842, 1.0, False)
+        padding_page = PreparedPage(
+            source_pdf_path=None,
+            source_page_number=None,
+            width=template_page.width,
+            height=template_page.height,
+            margin_cm=template_page.margin_cm,
+            add_watermark=False,
+        )
+
+        def plan_page(page_index: int) -> PreparedPage:
+            return prepared_pages[page_index] if page_index < page_count else padding_page
+
+        sides = placement_table(layout, padded_page_count(layout, page_count))
+
+        streaming = memory_monitor is not None and memory_monitor.streaming
+        releases = (
+            release_schedule(
+                [plan_page(idx).source_pdf_path for idx, _ in side if not plan_page(idx).is_blank]
+                if sheet_numbers is None or sheet_number in sheet_numbers
+                else []
+                for sheet_number, side in enumerate(sides, start=1)
+            )
+            if streaming
+            else {}
+        )
+
+        def open_source_page(prepared_page: PreparedPage) -> fitz.Page:
+            assert prepared_page.source_pdf_path is not None
+            assert prepared_page.source_page_number is not None
+
+            doc_in = source_docs.get(prepared_page.source_pdf_path)
+            if doc_in is None:
+                doc_in = fitz.open(prepared_page.source_pdf_path)
+                source_docs[prepared_page.source_pdf_path] = doc_in
+            return doc_in[prepared_page.source_page_number]
+
+        def source_fingerprint(prepared_page: PreparedPage) -> str:
+            page_in = open_source_page(prepared_page)
+            return page_content_fingerprint(
+                page_in.parent,
+                page_in.number,
+                fingerprint_digests.setdefault(prepared_page.source_pdf_path, {}),
             )
 
-        left_pages = list(range(len(page_plan) - 1, len(page_plan) // 2 - 1, -1))
-        right_pages = list(range(0, len(page_plan) // 2))
-
-        for sheet_number, (left_idx, right_idx) in enumerate(zip(left_pages, right_pages), start=1):
-            page_out = doc_out.new_page(width=out_width, height=out_height)
-
-            left_page = page_plan[left_idx]
-            right_page = page_plan[right_idx]
-
-            def place_prepared_page(
-                prepared_page: PreparedPage,
-                cell_x0: float,
-                cell_y0: float,
-                cell_x1: float,
-                cell_y1: float,
-                rotation: int,
-            ) -> None:
-                if prepared_page.is_blank:
-                    return
-
-                assert prepared_page.source_pdf_path is not None
-                assert prepared_page.source_page_number is not None
-
-                doc_in = source_docs.get(prepared_page.source_pdf_path)
-                if doc_in is None:
-                    doc_in = fitz.open(prepared_page.source_pdf_path)
-                    source_docs[prepared_page.source_pdf_path] = doc_in
-
-                page_in = doc_in[prepared_page.source_page_number]
-                margin_pts = prepared_page.margin_cm * 72 / 2.54
-                bbox = detect_content_bbox(page_in, margin_pts)
-                col_width = max(cell_x1 - cell_x0 - (2 * margin_pts), 1)
-                col_height = max(cell_y1 - cell_y0 - (2 * margin_pts), 1)
-                scale = min(col_width / bbox.width, col_height / bbox.height)
-                w_scaled = bbox.width * scale
-                h_scaled = bbox.height * scale
-                x_draw = cell_x0 + margin_pts + (col_width - w_scaled) / 2
-                y_draw = cell_y0 + margin_pts + (col_height - h_scaled) / 2
+        def sheet_key(side) -> str:
+            placed_pages = [(plan_page(page_index), cell) for page_index, cell in side]
+            return SheetFragmentCache.hash_key(
+                [
+                    "booklet",
+                    SHEET_CACHE_VERSION,
+                    layout.sheet_width,
+                    layout.sheet_height,
+                    [
+                        None
+                        if page.is_blank
+                        else [
+                            source_fingerprint(page),
+                            page.margin_cm,
+                            page.add_watermark,
+                            [cell.x0, cell.y0, cell.x1, cell.y1, cell.rotation],
+                        ]
+                        for page, cell in placed_pages
+                    ],
+                ]
+            )
 
+        def place_prepared_page(page_out: fitz.Page, prepared_page: PreparedPage, cell: CellPlacement) -> None:
+            if prepared_page.is_blank:
+                return
+
+            page_in = open_source_page(prepared_page)
+            rotation = (page_in.rotation + cell.rotation) % 360
+            fingerprint = source_fingerprint(prepared_page)
+            # Identical pages are placed from a single source page so the
+            # output references one shared XObject for all of them.
+            page_in = canonical_pages.setdefault(fingerprint, page_in)
+            doc_in = page_in.parent
+            margin_pts = prepared_page.margin_cm * 72 / 2.54
+            bbox = content_bboxes.get((fingerprint, margin_pts))
+            if bbox is None:
+                content_rects = None
+                if analysis_cache is not None:
+                    if prepared_page.source_pdf_path not in analysed_content_rects:
+                        analysed_content_rects[prepared_page.source_pdf_path] = analysis_cache.content_rects(
+                            prepared_page.source_pdf_path
+                        )
+                    content_rects = analysed_content_rects[prepared_page.source_pdf_path]
+                if content_rects is not None:
+                    bbox = _content_clip_rect(page_in, content_rects[prepared_page.source_page_number], margin_pts)
+                else:
+                    bbox = detect_content_bbox(page_in, margin_pts)
+                content_bboxes[(fingerprint, margin_pts)] = bbox
+            col_width = max(cell.x1 - cell.x0 - (2 * margin_pts), 1)
+            col_height = max(cell.y1 - cell.y0 - (2 * margin_pts), 1)
+            scale = min(col_width / bbox.width, col_height / bbox.height)
+            w_scaled = bbox.width * scale
+            h_scaled = bbox.height * scale
+            x_draw = cell.x0 + margin_pts + (col_width - w_scaled) / 2
+            y_draw = cell.y0 + margin_pts + (col_height - h_scaled) / 2
+
+            try:
+                page_out.show_pdf_page(
+                    fitz.Rect(x_draw, y_draw, x_draw + w_scaled, y_draw + h_scaled),
+                    doc_in,
+                    page_in.number,
+                    clip=bbox if bbox != page_in.rect else None,
+                    rotate=rotation,
+                )
+            except ValueError:
                 try:
                     page_out.show_pdf_page(
-                        fitz.Rect(x_draw, y_draw, x_draw + w_scaled, y_draw + h_scaled),
+                        fitz.Rect(
+                            cell.x0 + margin_pts,
+                            cell.y0 + margin_pts,
+                            cell.x1 - margin_pts,
+                            cell.y1 - margin_pts,
+                        ),
                         doc_in,
                         page_in.number,
-                        clip=bbox if bbox != page_in.rect else None,
                         rotate=rotation,
                     )
                 except ValueError:
-                    try:
-                        page_out.show_pdf_page(
-                            fitz.Rect(
-                                cell_x0 + margin_pts,
-                                cell_y0 + margin_pts,
-                                cell_x1 - margin_pts,
-                                cell_y1 - margin_pts,
-                            ),
-                            doc_in,
-                            page_in.number,
-                            rotate=rotation,
-                        )
-                    except ValueError:
-                        page_out.draw_rect(
-                            fitz.Rect(cell_x0, cell_y0, cell_x1, cell_y1),
-                            color=(1, 1, 1),
-                            fill=(1, 1, 1),
-                        )
-
-            def get_rotation(prepared_page: PreparedPage) -> int:
-                if prepared_page.is_blank:
-                    return 0
-
-                assert prepared_page.source_pdf_path is not None
-                assert prepared_page.source_page_number is not None
-
-                doc_in = source_docs.get(prepared_page.source_pdf_path)
-                if doc_in is None:
-                    doc_in = fitz.open(prepared_page.source_pdf_path)
-                    source_docs[prepared_page.source_pdf_path] = doc_in
-
-                page_in = doc_in[prepared_page.source_page_number]
-                return (page_in.rotation + 180) % 360 if sheet_number % 2 == 1 else page_in.rotation
-
-            place_prepared_page(
-                right_page,
-                0,
-                0,
-                out_width / 2,
-                out_height,
-                get_rotation(right_page),
-            )
-            place_prepared_page(
-                left_page,
-                out_width / 2,
-                0,
-                out_width,
-                out_height,
-                get_rotation(left_page),
-            )
-
-            if left_page.add_watermark or right_page.add_watermark:
-                add_watermark_to_page(page_out)
-
-        doc_out.save(output_pdf_path)
+                    page_out.draw_rect(cell.rect, color=(1, 1, 1), fill=(1, 1, 1))
+
+        for sheet_number, side in enumerate(sides, start=1):
+            if sheet_numbers is not None and sheet_number not in sheet_numbers:
+                continue
+
+            key = sheet_key(side) if sheet_cache is not None else None
+            if key is not None and sheet_cache.append_cached_sheet(doc_out, key):
+                reused_sheets += 1
+            else:
+                page_out = doc_out.new_page(width=layout.sheet_width, height=layout.sheet_height)
+                for page_index, cell in side:
+                    place_prepared_page(page_out, plan_page(page_index), cell)
+
+                if any(plan_page(page_index).add_watermark for page_index, _ in side):
+                    add_watermark_to_page(page_out)
+                if key is not None:
+                    sheet_cache.store_last_sheet(doc_out, key)
+
+            if streaming:
+                assert memory_monitor is not None
+                for source_pdf_path in releases.get(sheet_number - 1, []):
+                    _release_source_doc(source_pdf_path, source_docs, canonical_pages, fingerprint_digests)
+                if memory_monitor.should_spill():
+                    doc_out = _spill_output_part(doc_out, output_pdf_path, part_paths, garbage=4)
+                    memory_monitor.mark_spilled()
+            elif memory_monitor is not None:
+                memory_monitor.sample()
+
+        # Cached fragments carry their own copies of shared fonts and
+        # XObjects; garbage=4 folds the identical copies back together.
+        _save_output(doc_out, output_pdf_path, part_paths, **({"garbage": 4} if reused_sheets else {}))
+        if sheet_cache is not None:
+            sheet_cache.trim()
     finally:
         doc_out.close()
         for doc in source_docs.values():
@@ -310,43 +608,96 @@ def build_booklets_pipeline(
     final_output_dir: str,
     preserve_file_parity: bool = True,
     generate_cover: bool = False,
+    memory_budget_mb: float | None = None,
+    subset_fonts: bool = False,
+    max_image_dpi: int | None = None,
+    pages_per_side: int = 2,
+    binding: Binding = "saddle",
+    sheet_cache: SheetFragmentCache | None = None,
+    flatten_dpi: int | None = None,
+    sheet_image_format: SheetImageFormat | None = None,
+    analysis_cache: UploadAnalysisCache | None = None,
+    checkpoint_dir: str | None = None,
 ) -> BookletJobResult:
+    """
+    With flatten_dpi, the imposed sheets are rendered to images at that
+    resolution and the output holds only those images; sheet_image_format
+    additionally zips every sheet as a PNG or TIFF next to the PDF. With
+    checkpoint_dir, finished splits are kept there until the job completes
+    and a retry of the same job only imposes the missing ones.
+    """
     if not specs:
         raise ValueError("There are no PDFs to process.")
 
-    job_id = uuid.uuid4().hex
+    layout = nup_layout(pages_per_side, binding)
+    memory_monitor = JobMemoryMonitor(memory_budget_mb)
     os.makedirs(final_output_dir, exist_ok=True)
-    final_pdf = os.path.join(final_output_dir, f"{job_id}_booklets_for_printing.pdf")
-
-    with tempfile.TemporaryDirectory(prefix=f"pdf_manager_{job_id}_") as tmp:
-        specs_to_process = list(specs)
-        if generate_cover:
-            cover_path = os.path.join(tmp, "cover.pdf")
-            create_cover_pdf(
-                output_path=cover_path,
-                entries=collect_cover_entries([spec.input_pdf_path for spec in specs]),
-                generated_on=timezone.localdate(),
-                heading="Booklet index",
-            )
-            specs_to_process.insert(
-                0,
-                SourcePdfSpec(
-                    input_pdf_path=cover_path,
-                    same_page_parity=True,
-                    margin_cm=0.0,
-                    add_watermark=False,
-                ),
-            )
-
-        prepared_pages = prepare_pages_for_specs(specs_to_process, preserve_file_parity=preserve_file_parity)
-        split_ranges = compute_split_ranges(len(prepared_pages), max_pages_per_split)
+    sheet_images_path = None
+    options = {
+        "max_pages_per_split": max_pages_per_split,
+        "preserve_file_parity": preserve_file_parity,
+        "generate_cover": generate_cover,
+        "subset_fonts": subset_fonts,
+        "max_image_dpi": max_image_dpi,
+        "pages_per_side": pages_per_side,
+        "binding": binding,
+        "flatten_dpi": flatten_dpi,
+        "sheet_image_format": sheet_image_format,
+    }
+
+    with job_checkpoint(checkpoint_dir, "side_by_side", specs, options) as checkpoint:
+        job_id = checkpoint.job_id
+        tmp = checkpoint.work_dir
+        final_pdf = os.path.join(final_output_dir, f"{job_id}_booklets_for_printing.pdf")
+        specs_to_process = specs_with_cover(specs, tmp, generate_cover, analysis_cache=analysis_cache)
+        job_pages = PageTable()
+        prepared_pages = recorded_pages(
+            iter_prepared_pages(specs_to_process, preserve_file_parity=preserve_file_parity),
+            job_pages,
+        )
         split_outputs: list[str] = []
 
-        for split_idx, (start_idx, end_idx) in enumerate(split_ranges, start=1):
+        for split_idx, split_pages in enumerate(iter_split_pages(prepared_pages, max_pages_per_split), start=1):
             output_path = os.path.join(tmp, f"split{split_idx:02}_booklet.pdf")
-            create_booklet(prepared_pages[start_idx:end_idx + 1], output_path)
+            if not checkpoint.is_complete(split_idx, output_path):
+                create_booklet(
+                    split_pages,
+                    output_path,
+                    memory_monitor=memory_monitor,
+                    layout=layout,
+                    sheet_cache=sheet_cache,
+                    analysis_cache=analysis_cache,
+                )
+                checkpoint.mark_complete(split_idx)
             split_outputs.append(output_path)
 
-        merge_pdfs(split_outputs, final_pdf)
-
-    return BookletJobResult(job_id=job_id, output_pdf_path=final_pdf)
+        if flatten_dpi:
+            # Font and image passes are moot once every sheet is a picture.
+            vector_pdf = os.path.join(tmp, "booklets_vector.pdf")
+            merge_pdfs(split_outputs, vector_pdf)
+            image_dir = None
+            if sheet_image_format:
+                image_dir = os.path.join(tmp, "sheets")
+                os.makedirs(image_dir)
+            flatten_pdf_to_raster(
+                vector_pdf,
+                final_pdf,
+                flatten_dpi,
+                image_dir=image_dir,
+                image_format=sheet_image_format or "png",
+            )
+            if image_dir is not None:
+                sheet_images_path = os.path.join(final_output_dir, f"{job_id}_booklet_sheets.zip")
+                zip_sheet_images(image_dir, sheet_images_path)
+        else:
+            merge_pdfs(split_outputs, final_pdf, subset_fonts=subset_fonts, max_image_dpi=max_image_dpi)
+        memory_monitor.sample()
+        features = finished_job_features(job_pages, analysis_cache)
+
+    return BookletJobResult(
+        job_id=job_id,
+        output_pdf_path=final_pdf,
+        peak_rss_mb=memory_monitor.peak_mb,
+        sheet_images_path=sheet_images_path,
+        features=features,
+    )
@@ -1,37 +1,96 @@
 from __future__ import annotations
 
+import json
+import math
 import os
+import pickle
 import shutil
 import tempfile
+import time
+import zipfile
+from unittest import mock
 
 import fitz
 from django.core.files.uploadedfile import SimpleUploadedFile
-from django.test import TestCase, override_settings
+from django.test import Client, TestCase, override_settings
 from django.urls import reverse
-
+from pdf_manager_project.file_hash import file_content_hash
+from pdf_manager_project.mapped_pdf import open_mapped_pdf
+from pdf_manager_project.page_ranges import normalize_page_ranges
+from pdf_manager_project.pdf_analysis import UploadAnalysisCache
+from pdf_manager_project.pdf_colorspace import page_colorspace, render_pixmap
+from pdf_manager_project.pdf_cover import collect_cover_entries
+from pdf_manager_project.pdf_optimize import downsample_images, share_simple_fonts
+
+from .checkpoint import CHECKPOINT_MAX_AGE_SECONDS, job_checkpoint
+from .estimate import estimate_booklet_job
+from .flatten import flatten_pdf_to_raster
 from .forms import BookletForm
+from .imposition import SIDE_BY_SIDE_LAYOUT, nup_layout, placement_table
+from .job_features import JobFeatures
+from .memory import JobMemoryMonitor
+from .models import BookletJobTiming
+from .page_table import PageTable
+from .preview import PREVIEW_MAX_AGE_SECONDS, PreviewOptions, resolve_preview_sheets
+from .render_cache import RasterHalfCache, SheetFragmentCache
+from .tiling import tile_clips
+from .views import _run_timed_pipeline
 from .flipped_a4 import (
     FLIPPED_A4_QUALITY_PROFILES,
     _cell_draw_rect,
     _clip_half_page,
     _find_half_split_y,
+    _half_route,
     _imposed_cell_pairs,
     _logical_half_pages_for_prepared_pages,
+    _materialize_pruned_half_doc,
+    _materialize_raster_half_doc,
     build_flipped_a4_booklets_pipeline,
+    choose_render_quality,
+    create_flipped_a4_booklet,
+)
+from .services import (
+    BookletJobResult,
+    PreparedPage,
+    SourcePdfSpec,
+    build_booklets_pipeline,
+    compute_split_ranges,
+    create_booklet,
+    iter_split_pages,
+    page_content_fingerprint,
+    prepare_pages_for_specs,
 )
-from .services import PreparedPage, SourcePdfSpec, build_booklets_pipeline, prepare_pages_for_specs
 
 
-def build_pdf_bytes(page_count: int) -> bytes:
+def build_pdf_bytes(page_count: int, label: str = "Page") -> bytes:
     doc = fitz.open()
     for idx in range(page_count):
         page = doc.new_page()
-        page.insert_text((72, 72), f"Page {idx + 1}")
+        page.insert_text((72, 72), f"{label} {idx + 1}")
+    pdf_bytes = doc.tobytes()
+    doc.close()
+    return pdf_bytes
+
+
+def build_repeated_pdf_bytes(page_count: int, text: str = "Repeated form") -> bytes:
+    doc = fitz.open()
+    for _ in range(page_count):
+        page = doc.new_page()
+        page.insert_text((72, 72), text)
+        page.insert_text((72, 700), f"{text} footer")
     pdf_bytes = doc.tobytes()
     doc.close()
     return pdf_bytes
 
 
+def _count_xobjects(doc: fitz.Document, subtype: str) -> int:
+    return sum(
+        1
+        for xref in range(1, doc.xref_length())
+        if doc.xref_get_key(xref, "Subtype") == ("name", f"/{subtype}")
+    )
+
+
 TEST_MEDIA_ROOT = tempfile.mkdtemp(prefix="booklets_test_media_")
 
 
@@ -94,6 +153,31 @@ class BookletsViewTests(TestCase):
         finally:
             shutil.rmtree(tmpdir, ignore_errors=True)
 
+    def test_page_table_slices_share_storage_and_pickle_compactly(self):
+        table = PageTable()
+        pages = [
+            PreparedPage(f"/uploads/file{index // 100}.pdf", index % 100, 595.0, 842.0, 1.0, index % 100 == 0)
+            for index in range(1000)
+        ]
+        for page in pages:
+            table.append(page)
+        table.append(PreparedPage(None, None, 595.0, 842.0, 1.0))
+
+        self.assertEqual(list(table[:1000]), pages)
+        self.assertTrue(table[-1].is_blank)
+
+        split = table[200:300]
+        self.assertIs(split._page_number, table._page_number)
+        self.assertEqual(len(split), 100)
+        self.assertEqual(split[0], pages[200])
+        self.assertEqual(list(split[10:12]), pages[210:212])
+        with self.assertRaises(ValueError):
+            split.append(pages[0])
+
+        restored = pickle.loads(pickle.dumps(split))
+        self.assertEqual(list(restored), pages[200:300])
+        self.assertLess(len(pickle.dumps(split)), len(pickle.dumps(pages[200:300])))
+
     def test_flipped_a4_checkbox_is_off_by_default(self):
         form = BookletForm()
 
@@ -108,6 +192,18 @@ class BookletsViewTests(TestCase):
         self.assertIn("Page split method", form.as_p())
         self.assertIn("Middle page separation", form.as_p())
 
+    def test_sheet_image_files_require_flattened_output(self):
+        upload = SimpleUploadedFile("uno.pdf", build_pdf_bytes(1), content_type="application/pdf")
+        data = {"processing_mode": "separate", "max_pages_per_split": "40", "sheet_image_format": "png"}
+
+        form = BookletForm(data=data, files={"input_pdf": upload})
+        self.assertFalse(form.is_valid())
+        self.assertIn("sheet_image_format", form.errors)
+
+        upload.seek(0)
+        form = BookletForm(data={**data, "flatten_dpi": "300"}, files={"input_pdf": upload})
+        self.assertTrue(form.is_valid(), form.errors)
+
     def test_flipped_a4_quality_profiles_preserve_old_low_and_high_as_lower_options(self):
         form = BookletForm()
 
@@ -270,6 +366,227 @@ class BookletsViewTests(TestCase):
         self.assertFalse(updated_items[0]["add_watermark"])
         self.assertFalse(updated_items[1]["same_page_parity"])
 
+    def test_rejected_upload_is_reported_alone_and_invalid_submissions_leave_no_files(self):
+        uploads_dir = os.path.join(TEST_MEDIA_ROOT, "uploads")
+        response = self.client.post(
+            reverse("booklets:form"),
+            data={
+                "input_pdf": [
+                    SimpleUploadedFile("roto.pdf", b"not a pdf at all", content_type="application/pdf"),
+                    SimpleUploadedFile("uno.pdf", build_pdf_bytes(2), content_type="application/pdf"),
+                ],
+                "processing_mode": "separate",
+                "max_pages_per_split": "40",
+                "file_count": "2",
+                "file_new_index_0": "0",
+                "file_new_index_1": "1",
+            },
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, "is not a PDF file")
+        self.assertEqual([item["name"] for item in self.client.session["booklets_items"]], ["uno.pdf"])
+        self.assertEqual(len(os.listdir(uploads_dir)), 1)
+
+        self.client.post(
+            reverse("booklets:form"),
+            data={
+                "input_pdf": [SimpleUploadedFile("dos.pdf", build_pdf_bytes(2), content_type="application/pdf")],
+                "processing_mode": "separate",
+                "max_pages_per_split": "40",
+                "file_count": "2",
+                "file_new_index_0": "0",
+                "file_new_index_1": "5",
+            },
+        )
+        self.assertEqual(len(os.listdir(uploads_dir)), 1)
+
+    @override_settings(PDF_SANDBOX_UPLOAD_SECONDS=0.5)
+    def test_preview_sheet_count_runs_in_the_pdf_sandbox(self):
+        self.client.post(
+            reverse("booklets:form"),
+            data={
+                "input_pdf": [SimpleUploadedFile("uno.pdf", build_pdf_bytes(4), content_type="application/pdf")],
+                "processing_mode": "separate",
+                "max_pages_per_split": "40",
+            },
+        )
+
+        with mock.patch("booklets.views.preview_sheet_count", side_effect=lambda *args: time.sleep(30)):
+            response = self.client.get(reverse("booklets:preview"), data={"booklet_layout": "side_by_side"})
+
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("longer than", response.json()["error"])
+
+    def test_preview_returns_cached_png_thumbnails_for_selected_sheets(self):
+        self.client.post(
+            reverse("booklets:form"),
+            data={
+                "input_pdf": [SimpleUploadedFile("uno.pdf", build_pdf_bytes(9), content_type="application/pdf")],
+                "processing_mode": "separate",
+                "max_pages_per_split": "40",
+                "file_same_page_parity_0": "true",
+                "file_margin_0": "1.0",
+                "file_add_watermark_0": "false",
+            },
+        )
+
+        response = self.client.get(
+            reverse("booklets:preview"),
+            data={"booklet_layout": "side_by_side", "max_pages_per_split": "4", "sheets": "first,last,99"},
+        )
+
+        self.assertEqual(response.status_code, 200)
+        payload = response.json()
+        # 9 pages split as 4 + 4 + 1 give 2 + 2 + 2 output pages.
+        self.assertEqual(payload["sheet_count"], 6)
+        self.assertEqual([sheet["number"] for sheet in payload["sheets"]], [1, 6])
+
+        image_response = self.client.get(payload["sheets"][1]["url"])
+        self.assertEqual(image_response.status_code, 200)
+        self.assertEqual(image_response["Content-Type"], "image/png")
+        self.assertEqual(image_response["Cache-Control"], f"private, max-age={60 * 60 * 24 * 365}, immutable")
+        self.assertTrue(image_response.content.startswith(b"\x89PNG"))
+        preview_dir = os.path.join(TEST_MEDIA_ROOT, "booklets_previews")
+        self.assertEqual(len([name for name in os.listdir(preview_dir) if name.endswith(".png")]), 1)
+
+        # Another session cannot load previews of this session's uploads.
+        self.assertEqual(Client().get(payload["sheets"][1]["url"]).status_code, 404)
+
+    def test_sessions_uploading_identical_files_each_get_their_own_preview(self):
+        clients = [Client(), Client()]
+        pdf_bytes = build_pdf_bytes(4)
+        urls = []
+        for client in clients:
+            client.post(
+                reverse("booklets:form"),
+                data={
+                    "input_pdf": [SimpleUploadedFile("igual.pdf", pdf_bytes, content_type="application/pdf")],
+                    "processing_mode": "separate",
+                    "max_pages_per_split": "40",
+                    "file_same_page_parity_0": "true",
+                    "file_margin_0": "1.0",
+                    "file_add_watermark_0": "false",
+                },
+            )
+            response = client.get(reverse("booklets:preview"), data={"sheets": "first"})
+            urls.append(response.json()["sheets"][0]["url"])
+
+        self.assertNotEqual(urls[0], urls[1])
+        for client, url in zip(clients, urls):
+            self.assertEqual(client.get(url).status_code, 200)
+        self.assertEqual(clients[1].get(urls[0]).status_code, 404)
+
+    def test_preview_sweeps_entries_unused_for_a_day(self):
+        self.client.post(
+            reverse("booklets:form"),
+            data={
+                "input_pdf": [SimpleUploadedFile("uno.pdf", build_pdf_bytes(4), content_type="application/pdf")],
+                "processing_mode": "separate",
+                "max_pages_per_split": "40",
+                "file_same_page_parity_0": "true",
+                "file_margin_0": "1.0",
+                "file_add_watermark_0": "false",
+            },
+        )
+        preview_dir = os.path.join(TEST_MEDIA_ROOT, "booklets_previews")
+        os.makedirs(preview_dir, exist_ok=True)
+        stale_path = os.path.join(preview_dir, f"{'0' * 64}.json")
+        with open(stale_path, "w", encoding="utf-8") as fh:
+            json.dump({"specs": [{"input_pdf_path": "/tmp/gone.pdf"}]}, fh)
+        old = time.time() - PREVIEW_MAX_AGE_SECONDS - 60
+        os.utime(stale_path, (old, old))
+
+        response = self.client.get(reverse("booklets:preview"), data={"sheets": "first"})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(os.path.exists(stale_path))
+        self.assertEqual(len([name for name in os.listdir(preview_dir) if name.endswith(".json")]), 1)
+
+    def test_estimate_counts_sheets_exactly_and_calibrates_from_finished_jobs(self):
+        with mock.patch("booklets.views.estimate_booklet_job", side_effect=AssertionError("estimated before the job")):
+            self.client.post(
+                reverse("booklets:form"),
+                data={
+                    "input_pdf": [SimpleUploadedFile("uno.pdf", build_pdf_bytes(9), content_type="application/pdf")],
+                    "processing_mode": "separate",
+                    "max_pages_per_split": "40",
+                    "file_same_page_parity_0": "true",
+                    "file_margin_0": "1.0",
+                    "file_add_watermark_0": "false",
+                },
+            )
+        timing = BookletJobTiming.objects.get()
+        self.assertEqual((timing.mode, timing.source_pages, timing.output_pages), ("side_by_side", 9, 6))
+
+        response = self.client.get(
+            reverse("booklets:estimate"),
+            data={"booklet_layout": "side_by_side", "max_pages_per_split": "4"},
+        )
+
+        self.assertEqual(response.status_code, 200)
+        job = response.json()["jobs"][0]
+        # 9 pages split as 4 + 4 + 1 give 2 + 2 + 2 output pages, one sheet each.
+        self.assertEqual((job["output_pages"], job["paper_sheets"], job["split_count"]), (6, 3, 3))
+        self.assertTrue(job["calibrated"])
+
+        uploads_dir = os.path.join(TEST_MEDIA_ROOT, "uploads")
+        path = os.path.join(uploads_dir, "ocho.pdf")
+        with open(path, "wb") as fh:
+            fh.write(build_pdf_bytes(8))
+        BookletJobTiming.objects.all().delete()
+        options = PreviewOptions(booklet_layout="flipped_a4", split_mode="raster")
+        estimate = estimate_booklet_job([SourcePdfSpec(path, True, 1.0, False)], options)
+        self.assertFalse(estimate.calibrated)
+        # Flipped A4 pads 8 pages to 9 and adds the back cover.
+        self.assertEqual((estimate.output_pages, estimate.paper_sheets), (10, 5))
+
+        BookletJobTiming.objects.create(
+            mode="flipped_raster",
+            source_pages=8,
+            output_pages=10,
+            model_seconds=estimate.model_seconds,
+            model_bytes=estimate.model_bytes,
+            actual_seconds=estimate.model_seconds * 3,
+            actual_bytes=estimate.model_bytes // 2,
+        )
+        calibrated = estimate_booklet_job([SourcePdfSpec(path, True, 1.0, False)], options)
+        self.assertTrue(calibrated.calibrated)
+        self.assertAlmostEqual(calibrated.predicted_seconds, estimate.model_seconds * 3, places=1)
+        self.assertAlmostEqual(calibrated.predicted_bytes, estimate.model_bytes // 2, delta=1)
+
+    def test_job_timing_uses_the_chosen_quality_and_never_fails_the_job(self):
+        features = JobFeatures(
+            source_pages=4,
+            padding_pages=1,
+            page_kinds={"text": 4},
+            source_bytes=900,
+            page_area_pts=1e6,
+        )
+        output_path = os.path.join(TEST_MEDIA_ROOT, "done.pdf")
+        os.makedirs(TEST_MEDIA_ROOT, exist_ok=True)
+        with open(output_path, "wb") as fh:
+            fh.write(build_pdf_bytes(6))
+
+        def pipeline(**kwargs):
+            return BookletJobResult(job_id="abc", output_pdf_path=output_path, chosen_quality="low", features=features)
+
+        kwargs = {"specs": [], "render_quality": "super_high", "split_mode": "raster"}
+        with mock.patch("booklets.views.record_job_timing") as record:
+            _run_timed_pipeline(pipeline, kwargs, "flipped_a4")
+        self.assertEqual(record.call_args.args[:3], ("flipped_raster", features, "low"))
+
+        with mock.patch("booklets.views.record_job_timing", side_effect=RuntimeError("database is locked")):
+            with self.assertLogs("booklets.views", level="ERROR"):
+                result = _run_timed_pipeline(pipeline, kwargs, "flipped_a4")
+        self.assertEqual(result.job_id, "abc")
+
+    def test_resolve_preview_sheets_accepts_names_and_ranges(self):
+        self.assertEqual(resolve_preview_sheets("first,middle,last", 7), [0, 3, 6])
+        self.assertEqual(resolve_preview_sheets("2-4,3,10", 5), [1, 2, 3])
+        with self.assertRaises(ValueError):
+            resolve_preview_sheets("two", 5)
+
     def test_combined_mode_cover_keeps_booklet_sheet_parity(self):
         uploads_dir = os.path.join(TEST_MEDIA_ROOT, "uploads")
         outputs_dir = os.path.join(TEST_MEDIA_ROOT, "booklets_outputs")
@@ -298,6 +615,199 @@ class BookletsViewTests(TestCase):
             # become 4 imposed booklet sheets.
             self.assertEqual(doc.page_count, 4)
 
+    def test_side_by_side_placement_table_matches_saddle_stitch_order(self):
+        sides = placement_table(SIDE_BY_SIDE_LAYOUT, 8)
+
+        self.assertEqual([[page for page, _ in side] for side in sides], [[0, 7], [1, 6], [2, 5], [3, 4]])
+        self.assertEqual([cell.rotation for _, cell in sides[0]], [180, 180])
+        self.assertEqual([cell.rotation for _, cell in sides[1]], [0, 0])
+        self.assertIs(sides, placement_table(SIDE_BY_SIDE_LAYOUT, 8))
+
+    def test_perfect_binding_folds_each_sheet_as_its_own_folio(self):
+        sides = placement_table(nup_layout(2, "perfect"), 8)
+
+        self.assertEqual([[page for page, _ in side] for side in sides], [[0, 3], [1, 2], [4, 7], [5, 6]])
+
+    def test_four_up_handout_halves_sheet_count(self):
+        uploads_dir = os.path.join(TEST_MEDIA_ROOT, "uploads")
+        outputs_dir = os.path.join(TEST_MEDIA_ROOT, "booklets_outputs")
+        os.makedirs(uploads_dir, exist_ok=True)
+        path = os.path.join(uploads_dir, "handout.pdf")
+        with open(path, "wb") as fh:
+            fh.write(build_pdf_bytes(16))
+
+        result = build_booklets_pipeline(
+            specs=[SourcePdfSpec(path, same_page_parity=True, margin_cm=0.5, add_watermark=False)],
+            max_pages_per_split=40,
+            final_output_dir=outputs_dir,
+            pages_per_side=4,
+        )
+
+        with fitz.open(result.output_pdf_path) as doc:
+            self.assertEqual(doc.page_count, 4)
+            self.assertEqual((doc[0].rect.width, doc[0].rect.height), (595, 842))
+            front_text = doc[0].get_text()
+            for page_label in ["Page 1\n", "Page 16", "Page 5\n", "Page 12"]:
+                self.assertIn(page_label, front_text)
+            self.assertEqual(sum(page.get_text().count("Page") for page in doc), 16)
+
+    def test_flatten_workers_receive_only_path_and_sheet_indexes(self):
+        uploads_dir = os.path.join(TEST_MEDIA_ROOT, "uploads")
+        os.makedirs(uploads_dir, exist_ok=True)
+        path = os.path.join(uploads_dir, "sheets.pdf")
+        with open(path, "wb") as fh:
+            fh.write(build_pdf_bytes(6))
+
+        with open_mapped_pdf(path) as doc:
+            self.assertEqual(doc.page_count, 6)
+            self.assertIn("Page 6", doc[5].get_text())
+
+        submitted = []
+        output_path = os.path.join(uploads_dir, "flat.pdf")
+        written_before_each_result = []
+
+        class InlinePool:
+            def __init__(self, max_workers):
+                pass
+
+            def __enter__(self):
+                return self
+
+            def __exit__(self, *exc):
+                return False
+
+            def map(self, fn, *iterables):
+                calls = list(zip(*iterables))
+                submitted.extend(calls)
+                for args in calls:
+                    if os.path.exists(output_path):
+                        with fitz.open(output_path) as written:
+                            written_before_each_result.append(written.page_count)
+                    else:
+                        written_before_each_result.append(0)
+                    yield fn(*args)
+
+        with mock.patch("booklets.flatten.ProcessPoolExecutor", InlinePool):
+            sheet_count = flatten_pdf_to_raster(path, output_path, 36, workers=3)
+
+        self.assertEqual(sheet_count, 6)
+        self.assertEqual([call[:3] for call in submitted], [(path, 0, 1), (path, 2, 3), (path, 4, 5)])
+        # Each task's sheets are written before the next result is taken.
+        self.assertEqual(written_before_each_result, [0, 2, 4])
+        with fitz.open(output_path) as flattened:
+            self.assertEqual(flattened.page_count, 6)
+            self.assertTrue(all(len(page.get_images()) == 1 for page in flattened))
+        for call in submitted:
+            self.assertTrue(all(isinstance(arg, (str, int, type(None))) for arg in call))
+
+    def test_upload_analysis_warms_content_boxes_cover_and_thumbnail(self):
+        uploads_dir = os.path.join(TEST_MEDIA_ROOT, "uploads")
+        outputs_dir = os.path.join(TEST_MEDIA_ROOT, "booklets_outputs")
+        os.makedirs(uploads_dir, exist_ok=True)
+        text_path = os.path.join(uploads_dir, "manual.pdf")
+        doc = fitz.open()
+        try:
+            doc.set_metadata({"title": "User manual", "author": "Ana"})
+            for index in range(4):
+                doc.new_page().insert_text((72, 72), f"Page {index + 1}")
+            doc.new_page()
+            doc.save(text_path)
+        finally:
+            doc.close()
+        scan_path = os.path.join(uploads_dir, "scan.pdf")
+        with open(scan_path, "wb") as fh:
+            fh.write(build_scanned_pdf_bytes(2, dpi=20))
+
+        cache = UploadAnalysisCache(os.path.join(TEST_MEDIA_ROOT, "upload_analysis"))
+        analysis = cache.analyze(text_path)
+        self.assertEqual(analysis["page_count"], 5)
+        self.assertEqual([page["kind"] for page in analysis["pages"]], ["text"] * 4 + ["blank"])
+        self.assertIsNone(analysis["pages"][4]["content_rect"])
+        self.assertEqual(cache.analyze(scan_path)["kind"], "scan")
+        self.assertIsNotNone(cache.thumbnail_path(file_content_hash(text_path)))
+
+        with mock.patch("pdf_manager_project.pdf_cover.fitz.open", side_effect=AssertionError("opened again")):
+            entries = collect_cover_entries([text_path], page_ranges=["2-"], analysis_cache=cache)
+        self.assertEqual((entries[0].title, entries[0].author, entries[0].page_count), ("User manual", "Ana", 4))
+
+        spec = SourcePdfSpec(text_path, same_page_parity=True, margin_cm=0.5, add_watermark=False)
+        expected = build_booklets_pipeline(specs=[spec], max_pages_per_split=40, final_output_dir=outputs_dir)
+        with mock.patch("booklets.services.page_content_rect", side_effect=AssertionError("detected again")):
+            warmed = build_booklets_pipeline(
+                specs=[spec],
+                max_pages_per_split=40,
+                final_output_dir=outputs_dir,
+                analysis_cache=cache,
+            )
+        with fitz.open(expected.output_pdf_path) as expected_doc, fitz.open(warmed.output_pdf_path) as warmed_doc:
+            self.assertEqual([page.get_text() for page in warmed_doc], [page.get_text() for page in expected_doc])
+
+        thumbnail_url = reverse("booklets:upload_thumbnail", kwargs={"file_hash": file_content_hash(text_path)})
+        session = self.client.session
+        session["booklets_items"] = [{"name": "manual.pdf", "path": text_path}]
+        session.save()
+        response = self.client.get(thumbnail_url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Type"], "image/png")
+        self.assertTrue(response["Cache-Control"].startswith("private"))
+        # A session without this upload cannot fetch its pages by hash.
+        self.assertEqual(Client().get(thumbnail_url).status_code, 404)
+
+    def test_flatten_renders_each_sheet_as_a_single_image(self):
+        uploads_dir = os.path.join(TEST_MEDIA_ROOT, "uploads")
+        outputs_dir = os.path.join(TEST_MEDIA_ROOT, "booklets_outputs")
+        os.makedirs(uploads_dir, exist_ok=True)
+        path = os.path.join(uploads_dir, "flatten.pdf")
+        with open(path, "wb") as fh:
+            fh.write(build_pdf_bytes(16))
+
+        result = build_booklets_pipeline(
+            specs=[SourcePdfSpec(path, same_page_parity=True, margin_cm=0.5, add_watermark=False)],
+            max_pages_per_split=40,
+            final_output_dir=outputs_dir,
+            flatten_dpi=72,
+            sheet_image_format="png",
+        )
+
+        with fitz.open(result.output_pdf_path) as doc:
+            self.assertEqual(doc.page_count, 8)
+            for page in doc:
+                self.assertEqual(page.get_text(), "")
+                self.assertEqual(len(page.get_images()), 1)
+            self.assertEqual((doc[0].rect.width, doc[0].rect.height), (842, 595))
+
+        with zipfile.ZipFile(result.sheet_images_path) as archive:
+            self.assertEqual(archive.namelist(), [f"sheet{number:04}.png" for number in range(1, 9)])
+
+        response = self.client.get(reverse("booklets:download_sheets", kwargs={"job_id": result.job_id}))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Type"], "application/zip")
+
+    def test_flatten_stores_black_and_white_sheets_as_compressed_one_bit_images(self):
+        tmp = tempfile.mkdtemp(dir=TEST_MEDIA_ROOT)
+        source = os.path.join(tmp, "sheets.pdf")
+        doc = fitz.open()
+        for _ in range(2):
+            page = doc.new_page(width=842, height=595)
+            for line in range(30):
+                page.insert_text((40, 40 + line * 18), "Black and white booklet text " * 4, fontsize=10)
+        doc.save(source)
+        doc.close()
+
+        bilevel_path = os.path.join(tmp, "bilevel.pdf")
+        gray_path = os.path.join(tmp, "gray.pdf")
+        flatten_pdf_to_raster(source, bilevel_path, 300)
+        with mock.patch("booklets.flatten.page_colorspace", return_value="gray"):
+            flatten_pdf_to_raster(source, gray_path, 300)
+
+        with fitz.open(bilevel_path) as flattened:
+            images = [image for page in flattened for image in page.get_images(full=True)]
+            self.assertEqual(
+                {(image[4], flattened.xref_get_key(image[0], "Filter")[1]) for image in images},
+                {(1, "/FlateDecode")},
+            )
+        self.assertLessEqual(os.path.getsize(bilevel_path), os.path.getsize(gray_path))
+
     def test_flipped_a4_pipeline_splits_source_pages_into_half_pages(self):
         uploads_dir = os.path.join(TEST_MEDIA_ROOT, "uploads")
         outputs_dir = os.path.join(TEST_MEDIA_ROOT, "booklets_outputs")
@@ -324,6 +834,70 @@ class BookletsViewTests(TestCase):
             self.assertEqual(round(doc[0].rect.width), 595)
             self.assertEqual(round(doc[0].rect.height), 842)
 
+    def test_flipped_a4_pipeline_resumes_completed_splits_after_a_crash(self):
+        uploads_dir = os.path.join(TEST_MEDIA_ROOT, "uploads")
+        outputs_dir = os.path.join(TEST_MEDIA_ROOT, "booklets_outputs")
+        checkpoint_dir = os.path.join(TEST_MEDIA_ROOT, "booklets_jobs")
+        os.makedirs(uploads_dir, exist_ok=True)
+
+        path = os.path.join(uploads_dir, "largo.pdf")
+        with open(path, "wb") as fh:
+            fh.write(build_pdf_bytes(12))
+        pipeline_kwargs = {
+            "specs": [SourcePdfSpec(path, same_page_parity=True, margin_cm=1.0, add_watermark=False)],
+            "max_pages_per_split": 4,
+            "final_output_dir": outputs_dir,
+            "checkpoint_dir": checkpoint_dir,
+        }
+
+        rendered = []
+
+        def crash_on_third_split(prepared_pages, output_path, **kwargs):
+            if len(rendered) == 2:
+                raise MemoryError("worker killed")
+            rendered.append(output_path)
+            return create_flipped_a4_booklet(prepared_pages, output_path, **kwargs)
+
+        with mock.patch("booklets.flipped_a4.create_flipped_a4_booklet", side_effect=crash_on_third_split):
+            with self.assertRaises(MemoryError):
+                build_flipped_a4_booklets_pipeline(**pipeline_kwargs)
+        (work_dir,) = [name for name in os.listdir(checkpoint_dir) if not name.endswith(".lock")]
+        with open(os.path.join(checkpoint_dir, work_dir, "manifest.json"), encoding="utf-8") as fh:
+            manifest = json.load(fh)
+        self.assertEqual(manifest["completed_splits"], [1, 2])
+
+        with mock.patch(
+            "booklets.flipped_a4.create_flipped_a4_booklet", wraps=create_flipped_a4_booklet
+        ) as create_split:
+            result = build_flipped_a4_booklets_pipeline(**pipeline_kwargs)
+
+        self.assertEqual(create_split.call_count, 1)
+        self.assertEqual(result.job_id, manifest["job_id"])
+        self.assertFalse(os.path.isdir(os.path.join(checkpoint_dir, work_dir)))
+        with fitz.open(result.output_pdf_path) as doc:
+            # Three splits of four pages, six output pages each.
+            self.assertEqual(doc.page_count, 18)
+
+    def test_job_checkpoint_refuses_a_running_job_and_keeps_its_stale_directory(self):
+        uploads_dir = os.path.join(TEST_MEDIA_ROOT, "uploads")
+        checkpoint_dir = os.path.join(TEST_MEDIA_ROOT, "booklets_jobs")
+        os.makedirs(uploads_dir, exist_ok=True)
+        path = os.path.join(uploads_dir, "en_curso.pdf")
+        with open(path, "wb") as fh:
+            fh.write(build_pdf_bytes(2))
+        specs = [SourcePdfSpec(path, same_page_parity=True, margin_cm=1.0, add_watermark=False)]
+
+        with job_checkpoint(checkpoint_dir, "booklets", specs, {}) as running:
+            old = time.time() - CHECKPOINT_MAX_AGE_SECONDS - 60
+            os.utime(os.path.join(running.work_dir, "manifest.json"), (old, old))
+            with self.assertRaisesMessage(ValueError, "this job is already running"):
+                with job_checkpoint(checkpoint_dir, "booklets", specs, {}):
+                    pass
+            # Another job's stale sweep must leave the running job alone.
+            with job_checkpoint(checkpoint_dir, "booklets", specs, {"other": True}):
+                pass
+            self.assertTrue(os.path.isfile(os.path.join(running.work_dir, "manifest.json")))
+
     def test_flipped_a4_vector_split_preserves_text_content(self):
         uploads_dir = os.path.join(TEST_MEDIA_ROOT, "uploads")
         outputs_dir = os.path.join(TEST_MEDIA_ROOT, "booklets_outputs")
@@ -488,6 +1062,428 @@ class BookletsViewTests(TestCase):
             wide_rendered_gap = wide_bottom_bbox[1] - wide_top_bbox[3]
             self.assertGreater(wide_rendered_gap, narrow_rendered_gap + 35)
 
+    def test_flipped_a4_vector_split_embeds_each_source_page_once_for_both_halves(self):
+        uploads_dir = os.path.join(TEST_MEDIA_ROOT, "uploads")
+        outputs_dir = os.path.join(TEST_MEDIA_ROOT, "booklets_outputs")
+        os.makedirs(uploads_dir, exist_ok=True)
+
+        source_path = os.path.join(uploads_dir, "with_images.pdf")
+        doc = fitz.open()
+        try:
+            for page_number in range(3):
+                page = doc.new_page(width=595, height=842)
+                pixmap = fitz.Pixmap(fitz.csRGB, fitz.IRect(0, 0, 32, 32), False)
+                pixmap.set_rect(pixmap.irect, (40 * page_number, 90, 160))
+                page.insert_image(fitz.Rect(72, 300, 523, 560), pixmap=pixmap)
+                page.insert_text((72, 96), f"Page {page_number + 1} top")
+                page.insert_text((72, 700), f"Page {page_number + 1} bottom")
+            doc.save(source_path)
+        finally:
+            doc.close()
+
+        result = build_flipped_a4_booklets_pipeline(
+            specs=[SourcePdfSpec(source_path, same_page_parity=True, margin_cm=1.0, add_watermark=False)],
+            max_pages_per_split=40,
+            final_output_dir=outputs_dir,
+            preserve_file_parity=True,
+            generate_cover=False,
+            split_mode="vector",
+        )
+
+        with fitz.open(result.output_pdf_path) as generated:
+            self.assertEqual(generated.page_count, 4)
+            # One shared XObject per source page plus a clipped wrapper per half.
+            self.assertEqual(_count_xobjects(generated, "Form"), 3 + 6)
+            self.assertEqual(_count_xobjects(generated, "Image"), 3)
+
+    def test_pruned_vector_halves_keep_only_their_own_content(self):
+        doc = fitz.open()
+        try:
+            page = doc.new_page(width=595, height=842)
+            pixmap = fitz.Pixmap(fitz.csRGB, fitz.IRect(0, 0, 32, 32), False)
+            page.insert_image(fitz.Rect(72, 500, 523, 800), pixmap=pixmap)
+            page.insert_text((72, 80), "TOPTEXT")
+            page.insert_text((72, 425), "STRADDLE", fontsize=30)
+            page.insert_text((72, 820), "BOTTOMTEXT")
+            page.draw_rect(fitz.Rect(50, 600, 100, 650))
+            page.draw_rect(fitz.Rect(50, 400, 100, 450))
+
+            with _materialize_pruned_half_doc(page, _clip_half_page(page, "top")) as top_doc:
+                top_page = top_doc[0]
+                self.assertEqual(top_page.get_text().split(), ["TOPTEXT", "STRADDLE"])
+                self.assertEqual(top_page.get_image_info(), [])
+                self.assertEqual(len(top_page.get_drawings()), 1)
+
+            with _materialize_pruned_half_doc(page, _clip_half_page(page, "bottom")) as bottom_doc:
+                bottom_page = bottom_doc[0]
+                self.assertEqual(bottom_page.get_text().split(), ["STRADDLE", "BOTTOMTEXT"])
+                self.assertEqual(len(bottom_page.get_image_info()), 1)
+                self.assertEqual(len(bottom_page.get_drawings()), 2)
+        finally:
+            doc.close()
+
+    def test_flipped_a4_vector_split_can_prune_each_half(self):
+        uploads_dir = os.path.join(TEST_MEDIA_ROOT, "uploads")
+        outputs_dir = os.path.join(TEST_MEDIA_ROOT, "booklets_outputs")
+        os.makedirs(uploads_dir, exist_ok=True)
+
+        source_path = os.path.join(uploads_dir, "pruned_halves.pdf")
+        doc = fitz.open()
+        try:
+            for page_number in range(3):
+                page = doc.new_page(width=595, height=842)
+                pixmap = fitz.Pixmap(fitz.csRGB, fitz.IRect(0, 0, 32, 32), False)
+                pixmap.set_rect(pixmap.irect, (40 * page_number, 90, 160))
+                page.insert_image(fitz.Rect(72, 100, 523, 360), pixmap=pixmap)
+                page.insert_text((72, 700), f"Page {page_number + 1} bottom")
+            doc.save(source_path)
+        finally:
+            doc.close()
+
+        result = build_flipped_a4_booklets_pipeline(
+            specs=[SourcePdfSpec(source_path, same_page_parity=True, margin_cm=1.0, add_watermark=False)],
+            max_pages_per_split=40,
+            final_output_dir=outputs_dir,
+            preserve_file_parity=True,
+            generate_cover=False,
+            split_mode="vector",
+            prune_vector_halves=True,
+        )
+
+        with fitz.open(result.output_pdf_path) as generated:
+            self.assertEqual(generated.page_count, 4)
+            self.assertEqual(_count_xobjects(generated, "Image"), 3)
+            # Bottom halves no longer draw the image from the top half.
+            image_placements = sum(len(page.get_image_info()) for page in generated)
+            self.assertEqual(image_placements, 3)
+
+    def test_sheet_cache_reimposes_only_sheets_whose_inputs_changed(self):
+        uploads_dir = os.path.join(TEST_MEDIA_ROOT, "uploads")
+        outputs_dir = os.path.join(TEST_MEDIA_ROOT, "booklets_outputs")
+        os.makedirs(uploads_dir, exist_ok=True)
+        paths = []
+        for name in ["a.pdf", "b.pdf", "c.pdf"]:
+            path = os.path.join(uploads_dir, name)
+            with open(path, "wb") as fh:
+                fh.write(build_pdf_bytes(4, label=name))
+            paths.append(path)
+
+        cache = SheetFragmentCache(os.path.join(TEST_MEDIA_ROOT, "sheet_cache"), max_mb=64)
+        specs = [SourcePdfSpec(path, same_page_parity=True, margin_cm=1.0, add_watermark=False) for path in paths]
+        build_booklets_pipeline(specs=specs, max_pages_per_split=40, final_output_dir=outputs_dir, sheet_cache=cache)
+
+        # Pages of c.pdf (8-11) share sheets 1-4 with a.pdf; sheets 5-6 only hold b.pdf.
+        specs[2] = SourcePdfSpec(paths[2], same_page_parity=True, margin_cm=2.0, add_watermark=False)
+        with mock.patch.object(fitz.Page, "show_pdf_page", autospec=True, side_effect=fitz.Page.show_pdf_page) as show:
+            cached = build_booklets_pipeline(
+                specs=specs,
+                max_pages_per_split=40,
+                final_output_dir=outputs_dir,
+                sheet_cache=cache,
+            )
+        self.assertEqual(show.call_count, 8)
+
+        fresh = build_booklets_pipeline(specs=specs, max_pages_per_split=40, final_output_dir=outputs_dir)
+        with fitz.open(cached.output_pdf_path) as cached_doc, fitz.open(fresh.output_pdf_path) as fresh_doc:
+            self.assertEqual(
+                [page.get_text("words") for page in cached_doc],
+                [page.get_text("words") for page in fresh_doc],
+            )
+
+    def test_raster_half_cache_skips_rendering_when_only_geometry_changes(self):
+        uploads_dir = os.path.join(TEST_MEDIA_ROOT, "uploads")
+        outputs_dir = os.path.join(TEST_MEDIA_ROOT, "booklets_outputs")
+        os.makedirs(uploads_dir, exist_ok=True)
+        path = os.path.join(uploads_dir, "cached.pdf")
+        with open(path, "wb") as fh:
+            fh.write(build_pdf_bytes(3))
+
+        cache = RasterHalfCache(os.path.join(TEST_MEDIA_ROOT, "render_cache"), max_mb=64)
+        spec = SourcePdfSpec(path, same_page_parity=True, margin_cm=1.0, add_watermark=False)
+        build_flipped_a4_booklets_pipeline(
+            specs=[spec],
+            max_pages_per_split=40,
+            final_output_dir=outputs_dir,
+            render_quality="very_low",
+            split_mode="raster",
+            raster_cache=cache,
+        )
+
+        with mock.patch.object(fitz.Page, "get_pixmap", side_effect=AssertionError("rendered again")):
+            result = build_flipped_a4_booklets_pipeline(
+                specs=[spec],
+                max_pages_per_split=2,
+                final_output_dir=outputs_dir,
+                render_quality="very_low",
+                split_mode="raster",
+                center_gap_cm=2.5,
+                raster_cache=cache,
+            )
+
+        self.assertTrue(os.path.isfile(result.output_pdf_path))
+        entries = [name for _, _, files in os.walk(cache.cache_dir) for name in files]
+        self.assertTrue(entries)
+        self.assertTrue(all(name.endswith(".img") for name in entries))
+
+        legacy_path = os.path.join(cache.cache_dir, "00", f"{'0' * 64}.jpg")
+        os.makedirs(os.path.dirname(legacy_path), exist_ok=True)
+        with open(legacy_path, "wb") as fh:
+            fh.write(b"old entry")
+        cache.trim()
+        self.assertFalse(os.path.exists(legacy_path))
+
+    def test_raster_split_places_scanned_images_without_reencoding(self):
+        uploads_dir = os.path.join(TEST_MEDIA_ROOT, "uploads")
+        outputs_dir = os.path.join(TEST_MEDIA_ROOT, "booklets_outputs")
+        os.makedirs(uploads_dir, exist_ok=True)
+        path = os.path.join(uploads_dir, "scanned.pdf")
+        with open(path, "wb") as fh:
+            fh.write(build_scanned_pdf_bytes(3, dpi=50))
+        with fitz.open(path) as source:
+            original_images = {source.xref_stream_raw(image[0]) for page in source for image in page.get_images()}
+
+        with mock.patch.object(fitz.Page, "get_pixmap", side_effect=AssertionError("scan was rendered")):
+            result = build_flipped_a4_booklets_pipeline(
+                specs=[SourcePdfSpec(path, same_page_parity=True, margin_cm=1.0, add_watermark=False)],
+                max_pages_per_split=40,
+                final_output_dir=outputs_dir,
+                split_mode="raster",
+            )
+
+        with fitz.open(result.output_pdf_path) as generated:
+            self.assertEqual(generated.page_count, 4)
+            output_images = {
+                generated.xref_stream_raw(xref)
+                for xref in range(1, generated.xref_length())
+                if generated.xref_get_key(xref, "Subtype") == ("name", "/Image")
+            }
+        # Each scan is embedded once, byte for byte, and shared by both halves.
+        self.assertEqual(output_images, original_images)
+
+    def test_auto_split_renders_only_pages_that_need_it(self):
+        uploads_dir = os.path.join(TEST_MEDIA_ROOT, "uploads")
+        outputs_dir = os.path.join(TEST_MEDIA_ROOT, "booklets_outputs")
+        os.makedirs(uploads_dir, exist_ok=True)
+        path = os.path.join(uploads_dir, "mixed.pdf")
+        doc = fitz.open("pdf", build_scanned_pdf_bytes(1, dpi=50))
+        try:
+            doc.new_page().insert_text((72, 96), "AUTO VECTOR TEXT")
+            doc.new_page().draw_rect(fitz.Rect(72, 72, 400, 700), fill=(0, 0, 1), fill_opacity=0.4)
+            doc.save(path)
+        finally:
+            doc.close()
+
+        with fitz.open(path) as source:
+            self.assertEqual([_half_route(page, "auto", False) for page in source], ["clip", "clip", "raster"])
+
+        with mock.patch.object(fitz.Page, "get_pixmap", autospec=True, side_effect=fitz.Page.get_pixmap) as render:
+            result = build_flipped_a4_booklets_pipeline(
+                specs=[SourcePdfSpec(path, same_page_parity=True, margin_cm=1.0, add_watermark=False)],
+                max_pages_per_split=40,
+                final_output_dir=outputs_dir,
+                render_quality="very_low",
+                split_mode="auto",
+            )
+
+        # Only the two halves of the transparent page are rendered.
+        self.assertEqual(render.call_count, 2)
+        with fitz.open(result.output_pdf_path) as generated:
+            self.assertIn("AUTO VECTOR", "".join(page.get_text() for page in generated))
+
+    def test_max_output_size_picks_the_highest_quality_that_fits(self):
+        uploads_dir = os.path.join(TEST_MEDIA_ROOT, "uploads")
+        outputs_dir = os.path.join(TEST_MEDIA_ROOT, "booklets_outputs")
+        os.makedirs(uploads_dir, exist_ok=True)
+        path = os.path.join(uploads_dir, "grafico.pdf")
+        doc = fitz.open()
+        try:
+            for idx in range(4):
+                page = doc.new_page(width=100, height=140)
+                page.insert_text((10, 20), f"Chart {idx + 1}")
+                page.draw_circle((50, 100), 30, fill=(idx / 4, 0.5, 0.2))
+            doc.save(path)
+        finally:
+            doc.close()
+        spec = SourcePdfSpec(path, same_page_parity=True, margin_cm=1.0, add_watermark=False)
+        prepared_pages = prepare_pages_for_specs([spec], preserve_file_parity=True)
+
+        lowest, lowest_bytes = choose_render_quality(prepared_pages, 1, TEST_MEDIA_ROOT)
+        highest, highest_bytes = choose_render_quality(prepared_pages, 10**9, TEST_MEDIA_ROOT)
+        self.assertEqual((lowest, highest), ("very_low", "super_high"))
+        self.assertLess(lowest_bytes, highest_bytes)
+        # The random file /ID makes sample sizes vary by a few bytes between runs.
+        fitting, fitting_bytes = choose_render_quality(prepared_pages, highest_bytes - 1024, TEST_MEDIA_ROOT)
+        self.assertEqual(fitting, "high")
+        self.assertLess(fitting_bytes, highest_bytes)
+
+        result = build_flipped_a4_booklets_pipeline(
+            specs=[spec],
+            max_pages_per_split=40,
+            final_output_dir=outputs_dir,
+            split_mode="raster",
+            render_quality="super_high",
+            max_output_mb=(highest_bytes - 1) / (1024 * 1024),
+        )
+        self.assertEqual(result.chosen_quality, "high")
+        self.assertLess(os.path.getsize(result.output_pdf_path), highest_bytes)
+
+    def test_tile_clips_keeps_each_band_within_the_pixel_budget(self):
+        clip = fitz.Rect(0, 10.55, 2384, 1694)
+        bands = tile_clips(clip, 6.0, max_pixels=16 * 1024 * 1024)
+
+        self.assertGreater(len(bands), 1)
+        self.assertEqual((bands[0].y0, bands[-1].y1), (clip.y0, clip.y1))
+        for upper, lower in zip(bands, bands[1:]):
+            self.assertEqual(upper.y1, lower.y0)
+            # Inner edges sit on device pixel rows, so no row is rendered twice.
+            self.assertAlmostEqual(upper.y1 * 6.0, round(upper.y1 * 6.0))
+        rows = [(math.floor(band.y0 * 6.0 + 1e-6), math.ceil(band.y1 * 6.0 - 1e-6)) for band in bands]
+        self.assertEqual(rows[0][0], math.floor(clip.y0 * 6.0))
+        for (_, upper_end), (lower_start, _) in zip(rows, rows[1:]):
+            self.assertEqual(upper_end, lower_start)
+        for start, end in rows:
+            self.assertLessEqual(math.ceil(clip.width * 6.0) * (end - start), 16 * 1024 * 1024)
+        self.assertEqual(tile_clips(fitz.Rect(0, 0, 595, 421), 4.5), [fitz.Rect(0, 0, 595, 421)])
+
+    def test_oversized_raster_halves_are_rendered_in_bands(self):
+        source = fitz.open()
+        try:
+            page = source.new_page(width=300, height=400)
+            page.draw_rect(fitz.Rect(0, 0, 300, 200), fill=(1, 0, 0))
+            page.draw_rect(fitz.Rect(0, 200, 300, 400), fill=(0, 0, 1))
+            clip = fitz.Rect(0, 0, 300, 400)
+            budget = 300 * 2 * 120 * 2
+
+            with mock.patch("booklets.tiling.tile_clips", side_effect=lambda c, s, _: tile_clips(c, s, budget)):
+                with mock.patch.object(fitz.Page, "get_pixmap", autospec=True, side_effect=fitz.Page.get_pixmap) as render:
+                    half_doc = _materialize_raster_half_doc(page, clip, 2.0, 80)
+        finally:
+            source.close()
+
+        try:
+            self.assertEqual(render.call_count, 4)
+            for call in render.call_args_list:
+                band = call.kwargs["clip"]
+                self.assertLessEqual(band.width * 2 * band.height * 2, budget)
+            placed = [fitz.Rect(info["bbox"]) for info in half_doc[0].get_image_info()]
+            self.assertEqual(len(placed), 4)
+            self.assertEqual(fitz.Rect().include_rect(placed[0]).include_rect(placed[-1]), fitz.Rect(0, 0, 300, 400))
+            pixel = half_doc[0].get_pixmap(clip=fitz.Rect(150, 350, 151, 351)).pixel(0, 0)
+            self.assertGreater(pixel[2], 200)
+        finally:
+            half_doc.close()
+
+    def test_page_colorspace_picks_the_smallest_lossless_colorspace(self):
+        doc = fitz.open()
+        doc.new_page().insert_text((72, 72), "Black text")
+        doc.new_page().draw_rect(fitz.Rect(72, 72, 200, 200), color=(0, 0, 0), fill=(0.6, 0.6, 0.6))
+        doc.new_page().insert_text((72, 72), "Red text", color=(1, 0, 0))
+        colored = fitz.Pixmap(fitz.csRGB, fitz.IRect(0, 0, 8, 8), False)
+        colored.clear_with(0)
+        colored.set_rect(colored.irect, (0, 90, 200))
+        doc.new_page().insert_image(fitz.Rect(72, 72, 200, 200), pixmap=colored)
+        pdf_bytes = doc.tobytes()
+        doc.close()
+
+        with fitz.open("pdf", pdf_bytes) as doc:
+            self.assertEqual([page_colorspace(page) for page in doc], ["bilevel", "gray", "rgb", "rgb"])
+            bilevel = render_pixmap(doc[0], fitz.Matrix(4, 4), "bilevel")
+            self.assertEqual(bilevel.n, 1)
+            self.assertTrue(bilevel.is_monochrome)
+            # Too coarse to threshold without losing glyph edges.
+            self.assertFalse(render_pixmap(doc[0], fitz.Matrix(1, 1), "bilevel").is_monochrome)
+
+        path = os.path.join(TEST_MEDIA_ROOT, "colors.pdf")
+        with open(path, "wb") as fh:
+            fh.write(pdf_bytes)
+        cache = UploadAnalysisCache(os.path.join(TEST_MEDIA_ROOT, "upload_analysis"))
+        cache.analyze(path)
+        self.assertEqual(cache.colorspaces(path), ["bilevel", "gray", "rgb", "rgb"])
+
+    def test_raster_split_stores_black_and_white_halves_as_one_bit_images(self):
+        uploads_dir = os.path.join(TEST_MEDIA_ROOT, "uploads")
+        outputs_dir = os.path.join(TEST_MEDIA_ROOT, "booklets_outputs")
+        os.makedirs(uploads_dir, exist_ok=True)
+        path = os.path.join(uploads_dir, "text.pdf")
+        with open(path, "wb") as fh:
+            fh.write(build_pdf_bytes(2))
+        spec = SourcePdfSpec(path, same_page_parity=True, margin_cm=1.0, add_watermark=False)
+        cache = UploadAnalysisCache(os.path.join(TEST_MEDIA_ROOT, "upload_analysis"))
+        cache.analyze(path)
+
+        with mock.patch("booklets.tiling.page_colorspace", side_effect=AssertionError("classified again")):
+            result = build_flipped_a4_booklets_pipeline(
+                specs=[spec],
+                max_pages_per_split=40,
+                final_output_dir=outputs_dir,
+                render_quality="medium",
+                split_mode="raster",
+                analysis_cache=cache,
+            )
+
+        with fitz.open(result.output_pdf_path) as generated:
+            images = [image for page in generated for image in page.get_images(full=True)]
+            self.assertTrue(images)
+            # 1 bit per component, flate compressed, instead of RGB JPEG.
+            self.assertEqual(
+                {(image[4], generated.xref_get_key(image[0], "Filter")[1]) for image in images},
+                {(1, "/FlateDecode")},
+            )
+
+    def test_streaming_splits_match_compute_split_ranges(self):
+        for total_pages in range(0, 24):
+            pages = [PreparedPage(f"{index}.pdf", index, 595, 842, 1.0) for index in range(total_pages)]
+            for max_pages_per_split in range(1, 9):
+                expected = [pages[start : end + 1] for start, end in compute_split_ranges(total_pages, max_pages_per_split)]
+                self.assertEqual(list(iter_split_pages(iter(pages), max_pages_per_split)), expected)
+
+    def test_streaming_pipeline_imposes_first_split_before_opening_later_files(self):
+        uploads_dir = os.path.join(TEST_MEDIA_ROOT, "uploads")
+        outputs_dir = os.path.join(TEST_MEDIA_ROOT, "booklets_outputs")
+        os.makedirs(uploads_dir, exist_ok=True)
+        specs = []
+        for name in ("uno", "dos", "tres"):
+            path = os.path.join(uploads_dir, f"{name}.pdf")
+            with open(path, "wb") as fh:
+                fh.write(build_pdf_bytes(4, label=name))
+            specs.append(SourcePdfSpec(path, same_page_parity=True, margin_cm=1.0, add_watermark=False))
+
+        events = []
+        real_open = fitz.open
+
+        def record_open(*args, **kwargs):
+            if args and isinstance(args[0], str) and args[0].startswith(uploads_dir):
+                events.append(("open", os.path.basename(args[0])))
+            return real_open(*args, **kwargs)
+
+        def record_split(prepared_pages, output_path, **kwargs):
+            events.append(("split", os.path.basename(output_path)))
+            return create_booklet(prepared_pages, output_path, **kwargs)
+
+        with mock.patch("booklets.services.fitz.open", side_effect=record_open):
+            with mock.patch("booklets.services.create_booklet", side_effect=record_split):
+                build_booklets_pipeline(specs=specs, max_pages_per_split=4, final_output_dir=outputs_dir)
+
+        # Split boundaries need one page of lookahead, so the first split
+        # waits for "dos" but not for "tres".
+        self.assertLess(events.index(("split", "split01_booklet.pdf")), events.index(("open", "tres.pdf")))
+        self.assertLess(events.index(("open", "tres.pdf")), events.index(("split", "split02_booklet.pdf")))
+
+    def test_raster_half_cache_trim_drops_least_recently_used_entries(self):
+        cache = RasterHalfCache(os.path.join(TEST_MEDIA_ROOT, "render_cache"), max_mb=2.5 / 1024)
+        keys = [cache.key("hash", page, (0, 0, 595, 421), 2.5, 84) for page in range(3)]
+        for key in keys:
+            cache.put(key, b"x" * 1024)
+        os.utime(cache._path(keys[0]), (1, 1))
+        os.utime(cache._path(keys[1]), (2, 2))
+        cache.get(keys[0])
+
+        cache.trim()
+
+        self.assertIsNotNone(cache.get(keys[0]))
+        self.assertIsNone(cache.get(keys[1]))
+        self.assertIsNotNone(cache.get(keys[2]))
+
     def test_flipped_a4_cover_is_added_before_imposition(self):
         uploads_dir = os.path.join(TEST_MEDIA_ROOT, "uploads")
         outputs_dir = os.path.join(TEST_MEDIA_ROOT, "booklets_outputs")
@@ -565,6 +1561,204 @@ class BookletsViewTests(TestCase):
             # gives 4 + 4 + 2 output pages.
             self.assertEqual(doc.page_count, 10)
 
+    def test_memory_budget_streams_sheets_without_changing_output(self):
+        uploads_dir = os.path.join(TEST_MEDIA_ROOT, "uploads")
+        outputs_dir = os.path.join(TEST_MEDIA_ROOT, "booklets_outputs")
+        os.makedirs(uploads_dir, exist_ok=True)
+
+        source_path = os.path.join(uploads_dir, "streamed.pdf")
+        with open(source_path, "wb") as fh:
+            fh.write(build_pdf_bytes(7))
+
+        spec = SourcePdfSpec(source_path, same_page_parity=True, margin_cm=0.5, add_watermark=True)
+        os.makedirs(outputs_dir, exist_ok=True)
+        # A 1 MB budget is always exceeded; no growth allowance makes every
+        # sheet spill to its own part, and the parts are appended one by one.
+        with mock.patch("booklets.memory.SPILL_MIN_GROWTH_MB", 0), mock.patch(
+            "booklets.services.merge_pdfs", side_effect=AssertionError("parts loaded back at once")
+        ):
+            create_booklet(
+                prepare_pages_for_specs([spec], preserve_file_parity=True),
+                os.path.join(outputs_dir, "streamed.pdf"),
+                memory_monitor=JobMemoryMonitor(1),
+            )
+        create_booklet(
+            prepare_pages_for_specs([spec], preserve_file_parity=True),
+            os.path.join(outputs_dir, "regular.pdf"),
+        )
+        with fitz.open(os.path.join(outputs_dir, "streamed.pdf")) as streamed, fitz.open(
+            os.path.join(outputs_dir, "regular.pdf")
+        ) as regular:
+            self.assertEqual([page.get_text() for page in streamed], [page.get_text() for page in regular])
+        os.remove(os.path.join(outputs_dir, "streamed.pdf"))
+        os.remove(os.path.join(outputs_dir, "regular.pdf"))
+
+        streamed_side_by_side = build_booklets_pipeline(
+            specs=[spec],
+            max_pages_per_split=40,
+            final_output_dir=outputs_dir,
+            memory_budget_mb=1,
+        )
+        streamed_flipped = build_flipped_a4_booklets_pipeline(
+            specs=[spec],
+            max_pages_per_split=40,
+            final_output_dir=outputs_dir,
+            split_mode="raster",
+            render_quality="very_low",
+            memory_budget_mb=1,
+        )
+        regular_flipped = build_flipped_a4_booklets_pipeline(
+            specs=[spec],
+            max_pages_per_split=40,
+            final_output_dir=outputs_dir,
+            split_mode="raster",
+            render_quality="very_low",
+        )
+
+        self.assertGreater(streamed_side_by_side.peak_rss_mb, 0)
+        self.assertGreater(streamed_flipped.peak_rss_mb, 0)
+        with fitz.open(streamed_side_by_side.output_pdf_path) as doc:
+            self.assertEqual(doc.page_count, 4)
+            self.assertIn("*", doc[0].get_text())
+        with fitz.open(streamed_flipped.output_pdf_path) as streamed, fitz.open(regular_flipped.output_pdf_path) as regular:
+            self.assertEqual(streamed.page_count, regular.page_count)
+        self.assertEqual([name for name in os.listdir(outputs_dir) if ".part" in name], [])
+
+    def test_memory_monitor_spills_again_only_after_growth_past_the_last_spill(self):
+        monitor = JobMemoryMonitor(100)
+        with mock.patch("booklets.memory.current_rss_mb", side_effect=[90, 150, 150, 151, 160, 160, 190, 190]):
+            self.assertFalse(monitor.should_spill())
+            self.assertTrue(monitor.should_spill())
+            monitor.mark_spilled()
+            # RSS stays high after the spill, but has not grown past the baseline.
+            self.assertFalse(monitor.should_spill())
+            self.assertTrue(monitor.should_spill())
+
+    def test_merged_splits_share_one_watermark_font(self):
+        uploads_dir = os.path.join(TEST_MEDIA_ROOT, "uploads")
+        outputs_dir = os.path.join(TEST_MEDIA_ROOT, "booklets_outputs")
+        os.makedirs(uploads_dir, exist_ok=True)
+
+        paths = []
+        for name in ["uno.pdf", "dos.pdf", "tres.pdf"]:
+            path = os.path.join(uploads_dir, name)
+            with open(path, "wb") as fh:
+                fh.write(build_pdf_bytes(2))
+            paths.append(path)
+
+        result = build_booklets_pipeline(
+            specs=[SourcePdfSpec(path, same_page_parity=True, margin_cm=1.0, add_watermark=True) for path in paths],
+            max_pages_per_split=2,
+            final_output_dir=outputs_dir,
+            generate_cover=True,
+        )
+
+        with fitz.open(result.output_pdf_path) as doc:
+            helvetica_fonts = [
+                xref
+                for xref in range(1, doc.xref_length())
+                if doc.xref_get_key(xref, "BaseFont") == ("name", "/Helvetica")
+            ]
+            self.assertEqual(len(helvetica_fonts), 1)
+            self.assertEqual(sum(page.get_text().count("*") for page in doc), 3 + 4)
+
+    def test_share_simple_fonts_rewrites_only_font_resource_entries(self):
+        doc = fitz.open()
+        for text in ["uno", "dos"]:
+            part = fitz.open()
+            part.new_page().insert_text((72, 72), text, fontname="helv")
+            doc.insert_pdf(fitz.open("pdf", part.tobytes()))
+            part.close()
+        font_xrefs = [
+            xref for xref in range(1, doc.xref_length()) if doc.xref_get_key(xref, "BaseFont") == ("name", "/Helvetica")
+        ]
+        self.assertEqual(len(font_xrefs), 2)
+        note = f"(see {font_xrefs[1]} 0 R)"
+        doc.xref_set_key(doc[1].xref, "Note", note)
+
+        self.assertEqual(share_simple_fonts(doc), 1)
+        self.assertEqual([page.get_fonts()[0][0] for page in doc], [font_xrefs[0], font_xrefs[0]])
+        self.assertEqual(doc.xref_get_key(doc[1].xref, "Note"), ("string", note[1:-1]))
+        self.assertEqual([page.get_text().strip() for page in doc], ["uno", "dos"])
+        doc.close()
+
+    def test_page_ranges_limit_prepared_pages_and_move_watermark(self):
+        uploads_dir = os.path.join(TEST_MEDIA_ROOT, "uploads")
+        os.makedirs(uploads_dir, exist_ok=True)
+        path = os.path.join(uploads_dir, "manual.pdf")
+        with open(path, "wb") as fh:
+            fh.write(build_pdf_bytes(12))
+
+        prepared = prepare_pages_for_specs(
+            [SourcePdfSpec(path, same_page_parity=True, margin_cm=1.0, add_watermark=True, page_ranges="3-5,10-")],
+            preserve_file_parity=True,
+        )
+
+        self.assertEqual([page.source_page_number for page in prepared], [2, 3, 4, 9, 10, 11])
+        self.assertEqual([page.add_watermark for page in prepared], [True, False, False, False, False, False])
+
+        with self.assertRaises(ValueError):
+            prepare_pages_for_specs(
+                [SourcePdfSpec(path, same_page_parity=True, margin_cm=1.0, add_watermark=False, page_ranges="11-13")],
+                preserve_file_parity=True,
+            )
+
+    def test_normalize_page_ranges_validates_and_canonicalizes(self):
+        self.assertEqual(normalize_page_ranges(" 1 - 20, 45 ,100- "), "1-20,45,100-")
+        self.assertEqual(normalize_page_ranges(""), "")
+        for invalid in ["0", "5-3", "a-b", "1,,x"]:
+            with self.assertRaises(ValueError):
+                normalize_page_ranges(invalid)
+
+    def test_max_image_dpi_downsamples_scans_to_print_resolution(self):
+        uploads_dir = os.path.join(TEST_MEDIA_ROOT, "uploads")
+        outputs_dir = os.path.join(TEST_MEDIA_ROOT, "booklets_outputs")
+        os.makedirs(uploads_dir, exist_ok=True)
+
+        source_path = os.path.join(uploads_dir, "scan.pdf")
+        with open(source_path, "wb") as fh:
+            fh.write(build_scanned_pdf_bytes(page_count=2, dpi=600))
+
+        specs = [SourcePdfSpec(source_path, same_page_parity=True, margin_cm=0.0, add_watermark=False)]
+        original = build_booklets_pipeline(specs=specs, max_pages_per_split=40, final_output_dir=outputs_dir)
+        downsampled = build_booklets_pipeline(
+            specs=specs,
+            max_pages_per_split=40,
+            final_output_dir=outputs_dir,
+            max_image_dpi=300,
+        )
+
+        self.assertLess(os.path.getsize(downsampled.output_pdf_path), os.path.getsize(original.output_pdf_path))
+        with fitz.open(downsampled.output_pdf_path) as doc:
+            for info in doc[0].get_image_info():
+                placed_width_in = (info["bbox"][2] - info["bbox"][0]) / 72
+                self.assertAlmostEqual(info["width"] / placed_width_in, 300, delta=3)
+
+    def test_downsample_keeps_masked_and_indexed_images(self):
+        def noisy_image_bytes(seed: int) -> bytes:
+            samples = bytes((index * 7919 + seed) * 104729 % 251 for index in range(600 * 600 * 3))
+            return fitz.Pixmap(fitz.csRGB, 600, 600, samples, False).tobytes("png")
+
+        doc = fitz.open()
+        page = doc.new_page()
+        # Three 600 px images in one-inch boxes: 600 dpi each.
+        plain, color_keyed, indexed = (
+            page.insert_image(fitz.Rect(72 + 100 * index, 72, 144 + 100 * index, 144), stream=noisy_image_bytes(index))
+            for index in range(3)
+        )
+        doc.xref_set_key(color_keyed, "Mask", "[0 10 0 10 0 10]")
+        doc.update_stream(indexed, bytes(index % 2 for index in range(600 * 600)))
+        doc.xref_set_key(indexed, "ColorSpace", "[/Indexed /DeviceRGB 1 <000000FFFFFF>]")
+        kept = {xref: doc.xref_stream_raw(xref) for xref in (color_keyed, indexed)}
+
+        self.assertEqual(downsample_images(doc, max_dpi=300), 1)
+        self.assertEqual(doc.xref_get_key(plain, "Width"), ("int", "300"))
+        for xref, raw in kept.items():
+            self.assertEqual(doc.xref_stream_raw(xref), raw)
+            self.assertEqual(doc.xref_get_key(xref, "Width"), ("int", "600"))
+        self.assertEqual(doc.xref_get_key(indexed, "ColorSpace")[0], "array")
+        doc.close()
+
     def test_flipped_a4_watermark_is_added_after_imposition(self):
         uploads_dir = os.path.join(TEST_MEDIA_ROOT, "uploads")
         outputs_dir = os.path.join(TEST_MEDIA_ROOT, "booklets_outputs")
@@ -814,6 +2008,61 @@ class BookletsViewTests(TestCase):
         output_size = os.path.getsize(result.output_pdf_path)
         self.assertLess(output_size, 1_000_000)
 
+    def test_page_content_fingerprint_matches_identical_pages_across_files(self):
+        tmpdir = tempfile.mkdtemp(prefix="booklets_fingerprint_")
+        try:
+            first_path = os.path.join(tmpdir, "first.pdf")
+            second_path = os.path.join(tmpdir, "second.pdf")
+            with open(first_path, "wb") as fh:
+                fh.write(build_repeated_pdf_bytes(2))
+            with open(second_path, "wb") as fh:
+                fh.write(build_repeated_pdf_bytes(1, text="Other form"))
+
+            with fitz.open(first_path) as first, fitz.open(second_path) as second:
+                self.assertEqual(page_content_fingerprint(first, 0), page_content_fingerprint(first, 1))
+                self.assertNotEqual(page_content_fingerprint(first, 0), page_content_fingerprint(second, 0))
+        finally:
+            shutil.rmtree(tmpdir, ignore_errors=True)
+
+    def test_identical_pages_share_one_source_xobject_in_side_by_side_output(self):
+        uploads_dir = os.path.join(TEST_MEDIA_ROOT, "uploads")
+        outputs_dir = os.path.join(TEST_MEDIA_ROOT, "booklets_outputs")
+        os.makedirs(uploads_dir, exist_ok=True)
+
+        repeated_path = os.path.join(uploads_dir, "repeated.pdf")
+        with open(repeated_path, "wb") as fh:
+            fh.write(build_repeated_pdf_bytes(4))
+
+        result = build_booklets_pipeline(
+            specs=[SourcePdfSpec(repeated_path, same_page_parity=True, margin_cm=1.0, add_watermark=False)],
+            max_pages_per_split=40,
+            final_output_dir=outputs_dir,
+            preserve_file_parity=True,
+            generate_cover=False,
+        )
+
+        with fitz.open(result.output_pdf_path) as doc:
+            self.assertEqual(doc.page_count, 2)
+            # One shared page XObject plus one clipped wrapper per placed page.
+            self.assertEqual(_count_xobjects(doc, "Form"), 1 + 4)
+            self.assertEqual(sum(page.get_text().count("Repeated form footer") for page in doc), 4)
+
+def build_scanned_pdf_bytes(page_count: int, dpi: int) -> bytes:
+    doc = fitz.open()
+    for idx in range(page_count):
+        page = doc.new_page()
+        pixmap = fitz.Pixmap(
+            fitz.csRGB,
+            fitz.IRect(0, 0, round(page.rect.width * dpi / 72), round(page.rect.height * dpi / 72)),
+            False,
+        )
+        pixmap.clear_with(60 + idx * 40)
+        page.insert_image(page.rect, stream=pixmap.tobytes("jpeg"))
+    pdf_bytes = doc.tobytes()
+    doc.close()
+    return pdf_bytes
+
+
 def _is_rendered_region_blank(page: fitz.Page, top: bool) -> bool:
     rect = fitz.Rect(page.rect)
     if top:
@@ -0,0 +1,67 @@
+from __future__ import annotations
+
+import math
+from collections.abc import Callable
+
+import fitz
+from pdf_manager_project.pdf_colorspace import PageColorspace, page_colorspace, pixmap_image_bytes, render_pixmap
+
+from .render_cache import DiskLRUCache
+
+
+# About 48 MB of RGB samples per pixmap.
+RASTER_MAX_TILE_PIXELS = 16 * 1024 * 1024
+
+
+def tile_clips(clip: fitz.Rect, scale: float, max_pixels: int = RASTER_MAX_TILE_PIXELS) -> list[fitz.Rect]:
+    """
+    Splits clip into full-width horizontal bands that render at scale
+    within max_pixels each. Inner band edges fall on device pixel rows,
+    counted from the row that holds clip.y0, so neighbouring bands neither
+    share nor skip a row and the tiles meet edge to edge. A clip that fits
+    in the budget comes back as the only band.
+    """
+    width_px = max(math.ceil(clip.x1 * scale) - math.floor(clip.x0 * scale), 1)
+    top_px = math.floor(clip.y0 * scale)
+    height_px = max(math.ceil(clip.y1 * scale) - top_px, 1)
+    band_px = max(max_pixels // width_px, 1)
+    if band_px >= height_px:
+        return [fitz.Rect(clip)]
+
+    edges = [clip.y0]
+    edges += [(top_px + index * band_px) / scale for index in range(1, math.ceil(height_px / band_px))]
+    edges.append(clip.y1)
+    return [fitz.Rect(clip.x0, y0, clip.x1, y1) for y0, y1 in zip(edges, edges[1:])]
+
+
+def render_image_tiles(
+    page: fitz.Page,
+    clip: fitz.Rect,
+    scale: float,
+    jpeg_quality: int,
+    colorspace: PageColorspace | None = "rgb",
+    max_pixels: int = RASTER_MAX_TILE_PIXELS,
+    cache: DiskLRUCache | None = None,
+    cache_key: Callable[[fitz.Rect], str] | None = None,
+) -> list[tuple[fitz.Rect, bytes]]:
+    """
+    Renders clip band by band in the page's colorspace and returns each
+    band's rect (relative to the clip's top left corner) with its image, so
+    only one band's samples are in memory at a time. With a cache, each
+    band is looked up under cache_key(band) first and stored after it is
+    rendered. colorspace=None classifies the page on the first band that
+    has to be rendered.
+    """
+    tiles = []
+    for band in tile_clips(clip, scale, max_pixels):
+        key = cache_key(band) if cache is not None else None
+        image_bytes = cache.get(key) if key is not None else None
+        if image_bytes is None:
+            if colorspace is None:
+                colorspace = page_colorspace(page)
+            pixmap = render_pixmap(page, fitz.Matrix(scale, scale), colorspace, clip=band)
+            image_bytes = pixmap_image_bytes(pixmap, colorspace, jpeg_quality)
+            if key is not None:
+                cache.put(key, image_bytes)
+        tiles.append((fitz.Rect(0, band.y0 - clip.y0, clip.width, band.y1 - clip.y0), image_bytes))
+    return tiles
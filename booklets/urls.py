@@ -8,4 +8,9 @@ urlpatterns = [
     path("booklets/", views.booklets_view, name="form"),
     path("booklets/clear/", views.clear_booklets, name="clear"),
     path("booklets/download/<str:job_id>/", views.download_booklets, name="download"),
+    path("booklets/download/<str:job_id>/sheets/", views.download_booklet_sheets, name="download_sheets"),
+    path("booklets/estimate/", views.estimate_booklets, name="estimate"),
+    path("booklets/preview/", views.preview_booklets, name="preview"),
+    path("booklets/preview/<str:key>.png", views.preview_sheet, name="preview_sheet"),
+    path("booklets/thumbnail/<str:file_hash>.png", views.upload_thumbnail, name="upload_thumbnail"),
 ]
@@ -1,20 +1,46 @@
 # booklets/views.py
 from __future__ import annotations
 
+import logging
 import os
+import re
+import time
 import uuid
+from dataclasses import asdict
 
 from django.conf import settings
 from django.contrib import messages
-from django.http import FileResponse, Http404
+from django.http import FileResponse, Http404, HttpResponse, JsonResponse
 from django.shortcuts import redirect, render
 from django.urls import reverse
+from pdf_manager_project.file_hash import file_content_hash
+from pdf_manager_project.page_ranges import normalize_page_ranges
+from pdf_manager_project.pdf_analysis import enqueue_upload_analysis, upload_analysis_cache
+from pdf_manager_project.pdf_ingest import IngestResult, ingest_upload
+from pdf_manager_project.pdf_sandbox import job_limits, run_sandboxed, upload_limits
 
+from .estimate import JobEstimate, estimate_booklet_job, estimate_mode, record_job_timing
 from .forms import BookletForm
-from .flipped_a4 import build_flipped_a4_booklets_pipeline
+from .flipped_a4 import FLIPPED_A4_QUALITY_PROFILES, build_flipped_a4_booklets_pipeline
+from .preview import (
+    PreviewOptions,
+    load_preview_png,
+    preview_sheet_count,
+    register_preview,
+    resolve_preview_sheets,
+    sweep_previews,
+)
+from .render_cache import RasterHalfCache, SheetFragmentCache
 from .services import SourcePdfSpec, build_booklets_pipeline
 
 SESSION_KEY = "booklets_items"
+# Session list of the join app, whose uploads share the analysis cache.
+JOIN_SESSION_KEY = "joinpdf_items"
+PREVIEW_CACHE_SECONDS = 60 * 60 * 24 * 365
+PREVIEW_KEY_RE = re.compile(r"[0-9a-f]{64}")
+FILE_HASH_RE = re.compile(r"[0-9a-f]{64}")
+
+logger = logging.getLogger(__name__)
 
 
 def _ensure_dir(path: str) -> None:
@@ -53,14 +79,16 @@ def _save_items(request, items: list[dict]) -> None:
     request.session.modified = True
 
 
-def _save_uploaded_file(uploaded_file) -> str:
+def _save_uploaded_file(uploaded_file) -> IngestResult:
     uploads_dir = os.path.join(settings.MEDIA_ROOT, "uploads")
     _ensure_dir(uploads_dir)
     upload_path = _unique_path(uploads_dir, uploaded_file.name)
     with open(upload_path, "wb") as out:
         for chunk in uploaded_file.chunks():
             out.write(chunk)
-    return upload_path
+    stored = ingest_upload(upload_path)
+    enqueue_upload_analysis(stored.path)
+    return stored
 
 
 def _parse_margin(value: str | None, filename: str) -> float:
@@ -75,27 +103,65 @@ def _parse_margin(value: str | None, filename: str) -> float:
     return margin_cm
 
 
-def _legacy_items_from_uploads(files, request) -> list[dict]:
+def _parse_page_ranges(value: str | None, filename: str) -> str:
+    try:
+        return normalize_page_ranges(value)
+    except ValueError as exc:
+        raise ValueError(f"{exc} ({filename})") from exc
+
+
+def _save_accepted_upload(request, uploaded_file, saved_paths: list[str]) -> IngestResult | None:
+    # A rejected upload is reported on its own and leaves the others alone.
+    try:
+        stored = _save_uploaded_file(uploaded_file)
+    except ValueError as exc:
+        messages.error(request, str(exc))
+        return None
+    saved_paths.append(stored.path)
+    return stored
+
+
+def _legacy_items_from_uploads(files, request, saved_paths: list[str]) -> list[dict]:
     items: list[dict] = []
     for idx, uploaded_file in enumerate(files):
+        stored = _save_accepted_upload(request, uploaded_file, saved_paths)
+        if stored is None:
+            continue
         items.append(
             {
                 "id": uuid.uuid4().hex,
                 "name": uploaded_file.name,
-                "path": _save_uploaded_file(uploaded_file),
+                "path": stored.path,
+                "normalized": stored.normalized,
                 "size": uploaded_file.size,
                 "same_page_parity": _parse_bool(request.POST.get(f"file_same_page_parity_{idx}"), default=True),
                 "margin_cm": _parse_margin(request.POST.get(f"file_margin_{idx}", "1.0"), uploaded_file.name),
                 "add_watermark": _parse_bool(request.POST.get(f"file_add_watermark_{idx}"), default=False),
+                "page_ranges": _parse_page_ranges(request.POST.get(f"file_page_ranges_{idx}"), uploaded_file.name),
             }
         )
     return items
 
 
 def _items_from_request(request, files) -> list[dict]:
+    """
+    Builds the item list of a submission. When the submission is invalid,
+    the files it uploaded are removed again before the error is raised.
+    """
+    saved_paths: list[str] = []
+    try:
+        return _build_items(request, files, saved_paths)
+    except ValueError:
+        for path in saved_paths:
+            if os.path.isfile(path):
+                os.remove(path)
+        raise
+
+
+def _build_items(request, files, saved_paths: list[str]) -> list[dict]:
     posted_count = request.POST.get("file_count")
     if posted_count is None:
-        return _legacy_items_from_uploads(files, request)
+        return _legacy_items_from_uploads(files, request, saved_paths)
 
     try:
         count = int(posted_count)
@@ -123,16 +189,21 @@ def _items_from_request(request, files) -> list[dict]:
             if new_index < 0 or new_index >= len(new_files):
                 raise ValueError("Uploaded file reference is out of range.")
             uploaded_file = new_files[new_index]
+            stored = _save_accepted_upload(request, uploaded_file, saved_paths)
+            if stored is None:
+                continue
             item = {
                 "id": uuid.uuid4().hex,
                 "name": uploaded_file.name,
-                "path": _save_uploaded_file(uploaded_file),
+                "path": stored.path,
+                "normalized": stored.normalized,
                 "size": uploaded_file.size,
             }
 
         item["same_page_parity"] = _parse_bool(request.POST.get(f"file_same_page_parity_{idx}"), default=True)
         item["margin_cm"] = _parse_margin(request.POST.get(f"file_margin_{idx}", "1.0"), item.get("name", "PDF"))
         item["add_watermark"] = _parse_bool(request.POST.get(f"file_add_watermark_{idx}"), default=False)
+        item["page_ranges"] = _parse_page_ranges(request.POST.get(f"file_page_ranges_{idx}"), item.get("name", "PDF"))
         items.append(item)
 
     return items
@@ -145,11 +216,21 @@ def _specs_from_items(items: list[dict]) -> list[SourcePdfSpec]:
             same_page_parity=bool(item.get("same_page_parity", True)),
             margin_cm=float(item.get("margin_cm", 1.0)),
             add_watermark=bool(item.get("add_watermark", False)),
+            page_ranges=item.get("page_ranges", ""),
         )
         for item in items
     ]
 
 
+def _thumbnail_url(path: str) -> str:
+    if not path or not os.path.isfile(path):
+        return ""
+    file_hash = file_content_hash(path)
+    if upload_analysis_cache().thumbnail_path(file_hash) is None:
+        return ""
+    return reverse("booklets:upload_thumbnail", kwargs={"file_hash": file_hash})
+
+
 def _items_for_template(items: list[dict]) -> list[dict]:
     return [
         {
@@ -159,6 +240,8 @@ def _items_for_template(items: list[dict]) -> list[dict]:
             "parity": "true" if item.get("same_page_parity", True) else "false",
             "margin": str(item.get("margin_cm", 1.0)),
             "watermark": bool(item.get("add_watermark", False)),
+            "pages": item.get("page_ranges", ""),
+            "thumbnail": _thumbnail_url(item.get("path", "")),
         }
         for item in items
     ]
@@ -171,17 +254,96 @@ def _build_initial_form(form: BookletForm) -> BookletForm:
         initial={
             "processing_mode": form.cleaned_data.get("processing_mode", "separate"),
             "booklet_layout": form.cleaned_data.get("booklet_layout", "side_by_side"),
+            "pages_per_side": form.cleaned_data.get("pages_per_side", 2),
+            "binding": form.cleaned_data.get("binding", "saddle"),
+            "flatten_dpi": form.cleaned_data.get("flatten_dpi") or "",
+            "sheet_image_format": form.cleaned_data.get("sheet_image_format", ""),
             "max_pages_per_split": form.cleaned_data.get("max_pages_per_split", 40),
             "preserve_file_parity": form.cleaned_data.get("preserve_file_parity", True),
             "generate_cover": form.cleaned_data.get("generate_cover", False),
+            "subset_fonts": form.cleaned_data.get("subset_fonts", False),
+            "max_image_dpi": form.cleaned_data.get("max_image_dpi") or "",
             "flipped_a4": form.cleaned_data.get("booklet_layout") == "flipped_a4",
             "flipped_a4_quality": form.cleaned_data.get("flipped_a4_quality", "medium"),
             "flipped_a4_split_mode": form.cleaned_data.get("flipped_a4_split_mode", "vector"),
+            "flipped_a4_prune_halves": form.cleaned_data.get("flipped_a4_prune_halves", False),
+            "flipped_a4_max_output_mb": form.cleaned_data.get("flipped_a4_max_output_mb") or "",
             "flipped_a4_center_gap_cm": form.cleaned_data.get("flipped_a4_center_gap_cm", 1.0),
         }
     )
 
 
+def _sheets_url(result) -> str:
+    if not result.sheet_images_path:
+        return ""
+    return reverse("booklets:download_sheets", kwargs={"job_id": result.job_id})
+
+
+def _quality_label(result) -> str:
+    if not result.chosen_quality:
+        return ""
+    render_scale, jpeg_quality = FLIPPED_A4_QUALITY_PROFILES[result.chosen_quality]
+    name = dict(BookletForm.base_fields["flipped_a4_quality"].choices)[result.chosen_quality]
+    return f"{name} ({render_scale:g}x, JPEG {jpeg_quality})"
+
+
+def _checkpoint_dir() -> str:
+    return os.path.join(settings.MEDIA_ROOT, "booklets_jobs")
+
+
+def _raster_half_cache() -> RasterHalfCache | None:
+    if settings.BOOKLETS_RASTER_CACHE_MB <= 0:
+        return None
+    return RasterHalfCache(os.path.join(settings.MEDIA_ROOT, "booklets_render_cache"), settings.BOOKLETS_RASTER_CACHE_MB)
+
+
+def _sheet_fragment_cache() -> SheetFragmentCache | None:
+    if settings.BOOKLETS_SHEET_CACHE_MB <= 0:
+        return None
+    return SheetFragmentCache(os.path.join(settings.MEDIA_ROOT, "booklets_sheet_cache"), settings.BOOKLETS_SHEET_CACHE_MB)
+
+
+_JOB_OPTION_NAMES = (
+    "max_pages_per_split",
+    "preserve_file_parity",
+    "generate_cover",
+    "split_mode",
+    "center_gap_cm",
+    "pages_per_side",
+    "binding",
+)
+
+
+def _run_timed_pipeline(pipeline, pipeline_kwargs: dict, booklet_layout: str):
+    """
+    Runs a booklet pipeline and records how long it took next to the cost
+    model's output for the pages it imposed, which calibrates later
+    estimates. Recording is best effort and never fails the job.
+    """
+    started = time.perf_counter()
+    result = run_sandboxed(pipeline, limits=job_limits(), **pipeline_kwargs)
+    actual_seconds = time.perf_counter() - started
+
+    if result.features is not None:
+        options = PreviewOptions(
+            booklet_layout=booklet_layout,
+            **{name: pipeline_kwargs[name] for name in _JOB_OPTION_NAMES if pipeline_kwargs.get(name) is not None},
+        )
+        flatten_dpi = pipeline_kwargs.get("flatten_dpi")
+        try:
+            record_job_timing(
+                estimate_mode(options, flatten_dpi),
+                result.features,
+                result.chosen_quality or pipeline_kwargs.get("render_quality") or "medium",
+                flatten_dpi,
+                actual_seconds,
+                result.output_pdf_path,
+            )
+        except Exception:
+            logger.exception("Could not record the timing of booklet job %s", result.job_id)
+    return result
+
+
 def booklets_view(request):
     results = []
     items = _get_items(request)
@@ -198,12 +360,20 @@ def booklets_view(request):
         files = form.cleaned_data.get("input_pdf") or request.FILES.getlist("input_pdf")
         processing_mode = form.cleaned_data["processing_mode"]
         booklet_layout = form.cleaned_data["booklet_layout"]
+        pages_per_side = form.cleaned_data["pages_per_side"]
+        binding = form.cleaned_data["binding"]
+        flatten_dpi = form.cleaned_data["flatten_dpi"]
+        sheet_image_format = form.cleaned_data["sheet_image_format"] or None
         max_pages_per_split = form.cleaned_data["max_pages_per_split"]
         preserve_file_parity = bool(form.cleaned_data["preserve_file_parity"])
         generate_cover = bool(form.cleaned_data["generate_cover"])
+        subset_fonts = bool(form.cleaned_data["subset_fonts"])
+        max_image_dpi = form.cleaned_data["max_image_dpi"]
         flipped_a4 = booklet_layout == "flipped_a4"
         flipped_a4_quality = form.cleaned_data["flipped_a4_quality"]
         flipped_a4_split_mode = form.cleaned_data["flipped_a4_split_mode"]
+        flipped_a4_prune_halves = bool(form.cleaned_data["flipped_a4_prune_halves"])
+        flipped_a4_max_output_mb = form.cleaned_data["flipped_a4_max_output_mb"]
         flipped_a4_center_gap_cm = form.cleaned_data["flipped_a4_center_gap_cm"]
         outputs_dir = os.path.join(settings.MEDIA_ROOT, "booklets_outputs")
         _ensure_dir(outputs_dir)
@@ -236,16 +406,32 @@ def booklets_view(request):
                     "final_output_dir": outputs_dir,
                     "preserve_file_parity": preserve_file_parity,
                     "generate_cover": generate_cover,
+                    "memory_budget_mb": settings.BOOKLETS_MEMORY_BUDGET_MB,
+                    "subset_fonts": subset_fonts,
+                    "max_image_dpi": max_image_dpi,
+                    "sheet_cache": _sheet_fragment_cache(),
+                    "analysis_cache": upload_analysis_cache(),
+                    "checkpoint_dir": _checkpoint_dir(),
                 }
                 if flipped_a4:
                     pipeline_kwargs["render_quality"] = flipped_a4_quality
                     pipeline_kwargs["split_mode"] = flipped_a4_split_mode
+                    pipeline_kwargs["prune_vector_halves"] = flipped_a4_prune_halves
+                    pipeline_kwargs["max_output_mb"] = flipped_a4_max_output_mb
                     pipeline_kwargs["center_gap_cm"] = flipped_a4_center_gap_cm
-                result = pipeline(**pipeline_kwargs)
+                    pipeline_kwargs["raster_cache"] = _raster_half_cache()
+                else:
+                    pipeline_kwargs["pages_per_side"] = pages_per_side
+                    pipeline_kwargs["binding"] = binding
+                    pipeline_kwargs["flatten_dpi"] = flatten_dpi
+                    pipeline_kwargs["sheet_image_format"] = sheet_image_format
+                result = _run_timed_pipeline(pipeline, pipeline_kwargs, booklet_layout)
                 results.append(
                     {
                         "original_name": "Combined print file",
                         "download_url": reverse("booklets:download", kwargs={"job_id": result.job_id}),
+                        "sheets_url": _sheets_url(result),
+                        "quality": _quality_label(result),
                     }
                 )
                 messages.success(request, "Combined booklet generated successfully.")
@@ -257,16 +443,32 @@ def booklets_view(request):
                         "final_output_dir": outputs_dir,
                         "preserve_file_parity": True,
                         "generate_cover": False,
+                        "memory_budget_mb": settings.BOOKLETS_MEMORY_BUDGET_MB,
+                        "subset_fonts": subset_fonts,
+                        "max_image_dpi": max_image_dpi,
+                        "sheet_cache": _sheet_fragment_cache(),
+                        "analysis_cache": upload_analysis_cache(),
+                        "checkpoint_dir": _checkpoint_dir(),
                     }
                     if flipped_a4:
                         pipeline_kwargs["render_quality"] = flipped_a4_quality
                         pipeline_kwargs["split_mode"] = flipped_a4_split_mode
+                        pipeline_kwargs["prune_vector_halves"] = flipped_a4_prune_halves
+                        pipeline_kwargs["max_output_mb"] = flipped_a4_max_output_mb
                         pipeline_kwargs["center_gap_cm"] = flipped_a4_center_gap_cm
-                    result = pipeline(**pipeline_kwargs)
+                        pipeline_kwargs["raster_cache"] = _raster_half_cache()
+                    else:
+                        pipeline_kwargs["pages_per_side"] = pages_per_side
+                        pipeline_kwargs["binding"] = binding
+                        pipeline_kwargs["flatten_dpi"] = flatten_dpi
+                        pipeline_kwargs["sheet_image_format"] = sheet_image_format
+                    result = _run_timed_pipeline(pipeline, pipeline_kwargs, booklet_layout)
                     results.append(
                         {
                             "original_name": item.get("name", os.path.basename(spec.input_pdf_path)),
                             "download_url": reverse("booklets:download", kwargs={"job_id": result.job_id}),
+                            "sheets_url": _sheets_url(result),
+                            "quality": _quality_label(result),
                         }
                     )
                 messages.success(request, f"Generated booklets for {len(results)} file(s).")
@@ -296,6 +498,154 @@ def clear_booklets(request):
     return redirect("booklets:form")
 
 
+def _preview_cache_dir() -> str:
+    return os.path.join(settings.MEDIA_ROOT, "booklets_previews")
+
+
+def _preview_options_from_request(request, separate: bool) -> PreviewOptions:
+    layout = request.GET.get("booklet_layout") or "side_by_side"
+    if layout not in {"side_by_side", "flipped_a4"}:
+        raise ValueError("Invalid booklet layout.")
+
+    split_mode = request.GET.get("flipped_a4_split_mode") or "vector"
+    if split_mode not in {"vector", "raster", "auto"}:
+        raise ValueError("Invalid page split method.")
+
+    binding = request.GET.get("binding") or "saddle"
+    if binding not in {"saddle", "perfect"}:
+        raise ValueError("Invalid binding.")
+
+    try:
+        max_pages_per_split = int(request.GET.get("max_pages_per_split") or "40")
+        pages_per_side = int(request.GET.get("pages_per_side") or "2")
+        center_gap_cm = float(request.GET.get("flipped_a4_center_gap_cm") or "1.0")
+    except ValueError as exc:
+        raise ValueError("Invalid numeric option.") from exc
+    if max_pages_per_split < 1 or center_gap_cm < 0 or pages_per_side not in {2, 4, 8}:
+        raise ValueError("Invalid numeric option.")
+
+    return PreviewOptions(
+        booklet_layout=layout,
+        max_pages_per_split=max_pages_per_split,
+        preserve_file_parity=True if separate else _parse_bool(request.GET.get("preserve_file_parity")),
+        generate_cover=False if separate else _parse_bool(request.GET.get("generate_cover")),
+        split_mode=split_mode,
+        center_gap_cm=center_gap_cm,
+        pages_per_side=pages_per_side,
+        binding=binding,
+    )
+
+
+def preview_booklets(request):
+    items = _get_items(request)
+    if not items:
+        return JsonResponse({"sheet_count": 0, "sheets": []})
+
+    separate = request.GET.get("processing_mode", "separate") != "combined"
+    try:
+        options = _preview_options_from_request(request, separate)
+        specs = _specs_from_items(items)
+        if separate:
+            item_index = int(request.GET.get("item") or "0")
+            if not 0 <= item_index < len(specs):
+                raise ValueError("Invalid file reference.")
+            specs = [specs[item_index]]
+        sheet_count = run_sandboxed(preview_sheet_count, specs, options, limits=upload_limits())
+        sheet_indexes = resolve_preview_sheets(request.GET.get("sheets", ""), sheet_count)
+    except ValueError as exc:
+        return JsonResponse({"error": str(exc)}, status=400)
+
+    cache_dir = _preview_cache_dir()
+    sweep_previews(cache_dir)
+    return JsonResponse(
+        {
+            "sheet_count": sheet_count,
+            "sheets": [
+                {
+                    "number": sheet_index + 1,
+                    "url": reverse(
+                        "booklets:preview_sheet",
+                        kwargs={"key": register_preview(cache_dir, specs, options, sheet_index)},
+                    ),
+                }
+                for sheet_index in sheet_indexes
+            ],
+        }
+    )
+
+
+def _estimate_json(estimate: JobEstimate) -> dict:
+    return {
+        key: value
+        for key, value in asdict(estimate).items()
+        if key not in {"model_seconds", "model_bytes"}
+    }
+
+
+def estimate_booklets(request):
+    items = _get_items(request)
+    if not items:
+        return JsonResponse({"jobs": [], "total": None})
+
+    separate = request.GET.get("processing_mode", "separate") != "combined"
+    render_quality = request.GET.get("flipped_a4_quality") or "medium"
+    try:
+        options = _preview_options_from_request(request, separate)
+        if render_quality not in FLIPPED_A4_QUALITY_PROFILES:
+            raise ValueError("Invalid render quality.")
+        try:
+            flatten_dpi = int(request.GET.get("flatten_dpi") or "0") or None
+        except ValueError as exc:
+            raise ValueError("Invalid numeric option.") from exc
+        if options.booklet_layout == "flipped_a4":
+            flatten_dpi = None
+
+        specs = _specs_from_items(items)
+        job_specs = [[spec] for spec in specs] if separate else [specs]
+        cache = upload_analysis_cache()
+        estimates = [
+            estimate_booklet_job(job, options, render_quality, flatten_dpi, analysis_cache=cache)
+            for job in job_specs
+        ]
+    except ValueError as exc:
+        return JsonResponse({"error": str(exc)}, status=400)
+
+    job_names = [item.get("name", "") for item in items] if separate else ["Combined print file"]
+    return JsonResponse(
+        {
+            "jobs": [{"name": name, **_estimate_json(estimate)} for name, estimate in zip(job_names, estimates)],
+            "total": {
+                "output_pages": sum(estimate.output_pages for estimate in estimates),
+                "paper_sheets": sum(estimate.paper_sheets for estimate in estimates),
+                "predicted_seconds": round(sum(estimate.predicted_seconds for estimate in estimates), 2),
+                "predicted_bytes": sum(estimate.predicted_bytes for estimate in estimates),
+                "calibrated": all(estimate.calibrated for estimate in estimates),
+            },
+        }
+    )
+
+
+def preview_sheet(request, key: str):
+    if not PREVIEW_KEY_RE.fullmatch(key):
+        raise Http404("Preview not found")
+
+    # Only the session that uploaded the inputs may load their previews.
+    allowed_paths = {item["path"] for item in _get_items(request)}
+    try:
+        png = load_preview_png(_preview_cache_dir(), key, allowed_paths)
+    except ValueError:
+        png = None
+    if png is None:
+        raise Http404("Preview not found")
+
+    # The key hashes the inputs, options and sheet, so the image never
+    # changes; it shows the user's own document, so no shared caches.
+    response = HttpResponse(png, content_type="image/png")
+    response["Cache-Control"] = f"private, max-age={PREVIEW_CACHE_SECONDS}, immutable"
+    response["ETag"] = f'"{key}"'
+    return response
+
+
 def download_booklets(request, job_id: str):
     outputs_dir = os.path.join(settings.MEDIA_ROOT, "booklets_outputs")
     pdf_path = os.path.join(outputs_dir, f"{job_id}_booklets_for_printing.pdf")
@@ -311,3 +661,44 @@ def download_booklets(request, job_id: str):
         filename=os.path.basename(pdf_path),
         content_type="application/pdf",
     )
+
+
+def download_booklet_sheets(request, job_id: str):
+    outputs_dir = os.path.join(settings.MEDIA_ROOT, "booklets_outputs")
+    zip_path = os.path.join(outputs_dir, f"{job_id}_booklet_sheets.zip")
+    if not os.path.isfile(zip_path):
+        raise Http404("File not found")
+
+    return FileResponse(
+        open(zip_path, "rb"),
+        as_attachment=True,
+        filename=os.path.basename(zip_path),
+        content_type="application/zip",
+    )
+
+
+def upload_thumbnail(request, file_hash: str):
+    if not FILE_HASH_RE.fullmatch(file_hash):
+        raise Http404("Thumbnail not found")
+
+    # Only sessions holding an upload with this content may see its pages.
+    session_items = [
+        item
+        for key in (SESSION_KEY, JOIN_SESSION_KEY)
+        for item in (request.session.get(key) or [])
+        if isinstance(item, dict) and item.get("path")
+    ]
+    if not any(
+        os.path.isfile(item["path"]) and file_content_hash(item["path"]) == file_hash for item in session_items
+    ):
+        raise Http404("Thumbnail not found")
+
+    path = upload_analysis_cache().thumbnail_path(file_hash)
+    if path is None:
+        raise Http404("Thumbnail not found")
+
+    # Keyed by file content, so a thumbnail never changes; it shows the
+    # user's own document, so no shared caches.
+    response = FileResponse(open(path, "rb"), content_type="image/png")
+    response["Cache-Control"] = f"private, max-age={PREVIEW_CACHE_SECONDS}, immutable"
+    return response
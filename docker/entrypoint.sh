@@ -44,14 +44,18 @@ python manage.py migrate --noinput
 python manage.py collectstatic --noinput || true
 
 # ------------------------------------------------------------
-# MODO WORKER: /entrypoint.sh rqworker default
+# MODO WORKER: /entrypoint.sh rqworker default low
+# (las colas se atienden en el orden dado)
 # ------------------------------------------------------------
 if [ "${1:-}" = "rqworker" ]; then
-  QUEUE="${2:-default}"
+  shift
+  if [ "$#" -eq 0 ]; then
+    set -- default low
+  fi
   echo "   Mode    : rqworker"
-  echo "   Queue   : ${QUEUE}"
+  echo "   Queues  : $*"
   echo ""
-  exec python manage.py rqworker "${QUEUE}"
+  exec python manage.py rqworker "$@"
 fi
 
 # ------------------------------------------------------------
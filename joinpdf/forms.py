@@ -49,3 +49,24 @@ class JoinRunForm(forms.Form):
         initial=False,
         widget=forms.CheckboxInput(attrs={"class": "form-check-input"}),
     )
+
+    subset_fonts = forms.BooleanField(
+        label="Subset embedded fonts",
+        required=False,
+        initial=False,
+        widget=forms.CheckboxInput(attrs={"class": "form-check-input"}),
+    )
+
+    max_image_dpi = forms.TypedChoiceField(
+        label="Image resolution",
+        required=False,
+        initial="",
+        coerce=int,
+        empty_value=None,
+        choices=[
+            ("", "Keep original images"),
+            ("300", "Downsample to 300 dpi (print)"),
+            ("150", "Downsample to 150 dpi (draft)"),
+        ],
+        widget=forms.Select(attrs={"class": "form-select"}),
+    )
@@ -8,7 +8,10 @@ from dataclasses import dataclass
 
 import fitz  # PyMuPDF
 from django.utils import timezone
+from pdf_manager_project.page_ranges import page_index_runs, selected_page_indexes
+from pdf_manager_project.pdf_analysis import UploadAnalysisCache
 from pdf_manager_project.pdf_cover import collect_cover_entries, create_cover_pdf
+from pdf_manager_project.pdf_optimize import downsample_images, optimize_output_fonts
 
 
 @dataclass(frozen=True)
@@ -27,6 +30,9 @@ def join_pdfs(
     output_path: str,
     preserve_parity: bool,
     cover_pdf_path: str | None = None,
+    subset_fonts: bool = False,
+    max_image_dpi: int | None = None,
+    page_ranges: list[str] | None = None,
 ) -> None:
     """
     Joins PDFs in the given order.
@@ -34,6 +40,15 @@ def join_pdfs(
     preserve_parity=True:
       before inserting each PDF, if the output document has an odd page count,
       a blank page is added so the next PDF starts on an odd page.
+
+    subset_fonts=True:
+      embedded fonts are reduced to the glyphs actually used before saving.
+
+    max_image_dpi:
+      images whose effective resolution on the page is above it are resampled.
+
+    page_ranges:
+      optional 1-based selection per input ("1-20,45"); empty means all pages.
     """
     if not input_paths:
         raise ValueError("There are no PDFs to join")
@@ -53,19 +68,26 @@ def join_pdfs(
             if d.page_count == 0:
                 continue
 
+            selection = page_ranges[i] if page_ranges and i < len(page_ranges) else ""
+            page_numbers = selected_page_indexes(selection, d.page_count)
+
             # If each section should start on an odd page, add a blank when the
             # current output page count would make the next page even.
             if preserve_parity and out.page_count > 0 and (out.page_count % 2 == 1):
-                _add_blank_page(out, d[0])
+                _add_blank_page(out, d[page_numbers[0]])
 
-            out.insert_pdf(d)
+            for from_page, to_page in page_index_runs(page_numbers):
+                out.insert_pdf(d, from_page=from_page, to_page=to_page)
 
     if out.page_count == 0:
         out.close()
         raise ValueError("Empty result (all PDFs were empty)")
 
+    optimize_output_fonts(out, subset_fonts=subset_fonts)
+    if max_image_dpi:
+        downsample_images(out, max_dpi=max_image_dpi)
     os.makedirs(os.path.dirname(output_path), exist_ok=True)
-    out.save(output_path)
+    out.save(output_path, garbage=1, deflate=subset_fonts)
     out.close()
 
 
@@ -75,6 +97,10 @@ def build_join_pipeline(
     preserve_parity: bool,
     generate_cover: bool = False,
     display_names: list[str] | None = None,
+    subset_fonts: bool = False,
+    max_image_dpi: int | None = None,
+    page_ranges: list[str] | None = None,
+    analysis_cache: UploadAnalysisCache | None = None,
 ) -> JoinJobResult:
     job_id = uuid.uuid4().hex
     os.makedirs(final_output_dir, exist_ok=True)
@@ -86,7 +112,12 @@ def build_join_pipeline(
             cover_pdf_path = os.path.join(tmp, "cover.pdf")
             create_cover_pdf(
                 output_path=cover_pdf_path,
-                entries=collect_cover_entries(input_paths, display_names=display_names),
+                entries=collect_cover_entries(
+                    input_paths,
+                    display_names=display_names,
+                    page_ranges=page_ranges,
+                    analysis_cache=analysis_cache,
+                ),
                 generated_on=timezone.localdate(),
                 heading="Document index",
             )
@@ -96,6 +127,9 @@ def build_join_pipeline(
             output_path=final_pdf,
             preserve_parity=preserve_parity,
             cover_pdf_path=cover_pdf_path,
+            subset_fonts=subset_fonts,
+            max_image_dpi=max_image_dpi,
+            page_ranges=page_ranges,
         )
 
     return JoinJobResult(job_id=job_id, output_pdf_path=final_pdf)
@@ -1,14 +1,20 @@
 from __future__ import annotations
 
 import os
+import re
 import shutil
 import tempfile
+import time
+from unittest import mock
 
 import fitz
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django.test import TestCase, override_settings
 from django.urls import reverse
 
+from pdf_manager_project.pdf_analysis import run_upload_analysis
+from pdf_manager_project.pdf_sandbox import PdfSandboxError, SandboxLimits, run_sandboxed
+
 from .services import build_join_pipeline
 
 
@@ -25,6 +31,18 @@ def build_pdf_bytes(page_count: int) -> bytes:
     return pdf_bytes
 
 
+def build_incremental_pdf_bytes() -> bytes:
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "incremental.pdf")
+        with open(path, "wb") as fh:
+            fh.write(build_pdf_bytes(1))
+        with fitz.open(path) as doc:
+            doc[0].insert_text((72, 144), "Added later")
+            doc.saveIncr()
+        with open(path, "rb") as fh:
+            return fh.read()
+
+
 @override_settings(MEDIA_ROOT=TEST_MEDIA_ROOT)
 class JoinPdfViewTests(TestCase):
     def setUp(self):
@@ -53,6 +71,88 @@ class JoinPdfViewTests(TestCase):
         items = self.client.session.get("joinpdf_items", [])
         self.assertEqual([item["name"] for item in items], ["uno.pdf", "dos.pdf"])
 
+    def test_upload_normalizes_damaged_and_incrementally_updated_pdfs(self):
+        damaged = re.sub(rb"startxref\s+\d+", b"startxref\n999", build_pdf_bytes(2))
+
+        response = self.client.post(
+            reverse("joinpdf:form"),
+            data={
+                "action": "upload",
+                "input_pdf": [
+                    SimpleUploadedFile("roto.pdf", damaged, content_type="application/pdf"),
+                    SimpleUploadedFile("incremental.pdf", build_incremental_pdf_bytes(), content_type="application/pdf"),
+                    SimpleUploadedFile("limpio.pdf", build_pdf_bytes(1), content_type="application/pdf"),
+                ],
+            },
+            follow=True,
+        )
+
+        self.assertEqual(response.status_code, 200)
+        items = self.client.session.get("joinpdf_items", [])
+        self.assertEqual([item["normalized"] for item in items], [True, True, False])
+        for item in items:
+            with open(item["path"], "rb") as fh:
+                self.assertEqual(fh.read().count(b"startxref"), 1)
+            with fitz.open(item["path"]) as doc:
+                self.assertFalse(doc.is_repaired)
+        with fitz.open(items[1]["path"]) as doc:
+            self.assertIn("Added later", doc[0].get_text())
+
+    def test_upload_rejects_files_that_are_not_complete_pdfs(self):
+        truncated = build_pdf_bytes(1)[:-200]
+
+        response = self.client.post(
+            reverse("joinpdf:form"),
+            data={
+                "action": "upload",
+                "input_pdf": [
+                    SimpleUploadedFile("foto.pdf", b"\x89PNG\r\n\x1a\n" + b"0" * 64, content_type="application/pdf"),
+                    SimpleUploadedFile("cortado.pdf", truncated, content_type="application/pdf"),
+                    SimpleUploadedFile("limpio.pdf", build_pdf_bytes(1), content_type="application/pdf"),
+                ],
+            },
+            follow=True,
+        )
+
+        items = self.client.session.get("joinpdf_items", [])
+        self.assertEqual([item["name"] for item in items], ["limpio.pdf"])
+        errors = [str(message) for message in response.context["messages"]]
+        self.assertTrue(any("not a PDF" in message for message in errors))
+        self.assertTrue(any("incomplete" in message for message in errors))
+        upload_dir = os.path.dirname(items[0]["path"])
+        self.assertEqual(os.listdir(upload_dir), [os.path.basename(items[0]["path"])])
+
+    def test_sandbox_returns_results_and_stops_runaway_parsing(self):
+        self.assertEqual(run_sandboxed(sum, [1, 2, 3], limits=SandboxLimits(wall_seconds=10, cpu_seconds=10)), 6)
+        with self.assertRaises(ZeroDivisionError):
+            run_sandboxed(divmod, 1, 0, limits=SandboxLimits(wall_seconds=10, cpu_seconds=10))
+        with self.assertRaisesRegex(PdfSandboxError, "longer than"):
+            run_sandboxed(time.sleep, 30, limits=SandboxLimits(wall_seconds=0.5, cpu_seconds=10))
+
+    def test_upload_queues_low_priority_analysis_and_tolerates_missing_redis(self):
+        upload = {
+            "action": "upload",
+            "input_pdf": [SimpleUploadedFile("uno.pdf", build_pdf_bytes(1), content_type="application/pdf")],
+        }
+
+        with mock.patch("pdf_manager_project.pdf_analysis.django_rq.get_queue") as get_queue:
+            self.client.post(reverse("joinpdf:form"), data=upload, follow=True)
+
+        get_queue.assert_called_once_with("low")
+        args = get_queue.return_value.enqueue.call_args.args
+        self.assertIs(args[0], run_upload_analysis)
+        self.assertEqual(args[1], self.client.session["joinpdf_items"][0]["path"])
+
+        upload["input_pdf"] = [SimpleUploadedFile("dos.pdf", build_pdf_bytes(1), content_type="application/pdf")]
+        with mock.patch(
+            "pdf_manager_project.pdf_analysis.django_rq.get_queue",
+            side_effect=ConnectionError("redis is down"),
+        ):
+            response = self.client.post(reverse("joinpdf:form"), data=upload, follow=True)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(self.client.session["joinpdf_items"]), 2)
+
     def test_join_applies_requested_order_before_generating(self):
         uploads_dir = os.path.join(TEST_MEDIA_ROOT, "join_uploads")
         os.makedirs(uploads_dir, exist_ok=True)
@@ -113,3 +213,76 @@ class JoinPdfViewTests(TestCase):
             self.assertIn("Page 1", doc[2].get_text())
             self.assertEqual(doc[3].get_text().strip(), "")
             self.assertIn("Page 1", doc[4].get_text())
+
+    def test_join_uses_only_requested_page_ranges(self):
+        uploads_dir = os.path.join(TEST_MEDIA_ROOT, "join_uploads")
+        outputs_dir = os.path.join(TEST_MEDIA_ROOT, "join_outputs")
+        os.makedirs(uploads_dir, exist_ok=True)
+
+        first_path = os.path.join(uploads_dir, "uno.pdf")
+        second_path = os.path.join(uploads_dir, "dos.pdf")
+        with open(first_path, "wb") as fh:
+            fh.write(build_pdf_bytes(10))
+        with open(second_path, "wb") as fh:
+            fh.write(build_pdf_bytes(3))
+
+        result = build_join_pipeline(
+            input_paths=[first_path, second_path],
+            final_output_dir=outputs_dir,
+            preserve_parity=False,
+            generate_cover=True,
+            display_names=["uno.pdf", "dos.pdf"],
+            page_ranges=["2-3,7", ""],
+        )
+
+        with fitz.open(result.output_pdf_path) as doc:
+            self.assertIn("3 page(s)", doc[0].get_text())
+            texts = [doc[idx].get_text().strip() for idx in range(1, doc.page_count)]
+        self.assertEqual(texts, ["Page 2", "Page 3", "Page 7", "Page 1", "Page 2", "Page 3"])
+
+    def test_join_rejects_invalid_page_ranges(self):
+        uploads_dir = os.path.join(TEST_MEDIA_ROOT, "join_uploads")
+        os.makedirs(uploads_dir, exist_ok=True)
+        path = os.path.join(uploads_dir, "uno.pdf")
+        with open(path, "wb") as fh:
+            fh.write(build_pdf_bytes(2))
+
+        session = self.client.session
+        session["joinpdf_items"] = [{"name": "uno.pdf", "path": path}]
+        session.save()
+
+        response = self.client.post(
+            reverse("joinpdf:form"),
+            data={"action": "join", "item_page_ranges_0": "3-1"},
+            follow=True,
+        )
+
+        self.assertContains(response, "Invalid page range")
+        self.assertNotContains(response, "Download result")
+
+    def test_join_subset_fonts_shrinks_embedded_fonts_and_keeps_text(self):
+        uploads_dir = os.path.join(TEST_MEDIA_ROOT, "join_uploads")
+        outputs_dir = os.path.join(TEST_MEDIA_ROOT, "join_outputs")
+        os.makedirs(uploads_dir, exist_ok=True)
+
+        source_path = os.path.join(uploads_dir, "embedded_font.pdf")
+        doc = fitz.open()
+        try:
+            page = doc.new_page()
+            page.insert_font(fontname="F0", fontbuffer=fitz.Font("cjk").buffer)
+            page.insert_text((72, 72), "Subset me", fontname="F0")
+            doc.save(source_path, garbage=3, deflate=True)
+        finally:
+            doc.close()
+
+        full = build_join_pipeline(input_paths=[source_path], final_output_dir=outputs_dir, preserve_parity=True)
+        subset = build_join_pipeline(
+            input_paths=[source_path],
+            final_output_dir=outputs_dir,
+            preserve_parity=True,
+            subset_fonts=True,
+        )
+
+        self.assertLess(os.path.getsize(subset.output_pdf_path) * 10, os.path.getsize(full.output_pdf_path))
+        with fitz.open(subset.output_pdf_path) as doc:
+            self.assertIn("Subset me", doc[0].get_text())
@@ -9,6 +9,10 @@ from django.contrib import messages
 from django.http import FileResponse, Http404
 from django.shortcuts import redirect, render
 from django.urls import reverse
+from pdf_manager_project.page_ranges import normalize_page_ranges
+from pdf_manager_project.pdf_analysis import enqueue_upload_analysis, upload_analysis_cache
+from pdf_manager_project.pdf_ingest import ingest_upload
+from pdf_manager_project.pdf_sandbox import job_limits, run_sandboxed
 
 from .forms import JoinUploadForm, JoinRunForm
 from .services import build_join_pipeline
@@ -46,6 +50,18 @@ def _save_items(request, items: list[dict[str, Any]]) -> None:
     request.session.modified = True
 
 
+def _apply_requested_page_ranges(items: list[dict[str, Any]], request) -> list[dict[str, Any]]:
+    updated: list[dict[str, Any]] = []
+    for idx, item in enumerate(items):
+        item = dict(item)
+        try:
+            item["page_ranges"] = normalize_page_ranges(request.POST.get(f"item_page_ranges_{idx}", ""))
+        except ValueError as exc:
+            raise ValueError(f"{exc} ({item.get('name', '(unnamed)')})") from exc
+        updated.append(item)
+    return updated
+
+
 def _apply_requested_order(items: list[dict[str, Any]], request) -> list[dict[str, Any]]:
     order_values = request.POST.getlist("item_order")
     if not order_values:
@@ -103,7 +119,13 @@ def join_view(request):
                         for chunk in f.chunks():
                             out.write(chunk)
 
-                    items.append({"name": f.name, "path": upload_path})
+                    try:
+                        stored = ingest_upload(upload_path)
+                    except ValueError as exc:
+                        messages.error(request, str(exc))
+                        continue
+                    enqueue_upload_analysis(stored.path)
+                    items.append({"name": f.name, "path": stored.path, "normalized": stored.normalized})
                     added += 1
 
                 _save_items(request, items)
@@ -128,20 +150,34 @@ def join_view(request):
                 return redirect("joinpdf:form")
 
             if run_form.is_valid():
+                try:
+                    items = _apply_requested_page_ranges(items, request)
+                except ValueError as e:
+                    messages.error(request, str(e))
+                    return redirect("joinpdf:form")
                 items = _apply_requested_order(items, request)
                 _save_items(request, items)
                 preserve_parity = bool(run_form.cleaned_data.get("preserve_parity"))
                 generate_cover = bool(run_form.cleaned_data.get("generate_cover"))
+                subset_fonts = bool(run_form.cleaned_data.get("subset_fonts"))
+                max_image_dpi = run_form.cleaned_data.get("max_image_dpi")
 
                 input_paths = [it.get("path") for it in items if it.get("path")]
                 display_names = [it.get("name", os.path.basename(it.get("path", ""))) for it in items if it.get("path")]
+                page_ranges = [it.get("page_ranges", "") for it in items if it.get("path")]
                 try:
-                    result = build_join_pipeline(
+                    result = run_sandboxed(
+                        build_join_pipeline,
+                        limits=job_limits(),
                         input_paths=input_paths,
                         final_output_dir=outputs_dir,
                         preserve_parity=preserve_parity,
                         generate_cover=generate_cover,
                         display_names=display_names,
+                        subset_fonts=subset_fonts,
+                        max_image_dpi=max_image_dpi,
+                        page_ranges=page_ranges,
+                        analysis_cache=upload_analysis_cache(),
                     )
                 except Exception as e:
                     messages.error(request, f"Error joining PDFs: {e}")
@@ -160,6 +196,8 @@ def join_view(request):
                             initial={
                                 "preserve_parity": preserve_parity,
                                 "generate_cover": generate_cover,
+                                "subset_fonts": subset_fonts,
+                                "max_image_dpi": max_image_dpi or "",
                             }
                         ),
                         "items": items,
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.9 on 2026-10-19 14:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ocrpdf', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ocrjob',
+            name='normalized',
+            field=models.BooleanField(default=False),
+        ),
+    ]
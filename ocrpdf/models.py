@@ -15,6 +15,8 @@ class OcrJob(models.Model):
     job_id = models.CharField(max_length=64, unique=True)
     original_name = models.CharField(max_length=255, blank=True, default="")
     input_path = models.TextField()
+    # True when the upload was rewritten at ingest (repaired, decrypted or flattened).
+    normalized = models.BooleanField(default=False)
     output_path = models.TextField(blank=True, default="")
     status = models.CharField(max_length=16, choices=STATUS_CHOICES, default="queued")
     error_message = models.TextField(blank=True, default="")
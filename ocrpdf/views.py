@@ -10,6 +10,8 @@ from django.contrib import messages
 from django.http import FileResponse, Http404, JsonResponse
 from django.shortcuts import render
 from django.urls import reverse
+from pdf_manager_project.pdf_analysis import enqueue_upload_analysis
+from pdf_manager_project.pdf_ingest import ingest_upload
 
 from .forms import OcrPdfForm
 from .models import OcrJob
@@ -62,12 +64,19 @@ def ocr_view(request):
                 with open(upload_path, "wb") as out:
                     for chunk in f.chunks():
                         out.write(chunk)
+                try:
+                    stored = ingest_upload(upload_path)
+                except ValueError as exc:
+                    messages.error(request, str(exc))
+                    continue
+                enqueue_upload_analysis(stored.path)
 
                 job_id = uuid.uuid4().hex
                 job = OcrJob.objects.create(
                     job_id=job_id,
                     original_name=f.name,
-                    input_path=upload_path,
+                    input_path=stored.path,
+                    normalized=stored.normalized,
                     status="queued",
                     language=language,
                     optimize=optimize,
@@ -87,7 +96,8 @@ def ocr_view(request):
                     }
                 )
 
-            messages.success(request, f"Queued {len(created_jobs)} OCR job(s). You can leave this page open.")
+            if created_jobs:
+                messages.success(request, f"Queued {len(created_jobs)} OCR job(s). You can leave this page open.")
             return render(
                 request,
                 "ocrpdf/ocr_form.html",
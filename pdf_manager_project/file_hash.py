@@ -0,0 +1,23 @@
+from __future__ import annotations
+
+import hashlib
+import os
+from functools import lru_cache
+
+
+def file_content_hash(path: str) -> str:
+    """
+    SHA-256 of a file's bytes. Results are memoized per (path, size, mtime),
+    so repeated lookups of an unchanged upload do not reread it.
+    """
+    stat = os.stat(path)
+    return _file_content_hash(os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+
+
+@lru_cache(maxsize=1024)
+def _file_content_hash(path: str, size: int, mtime_ns: int) -> str:
+    hasher = hashlib.sha256()
+    with open(path, "rb") as fh:
+        for chunk in iter(lambda: fh.read(1024 * 1024), b""):
+            hasher.update(chunk)
+    return hasher.hexdigest()
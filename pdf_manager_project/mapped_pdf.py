@@ -0,0 +1,30 @@
+from __future__ import annotations
+
+import mmap
+from collections.abc import Iterator
+from contextlib import contextmanager
+
+import fitz  # PyMuPDF
+
+
+@contextmanager
+def open_mapped_pdf(path: str) -> Iterator[fitz.Document]:
+    """
+    Opens a PDF from a read-only memory map of the file instead of reading
+    it into the process. Every worker that maps the same file shares its
+    physical pages through the page cache, so a job's process pool holds
+    one copy of a large scan rather than one per worker. Workers only need
+    the path and their page indexes.
+    """
+    with open(path, "rb") as fh:
+        mapped = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+    view = memoryview(mapped)
+    try:
+        doc = fitz.open(stream=view, filetype="pdf")
+        try:
+            yield doc
+        finally:
+            doc.close()
+    finally:
+        view.release()
+        mapped.close()
@@ -0,0 +1,77 @@
+from __future__ import annotations
+
+import re
+
+
+_RANGE_TOKEN_RE = re.compile(r"^(\d+)(?:\s*-\s*(\d*))?$")
+
+
+def _parse_tokens(page_ranges: str) -> list[tuple[int, int | None]]:
+    tokens: list[tuple[int, int | None]] = []
+    for raw_token in page_ranges.split(","):
+        token = raw_token.strip()
+        if not token:
+            continue
+        match = _RANGE_TOKEN_RE.match(token)
+        if not match:
+            raise ValueError(f"Invalid page range: '{token}'.")
+
+        start = int(match.group(1))
+        if match.group(2) is None:
+            end: int | None = start
+        elif match.group(2) == "":
+            end = None
+        else:
+            end = int(match.group(2))
+
+        if start < 1 or (end is not None and end < start):
+            raise ValueError(f"Invalid page range: '{token}'.")
+        tokens.append((start, end))
+    return tokens
+
+
+def normalize_page_ranges(page_ranges: str | None) -> str:
+    """
+    Validates a selection such as "1-20, 45, 100-" and returns it in
+    canonical form ("1-20,45,100-"). An empty selection means every page.
+    """
+    parts = []
+    for start, end in _parse_tokens(page_ranges or ""):
+        if end is None:
+            parts.append(f"{start}-")
+        elif end == start:
+            parts.append(str(start))
+        else:
+            parts.append(f"{start}-{end}")
+    return ",".join(parts)
+
+
+def selected_page_indexes(page_ranges: str | None, page_count: int) -> list[int]:
+    """
+    Resolves a 1-based selection to 0-based page indexes, in the order given.
+    "N-" runs to the last page.
+    """
+    tokens = _parse_tokens(page_ranges or "")
+    if not tokens:
+        return list(range(page_count))
+
+    indexes: list[int] = []
+    for start, end in tokens:
+        last = page_count if end is None else end
+        if start > page_count or last > page_count:
+            raise ValueError(f"Page range '{page_ranges}' exceeds the document's {page_count} pages.")
+        indexes.extend(range(start - 1, last))
+    return indexes
+
+
+def page_index_runs(indexes: list[int]) -> list[tuple[int, int]]:
+    """
+    Groups page indexes into inclusive (from, to) runs of consecutive pages.
+    """
+    runs: list[tuple[int, int]] = []
+    for index in indexes:
+        if runs and runs[-1][1] + 1 == index:
+            runs[-1] = (runs[-1][0], index)
+        else:
+            runs.append((index, index))
+    return runs
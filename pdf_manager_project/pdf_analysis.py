@@ -0,0 +1,194 @@
+from __future__ import annotations
+
+import json
+import os
+import uuid
+
+import django_rq
+import fitz  # PyMuPDF
+from django.conf import settings
+
+from .file_hash import file_content_hash
+from .pdf_colorspace import PageColorspace, page_colorspace, render_pixmap
+
+
+ANALYSIS_VERSION = 2
+ANALYSIS_QUEUE = "low"
+THUMBNAIL_WIDTH_PX = 96
+
+
+def page_content_rect(page: fitz.Page) -> fitz.Rect | None:
+    """
+    Union of the page's text blocks, images and drawings, or None for a
+    page without content.
+    """
+    content_rects = []
+
+    for block in page.get_text("blocks"):
+        content_rects.append(fitz.Rect(block[:4]))
+
+    raw_dict = page.get_text("rawdict")
+    for block in raw_dict.get("blocks", []):
+        if block.get("type") == 1 and "bbox" in block:
+            content_rects.append(fitz.Rect(block["bbox"]))
+
+    for item in page.get_drawings():
+        rect = item.get("rect")
+        if rect and rect.is_valid:
+            content_rects.append(rect)
+
+    if not content_rects:
+        return None
+
+    return fitz.Rect(
+        min(r.x0 for r in content_rects),
+        min(r.y0 for r in content_rects),
+        max(r.x1 for r in content_rects),
+        max(r.y1 for r in content_rects),
+    )
+
+
+def classify_page(page: fitz.Page) -> str:
+    """
+    "scan" for one image with at most an invisible OCR layer (render mode 3)
+    and no drawings, "text" for visible text, "graphics" for other content
+    and "blank" for none.
+    """
+    image_count = len(page.get_image_info())
+    has_drawings = bool(page.get_drawings())
+    has_visible_text = any(span["type"] != 3 for span in page.get_texttrace())
+
+    if image_count == 1 and not has_drawings and not has_visible_text:
+        return "scan"
+    if has_visible_text:
+        return "text"
+    if image_count or has_drawings:
+        return "graphics"
+    return "blank"
+
+
+def _document_kind(page_kinds: list[str]) -> str:
+    kinds = {kind for kind in page_kinds if kind != "blank"}
+    if kinds == {"scan"}:
+        return "scan"
+    if "scan" in kinds:
+        return "mixed"
+    return "text"
+
+
+def analyze_pdf(path: str) -> dict:
+    with fitz.open(path) as doc:
+        metadata = doc.metadata or {}
+        pages = []
+        for page in doc:
+            content_rect = page_content_rect(page)
+            pages.append(
+                {
+                    "width": page.rect.width,
+                    "height": page.rect.height,
+                    "rotation": page.rotation,
+                    "content_rect": list(content_rect) if content_rect is not None else None,
+                    "kind": classify_page(page),
+                    "colorspace": page_colorspace(page),
+                }
+            )
+
+    return {
+        "version": ANALYSIS_VERSION,
+        "page_count": len(pages),
+        "metadata": {key: metadata.get(key) or "" for key in ("title", "author", "subject", "creator")},
+        "kind": _document_kind([page["kind"] for page in pages]),
+        "pages": pages,
+    }
+
+
+def _write_atomic(path: str, data: bytes) -> None:
+    tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+    with open(tmp_path, "wb") as fh:
+        fh.write(data)
+    os.replace(tmp_path, path)
+
+
+class UploadAnalysisCache:
+    """
+    Analysis results and first-page thumbnails of uploaded PDFs, keyed by
+    file content so renamed or re-uploaded copies share one entry.
+    """
+
+    def __init__(self, cache_dir: str):
+        self.cache_dir = cache_dir
+
+    def _base_path(self, file_hash: str) -> str:
+        return os.path.join(self.cache_dir, file_hash[:2], file_hash)
+
+    def load(self, path: str) -> dict | None:
+        try:
+            with open(f"{self._base_path(file_content_hash(path))}.json", "rb") as fh:
+                analysis = json.load(fh)
+        except (OSError, ValueError):
+            return None
+        return analysis if analysis.get("version") == ANALYSIS_VERSION else None
+
+    def thumbnail_path(self, file_hash: str) -> str | None:
+        path = f"{self._base_path(file_hash)}.png"
+        return path if os.path.isfile(path) else None
+
+    def content_rects(self, path: str) -> list[fitz.Rect | None] | None:
+        analysis = self.load(path)
+        if analysis is None:
+            return None
+        return [fitz.Rect(page["content_rect"]) if page["content_rect"] else None for page in analysis["pages"]]
+
+    def colorspaces(self, path: str) -> list[PageColorspace] | None:
+        analysis = self.load(path)
+        if analysis is None:
+            return None
+        return [page["colorspace"] for page in analysis["pages"]]
+
+    def analyze(self, path: str) -> dict:
+        analysis = self.load(path)
+        if analysis is not None:
+            return analysis
+
+        file_hash = file_content_hash(path)
+        analysis = analyze_pdf(path)
+        base_path = self._base_path(file_hash)
+        os.makedirs(os.path.dirname(base_path), exist_ok=True)
+        with fitz.open(path) as doc:
+            if doc.page_count:
+                page = doc[0]
+                zoom = THUMBNAIL_WIDTH_PX / max(page.rect.width, 1)
+                pixmap = render_pixmap(page, fitz.Matrix(zoom, zoom), analysis["pages"][0]["colorspace"])
+                _write_atomic(f"{base_path}.png", pixmap.tobytes("png"))
+        _write_atomic(f"{base_path}.json", json.dumps(analysis).encode("utf-8"))
+        return analysis
+
+
+def upload_analysis_cache() -> UploadAnalysisCache:
+    return UploadAnalysisCache(os.path.join(settings.MEDIA_ROOT, "upload_analysis"))
+
+
+def run_upload_analysis(path: str, cache_dir: str) -> None:
+    # Uploads can be cleared or replaced before a busy worker gets here.
+    try:
+        UploadAnalysisCache(cache_dir).analyze(path)
+    except (OSError, RuntimeError, ValueError):
+        return
+
+
+def enqueue_upload_analysis(path: str) -> bool:
+    """
+    Queues the analysis of a fresh upload on the low-priority queue, so
+    generation later starts from warm caches. Analysis is only a speed-up:
+    when Redis is unreachable the upload goes on without it.
+    """
+    try:
+        django_rq.get_queue(ANALYSIS_QUEUE).enqueue(
+            run_upload_analysis,
+            path,
+            upload_analysis_cache().cache_dir,
+            result_ttl=0,
+        )
+    except Exception:
+        return False
+    return True
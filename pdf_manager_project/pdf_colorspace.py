@@ -0,0 +1,110 @@
+from __future__ import annotations
+
+from typing import Literal
+
+import fitz  # PyMuPDF
+
+
+PageColorspace = Literal["bilevel", "gray", "rgb"]
+
+# Width of the thumbnail rendered to catch color the content scan cannot
+# see (shadings, colored stencil masks, annotations, color JPEGs).
+COLORSPACE_SAMPLE_WIDTH_PX = 128
+# Largest channel spread, out of 255, still counted as neutral. Absorbs the
+# chroma noise of color JPEGs made from black-and-white originals.
+COLORSPACE_NEUTRAL_TOLERANCE = 24
+# Below this resolution a bilevel render loses visible detail at glyph
+# edges, so bilevel pages are rendered in gray instead.
+BILEVEL_MIN_DPI = 200
+_COLOR_EPSILON = 0.02
+_BILEVEL_THRESHOLD = bytes(255 if value >= 128 else 0 for value in range(256))
+
+
+def _as_rgb(color) -> tuple[float, ...]:
+    if len(color) == 1:
+        return (color[0],) * 3
+    if len(color) == 4:
+        cyan, magenta, yellow, black = color
+        return tuple(1 - min(1.0, value + black) for value in (cyan, magenta, yellow))
+    return tuple(color)
+
+
+def _is_neutral(color) -> bool:
+    rgb = _as_rgb(color)
+    return max(rgb) - min(rgb) <= _COLOR_EPSILON
+
+
+def _is_black_or_white(color) -> bool:
+    return _is_neutral(color) and all(min(value, 1 - value) <= _COLOR_EPSILON for value in _as_rgb(color))
+
+
+def _sample_is_neutral(page: fitz.Page) -> bool:
+    zoom = COLORSPACE_SAMPLE_WIDTH_PX / max(page.rect.width, 1)
+    samples = page.get_pixmap(matrix=fitz.Matrix(zoom, zoom), alpha=False).samples
+    return all(
+        max(red, green, blue) - min(red, green, blue) <= COLORSPACE_NEUTRAL_TOLERANCE
+        for red, green, blue in zip(samples[0::3], samples[1::3], samples[2::3])
+    )
+
+
+def page_colorspace(page: fitz.Page) -> PageColorspace:
+    """
+    Smallest colorspace the page renders in without visible loss. Text and
+    path colors decide first (one colored stroke makes the page "rgb");
+    a small thumbnail then catches color the content scan cannot see.
+    "bilevel" is for pure black-and-white text and paths with at most
+    1-bit images and no transparency; everything else neutral is "gray".
+    """
+    bilevel = True
+    for span in page.get_texttrace():
+        if span["type"] == 3:
+            continue
+        if not _is_neutral(span["color"]):
+            return "rgb"
+        bilevel = bilevel and _is_black_or_white(span["color"]) and span["opacity"] == 1
+    for drawing in page.get_drawings():
+        for key, opacity_key in (("fill", "fill_opacity"), ("color", "stroke_opacity")):
+            color = drawing.get(key)
+            if color is None:
+                continue
+            if not _is_neutral(color):
+                return "rgb"
+            bilevel = bilevel and _is_black_or_white(color) and drawing.get(opacity_key, 1) == 1
+    for image in page.get_image_info():
+        bilevel = bilevel and image["colorspace"] <= 1 and image["bpc"] == 1 and not image["has-mask"]
+
+    if not _sample_is_neutral(page):
+        return "rgb"
+    return "bilevel" if bilevel else "gray"
+
+
+def render_pixmap(
+    page: fitz.Page,
+    matrix: fitz.Matrix,
+    colorspace: PageColorspace = "rgb",
+    clip: fitz.Rect | None = None,
+) -> fitz.Pixmap:
+    """
+    Renders page in the given page colorspace: RGB, DeviceGray, or gray
+    thresholded to pure black and white for bilevel pages rendered at
+    BILEVEL_MIN_DPI or more (bilevel falls back to gray below that).
+    """
+    if colorspace == "rgb":
+        return page.get_pixmap(matrix=matrix, clip=clip, alpha=False)
+
+    pixmap = page.get_pixmap(matrix=matrix, clip=clip, colorspace=fitz.csGRAY, alpha=False)
+    if colorspace == "bilevel" and min(abs(matrix.a), abs(matrix.d)) * 72 >= BILEVEL_MIN_DPI:
+        pixmap = fitz.Pixmap(fitz.csGRAY, pixmap.width, pixmap.height, pixmap.samples.translate(_BILEVEL_THRESHOLD), False)
+    return pixmap
+
+
+def pixmap_image_bytes(pixmap: fitz.Pixmap, colorspace: PageColorspace, jpeg_quality: int) -> bytes:
+    """
+    Encodes a render_pixmap result for insert_image. Thresholded bilevel
+    pixmaps go out as PNG, which MuPDF inserts as an uncompressed 1-bit
+    image (save with deflate to compress it); the others as gray or color
+    JPEG.
+    """
+    if colorspace == "bilevel" and pixmap.n == 1 and pixmap.is_monochrome:
+        return pixmap.tobytes("png")
+    return pixmap.tobytes("jpeg", jpg_quality=jpeg_quality)
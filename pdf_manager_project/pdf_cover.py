@@ -6,6 +6,9 @@ from datetime import date
 
 import fitz  # PyMuPDF
 
+from .page_ranges import selected_page_indexes
+from .pdf_analysis import UploadAnalysisCache
+
 
 @dataclass(frozen=True)
 class CoverEntry:
@@ -27,23 +30,33 @@ def _fallback_title(filename: str) -> str:
     return title or base
 
 
-def collect_cover_entries(input_paths: list[str], display_names: list[str] | None = None) -> list[CoverEntry]:
+def collect_cover_entries(
+    input_paths: list[str],
+    display_names: list[str] | None = None,
+    page_ranges: list[str] | None = None,
+    analysis_cache: UploadAnalysisCache | None = None,
+) -> list[CoverEntry]:
     entries: list[CoverEntry] = []
 
     for idx, path in enumerate(input_paths):
         display_name = display_names[idx] if display_names and idx < len(display_names) else os.path.basename(path)
-        with fitz.open(path) as doc:
-            metadata = doc.metadata or {}
-            title = _clean_meta(metadata.get("title")) or _fallback_title(display_name)
-            author = _clean_meta(metadata.get("author"))
-            entries.append(
-                CoverEntry(
-                    filename=os.path.basename(display_name),
-                    title=title,
-                    author=author,
-                    page_count=doc.page_count,
-                )
+        selection = page_ranges[idx] if page_ranges and idx < len(page_ranges) else ""
+        analysis = analysis_cache.load(path) if analysis_cache is not None else None
+        if analysis is not None:
+            metadata = analysis["metadata"]
+            page_count = analysis["page_count"]
+        else:
+            with fitz.open(path) as doc:
+                metadata = doc.metadata or {}
+                page_count = doc.page_count
+        entries.append(
+            CoverEntry(
+                filename=os.path.basename(display_name),
+                title=_clean_meta(metadata.get("title")) or _fallback_title(display_name),
+                author=_clean_meta(metadata.get("author")),
+                page_count=len(selected_page_indexes(selection, page_count)),
             )
+        )
 
     return entries
 
@@ -0,0 +1,114 @@
+from __future__ import annotations
+
+import mmap
+import os
+from dataclasses import dataclass
+
+import fitz  # PyMuPDF
+
+from .pdf_sandbox import PdfSandboxError, check_pdf_envelope, run_sandboxed, upload_limits
+
+
+@dataclass(frozen=True)
+class IngestResult:
+    path: str
+    normalized: bool
+    reason: str = ""
+
+
+def _count_startxref(path: str) -> int:
+    with open(path, "rb") as fh:
+        if os.fstat(fh.fileno()).st_size == 0:
+            return 0
+        with mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            count = 0
+            position = data.find(b"startxref")
+            while position != -1:
+                count += 1
+                position = data.find(b"startxref", position + 1)
+            return count
+
+
+def normalization_reason(path: str) -> str:
+    """
+    Returns why opening the file costs more than it should ("repaired",
+    "decrypted" or "incremental"), or "" when it is already clean.
+    Files that need a real password are left to the later stages.
+    """
+    with fitz.open(path) as doc:
+        if not doc.is_pdf or doc.needs_pass:
+            return ""
+        if doc.is_repaired:
+            return "repaired"
+        if (doc.metadata or {}).get("encryption"):
+            return "decrypted"
+    # Each incremental update appends another xref section and trailer.
+    # Linearized files also carry two, which a rewrite flattens as well.
+    if _count_startxref(path) > 1:
+        return "incremental"
+    return ""
+
+
+def normalize_pdf_on_ingest(path: str) -> IngestResult:
+    """
+    Rewrites a freshly uploaded PDF in place when MuPDF would otherwise have
+    to repair, decrypt or walk an update chain on every later open. The copy
+    is garbage collected and object-stream compressed. Files that cannot be
+    opened are kept as they are so the usual error surfaces later.
+    """
+    try:
+        reason = normalization_reason(path)
+    except (RuntimeError, ValueError):
+        return IngestResult(path=path, normalized=False)
+    if not reason:
+        return IngestResult(path=path, normalized=False)
+
+    tmp_path = f"{path}.normalized"
+    try:
+        with fitz.open(path) as doc:
+            doc.save(
+                tmp_path,
+                garbage=3,
+                deflate=True,
+                use_objstms=1,
+                encryption=fitz.PDF_ENCRYPT_NONE,
+            )
+        os.replace(tmp_path, path)
+    except (RuntimeError, ValueError):
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        return IngestResult(path=path, normalized=False)
+
+    return IngestResult(path=path, normalized=True, reason=reason)
+
+
+def _scan_and_normalize(path: str) -> IngestResult:
+    # Walks the page tree and every page's geometry, which is where
+    # malformed files hang or explode, before normalizing.
+    try:
+        with fitz.open(path) as doc:
+            if not doc.is_pdf:
+                raise PdfSandboxError(f"'{os.path.basename(path)}' is not a PDF file.")
+            if not doc.needs_pass:
+                if doc.page_count == 0:
+                    raise PdfSandboxError(f"'{os.path.basename(path)}' has no pages.")
+                for page in doc:
+                    page.bound()
+    except (RuntimeError, fitz.FileDataError) as exc:
+        raise PdfSandboxError(f"'{os.path.basename(path)}' could not be read as a PDF.") from exc
+    return normalize_pdf_on_ingest(path)
+
+
+def ingest_upload(path: str) -> IngestResult:
+    """
+    Checks a fresh upload's header and trailer, then opens, scans and
+    normalizes it in a sandboxed child process, so a hostile file costs at
+    most the upload limits. Rejected files are deleted and raise
+    PdfSandboxError (a ValueError) with a message for the user.
+    """
+    try:
+        check_pdf_envelope(path)
+        return run_sandboxed(_scan_and_normalize, path, limits=upload_limits())
+    except PdfSandboxError:
+        os.remove(path)
+        raise
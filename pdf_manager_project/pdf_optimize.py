@@ -0,0 +1,206 @@
+from __future__ import annotations
+
+import math
+import os
+import re
+import zlib
+from collections.abc import Iterator
+from concurrent.futures import ProcessPoolExecutor
+
+import fitz  # PyMuPDF
+
+
+_XREF_REFERENCE_RE = re.compile(r"\b(\d+) 0 R\b")
+_DICT_REFERENCE_KEY_RE = re.compile(r"/([^\s/<>\[\]()]+)\s*\d+ 0 R")
+_ICC_BASED_RE = re.compile(r"^\[\s*/ICCBased\s+(\d+) 0 R\s*\]$")
+
+PRINT_IMAGE_DPI = 300
+DOWNSAMPLE_JPEG_QUALITY = 85
+# Below this many images the process pool costs more than it saves.
+DOWNSAMPLE_MIN_PARALLEL_IMAGES = 4
+
+
+def _font_resource_entries(doc: fitz.Document) -> Iterator[tuple[int, str]]:
+    """
+    Yields (xref, key path) of every entry of every /Font resource
+    dictionary, whether the dictionary is inline in a page, form or Type3
+    font, sits in an indirect /Resources object, or is an object itself.
+    """
+    seen: set[tuple[int, str]] = set()
+    for xref in range(1, doc.xref_length()):
+        paths = ["Font"]
+        # Indirect /Resources objects are visited on their own as "Font".
+        if doc.xref_get_key(xref, "Resources")[0] == "dict":
+            paths.append("Resources/Font")
+        for path in paths:
+            kind, value = doc.xref_get_key(xref, path)
+            if kind == "xref":
+                fonts_xref = int(value.split()[0])
+                entries = [(fonts_xref, name) for name in doc.xref_get_keys(fonts_xref)]
+            elif kind == "dict":
+                entries = [(xref, f"{path}/{name}") for name in _DICT_REFERENCE_KEY_RE.findall(value)]
+            else:
+                continue
+            for entry in entries:
+                if entry not in seen:
+                    seen.add(entry)
+                    yield entry
+
+
+def share_simple_fonts(doc: fitz.Document) -> int:
+    """
+    Points every /Font resource entry that references one of several
+    identical self-contained font dictionaries (the Base-14 "helv" used by
+    watermarks and cover corner marks) at a single object. Merging split
+    outputs otherwise carries one copy per split. Only resource entries
+    are rewritten, never strings or content streams. Returns the number of
+    duplicates that became unreferenced.
+    """
+    canonical_by_source: dict[str, int] = {}
+    replacements: dict[int, int] = {}
+
+    for xref in range(1, doc.xref_length()):
+        if doc.xref_get_key(xref, "Type") != ("name", "/Font"):
+            continue
+        source = doc.xref_object(xref, compressed=True)
+        # Fonts with indirect parts (embedded programs, descriptors) are left alone.
+        if _XREF_REFERENCE_RE.search(source):
+            continue
+        canonical = canonical_by_source.setdefault(source, xref)
+        if canonical != xref:
+            replacements[xref] = canonical
+
+    if not replacements:
+        return 0
+
+    for xref, path in list(_font_resource_entries(doc)):
+        kind, value = doc.xref_get_key(xref, path)
+        if kind != "xref":
+            continue
+        font_xref = int(value.split()[0])
+        if font_xref in replacements:
+            doc.xref_set_key(xref, path, f"{replacements[font_xref]} 0 R")
+
+    return len(replacements)
+
+
+def optimize_output_fonts(doc: fitz.Document, subset_fonts: bool = False) -> None:
+    """
+    Font pass run on a finished document right before it is saved. Duplicate
+    simple fonts (one "helv" per merged split) are always shared.
+
+    subset_fonts=True also replaces embedded fonts with subsets holding only
+    the glyphs the document uses (MuPDF's native subsetter, no extra
+    packages). Save with garbage >= 1 afterwards so replaced font objects
+    are dropped, and with deflate=True when subsetting: the new font
+    streams are raw.
+    """
+    share_simple_fonts(doc)
+    if subset_fonts:
+        doc.subset_fonts()
+
+
+def _effective_image_scales(doc: fitz.Document, max_dpi: int) -> dict[int, float]:
+    """
+    Maps image xrefs to the factor they can be shrunk by while still giving
+    max_dpi on their most demanding placement. Images already at or below
+    max_dpi everywhere are left out.
+    """
+    scales: dict[int, float] = {}
+    for page in doc:
+        for info in page.get_image_info(xrefs=True):
+            xref = info["xref"]
+            a, b, c, d, _, _ = info["transform"]
+            placed_width_in = math.hypot(a, b) / 72
+            placed_height_in = math.hypot(c, d) / 72
+            if xref <= 0 or placed_width_in <= 0 or placed_height_in <= 0:
+                continue
+            dpi = min(info["width"] / placed_width_in, info["height"] / placed_height_in)
+            scales[xref] = max(scales.get(xref, 0.0), max_dpi / dpi)
+    return {xref: scale for xref, scale in scales.items() if scale < 1}
+
+
+def _has_device_gray_or_rgb_colorspace(doc: fitz.Document, xref: int) -> bool:
+    """
+    True when the image's /ColorSpace is /DeviceGray, /DeviceRGB or an
+    ICCBased profile standing in for one of them (1 or 3 components, no
+    other alternate), i.e. what _write_image can declare without changing
+    how the samples are read.
+    """
+    kind, value = doc.xref_get_key(xref, "ColorSpace")
+    if kind == "name":
+        return value in ("/DeviceGray", "/DeviceRGB")
+    if kind == "xref":
+        value = doc.xref_object(int(value.split()[0]), compressed=True)
+    elif kind != "array":
+        return False
+    match = _ICC_BASED_RE.match(value.strip())
+    if match is None:
+        return False
+    profile = int(match.group(1))
+    components = doc.xref_get_key(profile, "N")
+    alternate = doc.xref_get_key(profile, "Alternate")
+    return components in (("int", "1"), ("int", "3")) and (
+        alternate[0] == "null" or alternate == ("name", "/DeviceGray" if components[1] == "1" else "/DeviceRGB")
+    )
+
+
+def _resample_image(image_bytes: bytes, width: int, height: int, ext: str) -> tuple[bytes, str]:
+    pix = fitz.Pixmap(image_bytes)
+    resampled = fitz.Pixmap(pix, width, height, None)
+    if ext in ("jpeg", "jpx"):
+        return resampled.tobytes("jpeg", jpg_quality=DOWNSAMPLE_JPEG_QUALITY), "/DCTDecode"
+    return zlib.compress(resampled.samples), "/FlateDecode"
+
+
+def _write_image(doc: fitz.Document, xref: int, width: int, height: int, colors: int, data: bytes, filter_name: str):
+    doc.update_stream(xref, data, compress=False)
+    doc.xref_set_key(xref, "Filter", filter_name)
+    doc.xref_set_key(xref, "DecodeParms", "null")
+    doc.xref_set_key(xref, "Width", str(width))
+    doc.xref_set_key(xref, "Height", str(height))
+    doc.xref_set_key(xref, "BitsPerComponent", "8")
+    doc.xref_set_key(xref, "ColorSpace", "/DeviceGray" if colors == 1 else "/DeviceRGB")
+
+
+def downsample_images(doc: fitz.Document, max_dpi: int = PRINT_IMAGE_DPI, workers: int | None = None) -> int:
+    """
+    Resamples embedded images whose effective resolution on the output pages
+    is above max_dpi, which is typical for scans shrunk onto half a sheet.
+    Images with soft masks, explicit or color-key masks, decode arrays,
+    1 bit per component, or a colorspace other than DeviceGray, DeviceRGB
+    or their ICCBased equivalents (Indexed, Lab, Separation...) are kept
+    as they are, and so is any image the resampled version would not make
+    smaller. Returns the number of images replaced.
+    """
+    jobs: list[tuple[int, int, bytes, int, int, str]] = []
+    for xref, scale in _effective_image_scales(doc, max_dpi).items():
+        if any(doc.xref_get_key(xref, key)[0] != "null" for key in ("Decode", "ImageMask", "Mask")):
+            continue
+        if not _has_device_gray_or_rgb_colorspace(doc, xref):
+            continue
+        image = doc.extract_image(xref)
+        if not image or image["smask"] or image["bpc"] == 1 or image["colorspace"] not in (1, 3):
+            continue
+        width = max(1, round(image["width"] * scale))
+        height = max(1, round(image["height"] * scale))
+        jobs.append((xref, image["colorspace"], image["image"], width, height, image["ext"]))
+
+    if not jobs:
+        return 0
+
+    job_args = [job[2:] for job in jobs]
+    if len(jobs) < DOWNSAMPLE_MIN_PARALLEL_IMAGES:
+        resampled = [_resample_image(*args) for args in job_args]
+    else:
+        max_workers = min(len(jobs), workers or os.cpu_count() or 1)
+        with ProcessPoolExecutor(max_workers=max_workers) as pool:
+            resampled = list(pool.map(_resample_image, *zip(*job_args)))
+
+    replaced = 0
+    for (xref, colors, _, width, height, _), (data, filter_name) in zip(jobs, resampled):
+        if len(data) >= len(doc.xref_stream_raw(xref)):
+            continue
+        _write_image(doc, xref, width, height, colors, data, filter_name)
+        replaced += 1
+    return replaced
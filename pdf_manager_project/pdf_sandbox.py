@@ -0,0 +1,129 @@
+from __future__ import annotations
+
+import math
+import multiprocessing
+import os
+import resource
+import signal
+from dataclasses import dataclass
+
+from django.conf import settings
+
+
+# How far from each end of the file the header and trailer may sit.
+PDF_HEADER_WINDOW = 1024
+PDF_TRAILER_WINDOW = 4096
+
+
+class PdfSandboxError(ValueError):
+    """A PDF was rejected, or its processing exceeded the sandbox limits."""
+
+
+@dataclass(frozen=True)
+class SandboxLimits:
+    wall_seconds: float
+    cpu_seconds: int
+    memory_mb: int | None = None
+
+
+def upload_limits() -> SandboxLimits:
+    return SandboxLimits(
+        wall_seconds=settings.PDF_SANDBOX_UPLOAD_SECONDS,
+        cpu_seconds=math.ceil(settings.PDF_SANDBOX_UPLOAD_SECONDS),
+        memory_mb=settings.PDF_SANDBOX_MEMORY_MB,
+    )
+
+
+def job_limits() -> SandboxLimits:
+    return SandboxLimits(
+        wall_seconds=settings.PDF_SANDBOX_JOB_SECONDS,
+        cpu_seconds=math.ceil(settings.PDF_SANDBOX_JOB_SECONDS),
+        memory_mb=settings.PDF_SANDBOX_MEMORY_MB,
+    )
+
+
+def check_pdf_envelope(path: str) -> None:
+    """
+    Rejects files without a %PDF- header near the start or a startxref and
+    %%EOF near the end, before any parser touches them.
+    """
+    name = os.path.basename(path)
+    with open(path, "rb") as fh:
+        head = fh.read(PDF_HEADER_WINDOW)
+        fh.seek(0, os.SEEK_END)
+        fh.seek(max(fh.tell() - PDF_TRAILER_WINDOW, 0))
+        tail = fh.read()
+    if b"%PDF-" not in head:
+        raise PdfSandboxError(f"'{name}' is not a PDF file.")
+    if b"startxref" not in tail or b"%%EOF" not in tail:
+        raise PdfSandboxError(f"'{name}' is incomplete: the PDF trailer is missing.")
+
+
+def _apply_limits(limits: SandboxLimits) -> None:
+    # Own process group, so a timeout also kills pools started by the job.
+    os.setpgid(0, 0)
+    resource.setrlimit(resource.RLIMIT_CPU, (limits.cpu_seconds, limits.cpu_seconds + 5))
+    if limits.memory_mb:
+        memory_bytes = limits.memory_mb * 1024 * 1024
+        resource.setrlimit(resource.RLIMIT_AS, (memory_bytes, memory_bytes))
+
+
+def _sandbox_child(conn, limits: SandboxLimits, func, args: tuple, kwargs: dict) -> None:
+    try:
+        _apply_limits(limits)
+        try:
+            outcome = ("ok", func(*args, **kwargs))
+        except MemoryError:
+            outcome = ("error", PdfSandboxError("Processing ran out of memory."))
+        except Exception as exc:
+            outcome = ("error", exc)
+        try:
+            conn.send(outcome)
+        except Exception as exc:
+            conn.send(("error", RuntimeError(f"{type(exc).__name__}: {exc}")))
+    finally:
+        conn.close()
+
+
+def _death_message(exitcode: int | None, limits: SandboxLimits) -> str:
+    if exitcode == -signal.SIGXCPU:
+        return f"Processing used more than {limits.cpu_seconds} s of CPU time."
+    if exitcode == -signal.SIGKILL:
+        return "Processing was killed, most likely for running out of memory."
+    return f"Processing stopped unexpectedly (exit code {exitcode})."
+
+
+def run_sandboxed(func, *args, limits: SandboxLimits, **kwargs):
+    """
+    Calls func(*args, **kwargs) in a forked child process with CPU-time and
+    address-space limits, and kills it (with anything it started) after
+    limits.wall_seconds. Returns func's result or re-raises its exception;
+    timeouts and crashes raise PdfSandboxError. The child inherits the
+    arguments through fork; only the result is pickled back.
+    """
+    context = multiprocessing.get_context("fork")
+    receiver, sender = context.Pipe(duplex=False)
+    process = context.Process(target=_sandbox_child, args=(sender, limits, func, args, kwargs))
+    process.start()
+    sender.close()
+    try:
+        if not receiver.poll(limits.wall_seconds):
+            raise PdfSandboxError(f"Processing took longer than {limits.wall_seconds:g} s and was stopped.")
+        try:
+            status, payload = receiver.recv()
+        except EOFError:
+            process.join()
+            raise PdfSandboxError(_death_message(process.exitcode, limits)) from None
+    finally:
+        if process.is_alive():
+            try:
+                os.killpg(process.pid, signal.SIGKILL)
+            except ProcessLookupError:
+                # Killed before it had its own group.
+                process.kill()
+        process.join()
+        receiver.close()
+
+    if status == "error":
+        raise payload
+    return payload
@@ -52,7 +52,15 @@ RQ_QUEUES = {
         "PORT": int(os.environ.get("REDIS_PORT", "6379")),
         "DB": int(os.environ.get("REDIS_DB", "0")),
         "DEFAULT_TIMEOUT": 3600,  # OCRs largos
-    }
+    },
+    # Análisis de subidas en segundo plano (tamaños, cajas de contenido,
+    # miniaturas). El worker atiende "default" antes que "low".
+    "low": {
+        "HOST": os.environ.get("REDIS_HOST", "localhost"),
+        "PORT": int(os.environ.get("REDIS_PORT", "6379")),
+        "DB": int(os.environ.get("REDIS_DB", "0")),
+        "DEFAULT_TIMEOUT": 600,
+    },
 }
 
 # ------------------------------------------------------------
@@ -139,6 +147,37 @@ MEDIA_URL = f"{APP_SUBPATH}/media/"
 # WhiteNoise: compresión y cacheo
 STATICFILES_STORAGE = "whitenoise.storage.CompressedManifestStaticFilesStorage"
 
+# ------------------------------------------------------------
+# Booklets: límites de recursos por trabajo
+# ------------------------------------------------------------
+# Presupuesto de memoria (MB de RSS del proceso). Si se define, los trabajos
+# grandes pasan a modo streaming: liberan fuentes tras su último uso y vuelcan
+# a disco las hojas ya impuestas cuando se supera el presupuesto. Es un
+# objetivo, no un límite estricto: la RSS casi nunca baja tras un volcado.
+_raw_memory_budget = os.environ.get("BOOKLETS_MEMORY_BUDGET_MB", "").strip()
+BOOKLETS_MEMORY_BUDGET_MB = float(_raw_memory_budget) if _raw_memory_budget else None
+
+# Caché en disco de medias páginas rasterizadas (modo "Image split"), compartida
+# entre trabajos. Tamaño máximo en MB; 0 la desactiva.
+BOOKLETS_RASTER_CACHE_MB = float(os.environ.get("BOOKLETS_RASTER_CACHE_MB", "512"))
+
+# Caché en disco de hojas ya impuestas (fragmentos PDF de una página). Al
+# regenerar tras cambiar un archivo o un margen solo se reimponen las hojas
+# afectadas. Tamaño máximo en MB; 0 la desactiva.
+BOOKLETS_SHEET_CACHE_MB = float(os.environ.get("BOOKLETS_SHEET_CACHE_MB", "512"))
+
+# ------------------------------------------------------------
+# Sandbox para PDFs no confiables
+# ------------------------------------------------------------
+# La validación de subidas y la generación se ejecutan en un proceso hijo con
+# límite de CPU, de tiempo real y de memoria (MB de espacio de direcciones;
+# vacío = sin límite). El límite de los trabajos debe quedar por debajo de
+# GUNICORN_TIMEOUT para que un PDF malicioso no bloquee el worker.
+PDF_SANDBOX_UPLOAD_SECONDS = float(os.environ.get("PDF_SANDBOX_UPLOAD_SECONDS", "30"))
+PDF_SANDBOX_JOB_SECONDS = float(os.environ.get("PDF_SANDBOX_JOB_SECONDS", "280"))
+_raw_sandbox_memory = os.environ.get("PDF_SANDBOX_MEMORY_MB", "").strip()
+PDF_SANDBOX_MEMORY_MB = int(_raw_sandbox_memory) if _raw_sandbox_memory else None
+
 # ------------------------------------------------------------
 # Reverse proxy / HTTPS (nginx + Cloudflare)
 # ------------------------------------------------------------